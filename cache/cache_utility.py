@@ -1,9 +1,584 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional, Union
+
+import flask
+import redis
+from redis.lock import Lock
 from canonicalwebteam.stores_web_redis.utility import RedisCache
-from webapp.config import APP_NAME
+
+from cache import serialization
+from cache.local_cache import LocalCache
+from webapp.api.exceptions import ApiFetchInProgressError
+from webapp.config import (
+    APP_NAME,
+    CACHE_L1_ENABLED,
+    CACHE_L1_MAX_BYTES,
+    CACHE_L1_MAXSIZE,
+    CACHE_L1_TTL,
+    STALE_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Union[str, tuple[str, Optional[dict[str, Any]]]]
+Tags = Union[Iterable[str], Callable[[Any], Iterable[str]]]
+
+# Adds the keys of ARGV to the tags of KEYS, scored by the time they expire
+# at. Drops the keys that expired, and keeps each tag as long as its last
+# key, to never outlive them
+TAG_KEYS_SCRIPT = """
+local now = tonumber(ARGV[1])
+for _, tag_key in ipairs(KEYS) do
+    for i = 2, #ARGV, 2 do
+        redis.call("ZADD", tag_key, ARGV[i + 1], ARGV[i])
+    end
+    redis.call("ZREMRANGEBYSCORE", tag_key, "-inf", now)
+    local last = redis.call("ZRANGE", tag_key, -1, -1, "WITHSCORES")
+    if last[2] then
+        redis.call("EXPIREAT", tag_key, math.ceil(tonumber(last[2])))
+    end
+end
+"""
+
+
+class SnapcraftCache(RedisCache):
+    """RedisCache able to keep the last good copy of a value around
+
+    Values set with a `stale_ttl` get a second copy which outlives the
+    regular one by `stale_ttl` seconds. Views can fall back to it with
+    `get_stale` when the upstream the value comes from is unavailable.
+
+    Values read from Redis are also kept for a few seconds in a per-worker
+    LRU (`l1`), saving a round trip to Redis for the keys read on most
+    requests. Deleting a key notifies every worker through Redis pub/sub
+    to drop it from their LRU.
+
+    Large values are stored compressed, see `cache.serialization`.
+
+    `get_or_refresh` serves stale values while refreshing them in the
+    background, see its docstring.
+
+    Values can be set with `tags`, e.g. "snap:<name>", for
+    `invalidate_tags` to delete every value of a snap at once, along with
+    their stale copies. Each tag is a sorted set of its keys, by the time
+    they expire at, which only lives as long as its last key.
+    """
+
+    # How long a worker owns the refresh of a key by default
+    refresh_lock_ttl = 60
+    # How long requests wait for another worker to fetch a missing value
+    recompute_wait = 5
+    recompute_poll_interval = 0.1
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int,
+        ttl: int = 300,
+        l1: Optional[LocalCache] = None,
+    ):
+        super().__init__(namespace, maxsize, ttl)
+        self.l1 = l1 if self.redis_available else None
+        self.invalidation_channel = f"{namespace}:invalidate"
+        self._subscriber = None
+        self._subscriber_pid = None
+        self._subscriber_lock = threading.Lock()
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self._tag_keys = (
+            self.client.register_script(TAG_KEYS_SCRIPT)
+            if self.redis_available
+            else None
+        )
+
+    def _serialize(self, value: Any) -> str:
+        try:
+            serialized = (
+                value if isinstance(value, str) else serialization.dumps(value)
+            )
+        except (TypeError, ValueError) as error:
+            logger.error("Serialization error: %s", error)
+            raise
+        return serialization.compress(serialized)
+
+    def _deserialize(
+        self, value: Optional[str], expected_type: type = str
+    ) -> Any:
+        if value is None:
+            return None
+        value = serialization.decompress(value)
+        if expected_type is str:
+            return value
+        try:
+            return serialization.loads(value)
+        except (TypeError, ValueError) as error:
+            logger.error("Deserialization error: %s", error)
+            raise
+
+    def _ensure_subscribed(self):
+        # The subscriber thread doesn't survive forking a worker
+        if self._subscriber_pid == os.getpid():
+            return
+
+        with self._subscriber_lock:
+            if self._subscriber_pid == os.getpid():
+                return
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(
+                    **{self.invalidation_channel: self._on_invalidation}
+                )
+                self._subscriber = pubsub.run_in_thread(
+                    sleep_time=1,
+                    daemon=True,
+                    exception_handler=self._on_subscriber_error,
+                )
+            except redis.RedisError as error:
+                logger.error("Redis subscribe error: %s", error)
+                self.l1.clear()
+                return
+            self._subscriber_pid = os.getpid()
+
+    def _on_invalidation(self, message):
+        self.l1.delete(message["data"])
+
+    def _on_subscriber_error(self, error, pubsub, thread):
+        # Invalidations may have been missed while disconnected
+        logger.error("Redis invalidation channel error: %s", error)
+        self.l1.clear()
+        time.sleep(1)
+
+    def get(self, key: CacheKey, expected_type: type = str) -> Any:
+        full_key = self._build_key(key)
+        prefetched = self._prefetched()
+        if full_key in prefetched:
+            return self._deserialize(prefetched.pop(full_key), expected_type)
+
+        if self.l1 is None:
+            return super().get(key, expected_type)
+
+        self._ensure_subscribed()
+        value = self.l1.get(full_key)
+        if value is None:
+            try:
+                value = self.client.get(full_key)
+            except redis.RedisError as error:
+                logger.error("Redis get error: %s", error)
+                return None
+            if value is not None:
+                self.l1.set(full_key, value)
+
+        return self._deserialize(value, expected_type)
+
+    def prefetch(self, keys: list[CacheKey]):
+        """Read `keys` in one round trip, with what `get_or_refresh` reads
+        along with them, for the following lookups of the current request
+        to not go to Redis
+
+        Each prefetched value is only used once, for the lookups that
+        follow, e.g. while waiting for a value, to read the current one.
+        """
+        if not flask.has_request_context():
+            return
+
+        full_keys = []
+        for key in keys:
+            full_keys.append(self._build_key(key))
+            full_keys.append(self._build_key(self._recompute_key(key)))
+            full_keys.append(self._build_key(self._stale_key(key)))
+
+        prefetched = self._prefetched()
+        for full_key, value in zip(
+            full_keys, self._get_many_serialized(full_keys)
+        ):
+            prefetched[full_key] = value
+
+    def _prefetched(self) -> dict:
+        """The values prefetched for the current request, by full key"""
+        if not flask.has_request_context():
+            return {}
+        if "cache_prefetched" not in flask.g:
+            flask.g.cache_prefetched = {}
+        return flask.g.cache_prefetched
+
+    def _get_many_serialized(self, full_keys: list[str]) -> list:
+        if not self.redis_available:
+            return [self.fallback.get(full_key) for full_key in full_keys]
+
+        values = {}
+        if self.l1 is not None:
+            self._ensure_subscribed()
+            for full_key in full_keys:
+                values[full_key] = self.l1.get(full_key)
+
+        missing = [key for key in full_keys if values.get(key) is None]
+        if missing:
+            try:
+                fetched = self.client.mget(missing)
+            except redis.RedisError as error:
+                logger.error("Redis mget error: %s", error)
+                fetched = [None] * len(missing)
+
+            for full_key, value in zip(missing, fetched):
+                values[full_key] = value
+                if value is not None and self.l1 is not None:
+                    self.l1.set(full_key, value)
+
+        return [values[full_key] for full_key in full_keys]
+
+    def _stale_key(self, key: CacheKey) -> CacheKey:
+        if isinstance(key, tuple):
+            base_key, parts = key
+            return (f"stale:{base_key}", parts)
+        return f"stale:{key}"
+
+    def set(
+        self,
+        key: CacheKey,
+        value: Any,
+        ttl=300,
+        stale_ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+    ):
+        self._set_many_serialized(
+            self._entries(key, value, ttl, stale_ttl), tags
+        )
+
+    def _entries(self, key, value, ttl, stale_ttl=None):
+        serialized = self._serialize(value)
+        entries = [(self._build_key(key), serialized, ttl)]
+        if stale_ttl:
+            entries.append(
+                (
+                    self._build_key(self._stale_key(key)),
+                    serialized,
+                    ttl + stale_ttl,
+                )
+            )
+        return entries
+
+    def _tag_key(self, tag: str) -> str:
+        return self._build_key(f"tag:{tag}")
+
+    def _set_many_serialized(
+        self, entries: list[tuple[str, str, int]], tags: Iterable[str] = ()
+    ):
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        full_keys = [full_key for full_key, _, _ in entries]
+        prefetched = self._prefetched()
+        for full_key in full_keys:
+            prefetched.pop(full_key, None)
+
+        if not self.redis_available:
+            for full_key, serialized, _ in entries:
+                self.fallback[full_key] = serialized
+            for tag_key in tag_keys:
+                tagged = self.fallback.get(tag_key) or set()
+                self.fallback[tag_key] = tagged | set(full_keys)
+            return
+
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for full_key, serialized, ttl in entries:
+                pipeline.setex(full_key, ttl, serialized)
+            if entries and tag_keys:
+                now = time.time()
+                expiries = []
+                for full_key, _, ttl in entries:
+                    expiries += [full_key, now + ttl]
+                self._tag_keys(tag_keys, [now] + expiries, client=pipeline)
+            pipeline.execute()
+        except redis.RedisError as error:
+            logger.error("Redis set error: %s", error)
+
+        if self.l1 is not None:
+            for full_key, _, _ in entries:
+                self.l1.delete(full_key)
+
+    def set_stale(
+        self,
+        key: CacheKey,
+        value: Any,
+        ttl=STALE_CACHE_TTL,
+        tags: Iterable[str] = (),
+    ):
+        self._set_many_serialized(
+            self._entries(self._stale_key(key), value, ttl), tags
+        )
+
+    def get_stale(self, key: CacheKey, expected_type: type = str) -> Any:
+        full_key = self._build_key(self._stale_key(key))
+        prefetched = self._prefetched()
+        if full_key in prefetched:
+            return self._deserialize(prefetched.pop(full_key), expected_type)
+        return super().get(self._stale_key(key), expected_type)
+
+    def get_or_refresh(
+        self,
+        key: CacheKey,
+        fetch: Callable[[], Any],
+        ttl=300,
+        expected_type: type = str,
+        max_stale=STALE_CACHE_TTL,
+        early_recompute_beta: float = 0,
+        lock_ttl: Optional[int] = None,
+        tags: Tags = (),
+    ) -> Any:
+        """Return the cached value of `key`, fetching it if needed
+
+        Values are fresh for `ttl` seconds, then stale for up to
+        `max_stale` more seconds. A stale value is returned straight away
+        while a single background refresh calls `fetch` for the next
+        requests. If that refresh fails, the stale value keeps being
+        served until it is `max_stale` seconds old.
+
+        Without any value, only one worker calls `fetch` at a time, for up
+        to `lock_ttl` seconds. The others wait for its value for up to
+        `recompute_wait` seconds, and raise ApiFetchInProgressError if it
+        is still being fetched by then. They call `fetch` themselves if the
+        other worker gave up without a value, or if Redis fails. Errors of
+        `fetch` are raised. Empty values aren't cached.
+
+        With `early_recompute_beta`, fresh values get refreshed in the
+        background before they expire, earlier the slower `fetch` is
+        (XFetch, see "Optimal Probabilistic Cache Stampede Prevention").
+        1 is a sensible value, higher values refresh earlier.
+
+        `tags` can be a function of the fetched value.
+        """
+        lock_ttl = lock_ttl or self.refresh_lock_ttl
+
+        value = self.get(key, expected_type)
+        if value is not None:
+            if early_recompute_beta and self._should_recompute_early(
+                key, early_recompute_beta
+            ):
+                self._refresh_in_background(
+                    key, fetch, ttl, max_stale, lock_ttl, tags
+                )
+            return value
+
+        value = self.get_stale(key, expected_type)
+        if value is not None:
+            self._refresh_in_background(
+                key, fetch, ttl, max_stale, lock_ttl, tags
+            )
+            return value
+
+        full_key = self._build_key(key)
+        lock = self._acquire_refresh(full_key, lock_ttl)
+        if not lock:
+            value = self._wait_for_value(key, expected_type, full_key)
+            if value is not None:
+                return value
+            lock = self._acquire_refresh(full_key, lock_ttl)
+
+        try:
+            return self._fetch_and_set(key, fetch, ttl, max_stale, tags)
+        finally:
+            if lock:
+                self._release_refresh(full_key, lock)
+
+    def _fetch_and_set(self, key, fetch, ttl, max_stale, tags=()):
+        start = time.monotonic()
+        value = fetch()
+        if value:
+            recompute = {
+                "delta": time.monotonic() - start,
+                "expires_at": time.time() + ttl,
+            }
+            self._set_many_serialized(
+                self._entries(key, value, ttl, max_stale)
+                + self._entries(self._recompute_key(key), recompute, ttl),
+                tags(value) if callable(tags) else tags,
+            )
+        return value
+
+    def _recompute_key(self, key: CacheKey) -> CacheKey:
+        if isinstance(key, tuple):
+            base_key, parts = key
+            return (f"recompute:{base_key}", parts)
+        return f"recompute:{key}"
+
+    def _should_recompute_early(self, key: CacheKey, beta: float) -> bool:
+        recompute = self.get(self._recompute_key(key), expected_type=dict)
+        if not recompute:
+            return False
+
+        # -log(u) for u in (0, 1] is exponentially distributed
+        gap = -recompute["delta"] * beta * math.log(1 - random.random())
+        return time.time() + gap >= recompute["expires_at"]
+
+    def _wait_for_value(
+        self, key: CacheKey, expected_type: type, full_key: str
+    ) -> Any:
+        """Wait up to `recompute_wait` seconds for another worker to fetch
+        the value of `key`
+
+        Returns None if it gave up without a value, and raises
+        ApiFetchInProgressError if it is still fetching it.
+        """
+        deadline = time.monotonic() + self.recompute_wait
+        while True:
+            time.sleep(self.recompute_poll_interval)
+            value = self.get(key, expected_type)
+            if value is not None:
+                return value
+            if not self._is_refreshing(full_key):
+                # The fetch failed or was empty, unless it just finished
+                return self.get(key, expected_type)
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    "Gave up waiting for %s to be fetched", full_key
+                )
+                raise ApiFetchInProgressError(
+                    f"{full_key} is still being fetched"
+                )
+
+    def _is_refreshing(self, full_key: str) -> bool:
+        """Whether a worker holds the lock to fetch `full_key`"""
+        with self._refreshing_lock:
+            if full_key in self._refreshing:
+                return True
+
+        if not self.redis_available:
+            return False
+
+        try:
+            return bool(self.client.exists(f"refresh-lock:{full_key}"))
+        except redis.RedisError as error:
+            logger.error("Redis refresh lock error: %s", error)
+            return False
+
+    def _acquire_refresh(self, full_key: str, lock_ttl: int):
+        """Return a lock if nobody else is fetching `full_key`, else None"""
+        with self._refreshing_lock:
+            if full_key in self._refreshing:
+                return None
+            self._refreshing.add(full_key)
+
+        if not self.redis_available:
+            return True
+
+        # Only one worker fetches a key
+        lock = self.client.lock(
+            f"refresh-lock:{full_key}", timeout=lock_ttl, blocking=False
+        )
+        try:
+            if lock.acquire():
+                return lock
+        except redis.RedisError as error:
+            # Waiting for a lock Redis can't give would only delay the
+            # fetch, other workers are coalesced within this one
+            logger.error("Redis refresh lock error: %s", error)
+            return True
+
+        self._release_refresh(full_key)
+        return None
+
+    def _release_refresh(self, full_key: str, lock=None):
+        with self._refreshing_lock:
+            self._refreshing.discard(full_key)
+
+        if isinstance(lock, Lock):
+            try:
+                lock.release()
+            except redis.RedisError as error:
+                logger.error("Redis refresh lock error: %s", error)
+
+    def _refresh_in_background(
+        self, key, fetch, ttl, max_stale, lock_ttl, tags=()
+    ):
+        full_key = self._build_key(key)
+        lock = self._acquire_refresh(full_key, lock_ttl)
+        if not lock:
+            return None
+
+        app = (
+            flask.current_app._get_current_object()
+            if flask.has_app_context()
+            else None
+        )
+
+        def refresh():
+            try:
+                if app:
+                    with app.app_context():
+                        self._fetch_and_set(key, fetch, ttl, max_stale, tags)
+                else:
+                    self._fetch_and_set(key, fetch, ttl, max_stale, tags)
+            except Exception:
+                logger.exception("Background refresh of %s failed", full_key)
+            finally:
+                self._release_refresh(full_key, lock)
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+        return thread
+
+    def delete(self, key: CacheKey):
+        super().delete(key)
+        super().delete(self._stale_key(key))
+        self._invalidate_l1([self._build_key(key)])
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Delete every value set with any of `tags`, with their stale
+        copies, and return how many keys the tags had
+        """
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        if not tag_keys:
+            return 0
+
+        if not self.redis_available:
+            full_keys = set()
+            for tag_key in tag_keys:
+                full_keys |= self.fallback.pop(tag_key, None) or set()
+            for full_key in full_keys:
+                self.fallback.pop(full_key, None)
+            return len(full_keys)
+
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipeline.zrangebyscore(tag_key, time.time(), "+inf")
+            full_keys = set().union(*pipeline.execute())
+            self.client.delete(*full_keys, *tag_keys)
+        except redis.RedisError as error:
+            logger.error("Redis tag invalidation error: %s", error)
+            return 0
+
+        self._invalidate_l1(full_keys)
+        return len(full_keys)
+
+    def _invalidate_l1(self, full_keys: Iterable[str]):
+        """Drop `full_keys` from the LRU of every worker"""
+        if self.l1 is None:
+            return
+
+        for full_key in full_keys:
+            self.l1.delete(full_key)
+            try:
+                self.client.publish(self.invalidation_channel, full_key)
+            except redis.RedisError as error:
+                logger.error("Redis publish error: %s", error)
 
 
-redis_cache = RedisCache(
+redis_cache = SnapcraftCache(
     namespace=APP_NAME,
     maxsize=1000,
     ttl=300,
+    l1=(
+        LocalCache(
+            maxsize=CACHE_L1_MAXSIZE,
+            max_bytes=CACHE_L1_MAX_BYTES,
+            ttl=CACHE_L1_TTL,
+        )
+        if CACHE_L1_ENABLED
+        else None
+    ),
 )
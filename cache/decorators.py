@@ -0,0 +1,141 @@
+import functools
+import inspect
+import json
+import time
+from typing import Any, Callable, Iterable, Optional, Union
+
+from cache.cache_utility import CacheKey, Tags, redis_cache
+from webapp.api.instrumentation import upstream_metrics
+
+
+def _get_prefix(cache_key: CacheKey) -> str:
+    base_key = cache_key[0] if isinstance(cache_key, tuple) else cache_key
+    return base_key.split(":", 1)[0]
+
+
+def cached(
+    key: Union[str, Callable[..., CacheKey]],
+    ttl: Union[int, Callable[[Any], int]] = 300,
+    negative_ttl: Optional[int] = None,
+    expected_type: type = str,
+    stale_ttl: Optional[int] = None,
+    early_recompute_beta: float = 0,
+    tags: Union[Iterable[str], Callable[[Any], Iterable[str]]] = (),
+):
+    """Cache the return value of the decorated function in `redis_cache`
+
+    `key` is either a format string of the function arguments, e.g.
+    "snap_posts:{snap}", or a function taking the same arguments and
+    returning the key.
+
+    `ttl` can be a function of the value, e.g. to keep failures for less
+    time, unless `stale_ttl` is used. Empty values are cached for
+    `negative_ttl` seconds, or not at all without it.
+
+    With `stale_ttl`, expired values are served for up to `stale_ttl` more
+    seconds while they get refreshed in the background, see
+    `SnapcraftCache.get_or_refresh`.
+
+    `tags`, e.g. ["snap:{snap_name}"], are format strings of the function
+    arguments, or a function of the value returning the tags, see
+    `SnapcraftCache.invalidate_tags`.
+
+    Hits, misses and the time spent are counted per key prefix, the part
+    of the key before the first colon.
+    """
+
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        def build_key(args, kwargs) -> CacheKey:
+            if callable(key):
+                return key(*args, **kwargs)
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            return key.format(**arguments.arguments)
+
+        def build_tags(args, kwargs) -> Tags:
+            if callable(tags) or not tags:
+                return tags
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            return [tag.format(**arguments.arguments) for tag in tags]
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            cache_key = build_key(args, kwargs)
+            cache_tags = build_tags(args, kwargs)
+            prefix = _get_prefix(cache_key)
+            start = time.monotonic()
+
+            if stale_ttl:
+                fetched = []
+
+                def fetch():
+                    fetched.append(True)
+                    return function(*args, **kwargs)
+
+                value = redis_cache.get_or_refresh(
+                    cache_key,
+                    fetch,
+                    ttl=ttl,
+                    expected_type=expected_type,
+                    max_stale=stale_ttl,
+                    early_recompute_beta=early_recompute_beta,
+                    tags=cache_tags,
+                )
+                upstream_metrics.record_cache_lookup(
+                    prefix,
+                    "miss" if fetched else "hit",
+                    time.monotonic() - start,
+                )
+                return value
+
+            value = redis_cache.get(cache_key, expected_type=expected_type)
+            if value is not None:
+                upstream_metrics.record_cache_lookup(
+                    prefix, "hit", time.monotonic() - start
+                )
+                return value
+
+            if negative_ttl:
+                negative = redis_cache.get(_negative_key(cache_key))
+                if negative is not None:
+                    upstream_metrics.record_cache_lookup(
+                        prefix, "negative-hit", time.monotonic() - start
+                    )
+                    return json.loads(negative)
+
+            value = function(*args, **kwargs)
+            if callable(cache_tags):
+                cache_tags = cache_tags(value)
+
+            if value:
+                value_ttl = ttl(value) if callable(ttl) else ttl
+                redis_cache.set(
+                    cache_key, value, ttl=value_ttl, tags=cache_tags
+                )
+            elif negative_ttl:
+                redis_cache.set(
+                    _negative_key(cache_key),
+                    json.dumps(value),
+                    ttl=negative_ttl,
+                    tags=cache_tags,
+                )
+
+            upstream_metrics.record_cache_lookup(
+                prefix, "miss", time.monotonic() - start
+            )
+            return value
+
+        wrapper.build_key = lambda *args, **kwargs: build_key(args, kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _negative_key(cache_key: CacheKey) -> CacheKey:
+    if isinstance(cache_key, tuple):
+        base_key, parts = cache_key
+        return (f"negative:{base_key}", parts)
+    return f"negative:{cache_key}"
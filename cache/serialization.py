@@ -0,0 +1,77 @@
+"""
+Encoding of the values stored in Redis.
+
+Structures are dumped to JSON with orjson. Values larger than
+CACHE_COMPRESS_MIN_BYTES are then compressed with zstd, and stored as:
+
+    \x1ev1:<compression>:<base64 of the compressed value>
+
+Values without that tag are plain strings or JSON, as written before
+compression was added, so both formats can be read side by side. Values
+compressed with zlib can still be read.
+"""
+
+import base64
+import logging
+import zlib
+
+import orjson
+import zstandard
+from canonicalwebteam.stores_web_redis.utility import SafeJSONEncoder
+from webapp.config import CACHE_COMPRESS_MIN_BYTES
+
+logger = logging.getLogger(__name__)
+
+VERSION_TAG = "\x1ev1:"
+
+COMPRESSIONS = {
+    "zlib": (
+        lambda data: zlib.compress(data, 6),
+        zlib.decompress,
+    ),
+    "zstd": (
+        zstandard.ZstdCompressor(level=3).compress,
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    ),
+}
+
+DEFAULT_COMPRESSION = "zstd"
+
+
+def _orjson_default(value):
+    # Same leniency as SafeJSONEncoder, for what orjson can't dump itself
+    return SafeJSONEncoder().default(value)
+
+
+def dumps(value) -> str:
+    return orjson.dumps(
+        value, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS
+    ).decode("utf-8")
+
+
+def loads(serialized: str):
+    return orjson.loads(serialized)
+
+
+def compress(
+    serialized: str,
+    min_bytes=CACHE_COMPRESS_MIN_BYTES,
+    compression=DEFAULT_COMPRESSION,
+) -> str:
+    """Compress values of at least `min_bytes` characters"""
+    if len(serialized) < min_bytes:
+        return serialized
+
+    compress_function, _ = COMPRESSIONS[compression]
+    payload = base64.b64encode(compress_function(serialized.encode("utf-8")))
+    return f"{VERSION_TAG}{compression}:{payload.decode('ascii')}"
+
+
+def decompress(stored: str) -> str:
+    """Return the value compressed by `compress`, as it was"""
+    if not stored.startswith(VERSION_TAG):
+        return stored
+
+    compression, payload = stored.removeprefix(VERSION_TAG).split(":", 1)
+    _, decompress_function = COMPRESSIONS[compression]
+    return decompress_function(base64.b64decode(payload)).decode("utf-8")
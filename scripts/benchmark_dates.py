@@ -0,0 +1,121 @@
+#! /usr/bin/env python3
+
+"""
+Compare the time it takes to index a large channel map with the dates
+parsed by dateutil, as they used to be, and by webapp.dates, with and
+without the memoized dates of a previous page view.
+
+Usage: python3 scripts/benchmark_dates.py [--tracks 50] [--repeat 5]
+"""
+
+import datetime
+import os
+import sys
+import timeit
+from argparse import ArgumentParser
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from dateutil import parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webapp import dates  # noqa: E402
+from webapp.store import logic  # noqa: E402
+
+ARCHITECTURES = [
+    "amd64",
+    "arm64",
+    "armhf",
+    "i386",
+    "ppc64el",
+    "riscv64",
+    "s390x",
+]
+
+
+def build_channel_map(tracks):
+    """Return a channel map with a release per track, risk and arch"""
+    released_at = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    channel_map = []
+    revision = 0
+
+    for track_index in range(tracks):
+        track = "latest" if track_index == 0 else f"{track_index}.0"
+        for risk in logic.RISK_ORDER:
+            for arch in ARCHITECTURES:
+                revision += 1
+                released_at += datetime.timedelta(minutes=17, microseconds=1)
+                channel_map.append(
+                    {
+                        "channel": {
+                            "architecture": arch,
+                            "name": f"{track}/{risk}",
+                            "released-at": released_at.isoformat(),
+                            "risk": risk,
+                            "track": track,
+                        },
+                        "confinement": "strict",
+                        "download": {"size": 1000},
+                        "revision": revision,
+                        "version": f"{track_index}.{revision}",
+                    }
+                )
+
+    return channel_map
+
+
+def index_channel_map(channel_map):
+    index = logic.ChannelMap(channel_map)
+    index.get_latest_versions("latest", "stable")
+    logic.is_snap_old(index.last_updated_release["channel"]["released-at"])
+
+
+# How the dates were handled before webapp.dates
+dateutil_dates = SimpleNamespace(
+    parse_date=parser.parse,
+    format_date=lambda date, format: parser.parse(date).strftime(format),
+)
+
+
+def main():
+    arguments = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arguments.add_argument("--tracks", type=int, default=50)
+    arguments.add_argument("--repeat", type=int, default=5)
+    args = arguments.parse_args()
+
+    channel_map = build_channel_map(args.tracks)
+
+    def clear_memos():
+        dates.parse_date.cache_clear()
+        dates.format_date.cache_clear()
+
+    def run(setup=None):
+        timings = []
+        for _ in range(args.repeat):
+            if setup:
+                setup()
+            timings.append(
+                timeit.timeit(lambda: index_channel_map(channel_map), number=1)
+            )
+        return min(timings)
+
+    with patch.object(logic, "dates", dateutil_dates):
+        dateutil_time = run()
+    cold_time = run(setup=clear_memos)
+    warm_time = run()
+
+    print(f"Channel map of {len(channel_map)} releases")
+    for label, time in [
+        ("dateutil", dateutil_time),
+        ("webapp.dates, cold", cold_time),
+        ("webapp.dates, memoized", warm_time),
+    ]:
+        print(
+            f"{label:<24}{time * 1000:8.2f} ms "
+            f"({dateutil_time / time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#! /usr/bin/env python3
+
+"""
+Benchmark and fuzz the markdown renderer of the snap descriptions.
+
+bench: time realistic and adversarial descriptions, as long as
+MARKDOWN_MAX_LENGTH allows, with the guarded render and without it.
+fuzz: render random descriptions, failing when one goes over the time
+budget or lets HTML through.
+
+Usage:
+    python3 scripts/benchmark_markdown.py bench [--unguarded]
+    python3 scripts/benchmark_markdown.py fuzz [--runs 1000] [--seed 0]
+"""
+
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webapp import markdown  # noqa: E402
+from webapp.config import (  # noqa: E402
+    MARKDOWN_MAX_LENGTH,
+    MARKDOWN_RENDER_TIME_BUDGET,
+)
+
+REALISTIC_PARAGRAPH = (
+    "**Snapcraft** packages *desktop*, server and IoT apps, see "
+    "https://snapcraft.io/docs and `snap info`.\n"
+)
+REALISTIC_DESCRIPTION = (
+    REALISTIC_PARAGRAPH * 3
+    + "\nFeatures:\n\n"
+    + "".join(f"* feature {index}\n" for index in range(10))
+    + "\nInstall it with:\n\n   snap install toto --classic\n\n"
+    + "1. first\n2. second\n\n---\n\n~~deprecated~~ options\n"
+)
+
+
+def repeat(pattern, length=MARKDOWN_MAX_LENGTH):
+    """Repeat `pattern` up to `length` characters"""
+    return (pattern * (length // len(pattern) + 1))[:length]
+
+
+CASES = {
+    "realistic": REALISTIC_DESCRIPTION,
+    "realistic, longest": repeat(REALISTIC_DESCRIPTION),
+    "nested lists": "".join("  " * depth + "* item\n" for depth in range(130)),
+    "nested indented lists": "".join(
+        "   " * depth + "- x\n" for depth in range(60)
+    ),
+    "backtick run": "`" * MARKDOWN_MAX_LENGTH,
+    "backtick pairs": repeat("`a"),
+    "link chain": repeat("[a]("),
+    "links": repeat("[x](http://a.com)"),
+    "nested brackets": "[" * (MARKDOWN_MAX_LENGTH // 2)
+    + "]" * (MARKDOWN_MAX_LENGTH // 2),
+    "emphasis run": repeat("*a"),
+    "underscores": "_" * MARKDOWN_MAX_LENGTH,
+    "autolinks": repeat("<http://a"),
+    "inline html": repeat("<a "),
+    "indent code whitespace": repeat("   x\n" + " \t\n" * 10),
+    "escapes": "\\" * MARKDOWN_MAX_LENGTH,
+    "list items": repeat("* a\n"),
+}
+
+FUZZ_SNIPPETS = [
+    "*",
+    "**",
+    "_",
+    "~~",
+    "`",
+    "```",
+    "[",
+    "]",
+    "(",
+    ")",
+    "](",
+    "<",
+    ">",
+    "\\",
+    "#",
+    "-",
+    "1.",
+    "   ",
+    "\t",
+    "\n",
+    "\n\n",
+    "http://a.b/",
+    "a@b.c",
+    "<script>",
+    "&amp;",
+    "&lt;",
+    "word",
+    " ",
+]
+
+
+def render_unguarded(content):
+    return markdown.render_markdown_description(
+        content, max_length=float("inf"), time_budget=float("inf")
+    )
+
+
+def bench(unguarded):
+    print(
+        f"Max length {MARKDOWN_MAX_LENGTH} characters, "
+        f"time budget {MARKDOWN_RENDER_TIME_BUDGET * 1000:.0f} ms"
+    )
+    # Compile the parser rules first
+    markdown.render_markdown_description(REALISTIC_DESCRIPTION)
+
+    for name, content in CASES.items():
+        start = time.perf_counter()
+        markdown.render_markdown_description(content)
+        guarded_time = time.perf_counter() - start
+        fallback = (
+            len(content) > MARKDOWN_MAX_LENGTH
+            or guarded_time >= MARKDOWN_RENDER_TIME_BUDGET
+        )
+
+        line = (
+            f"{name:<24}{len(content):>7} chars "
+            f"{guarded_time * 1000:9.1f} ms"
+            f"{' (plain text)' if fallback else ''}"
+        )
+        if unguarded:
+            start = time.perf_counter()
+            render_unguarded(content)
+            line += (
+                f", unguarded {(time.perf_counter() - start) * 1000:9.1f} ms"
+            )
+        print(line)
+
+
+def fuzz(runs, seed):
+    rng = random.Random(seed)
+    # The guarded render may overshoot the budget by the slowest rule
+    max_time = MARKDOWN_RENDER_TIME_BUDGET * 1.5
+    failures = 0
+
+    for run in range(runs):
+        length = rng.randint(1, 2000)
+        content = "".join(rng.choice(FUZZ_SNIPPETS) for _ in range(length))
+
+        start = time.perf_counter()
+        rendered = markdown.render_markdown_description(content)
+        render_time = time.perf_counter() - start
+
+        problems = []
+        if render_time > max_time:
+            problems.append(f"took {render_time * 1000:.0f} ms")
+        if "<script" in rendered:
+            problems.append("let HTML through")
+        if problems:
+            failures += 1
+            print(f"Run {run} {', '.join(problems)}: {content[:200]!r}")
+
+    print(f"{runs} runs, {failures} failures (seed {seed})")
+    return failures
+
+
+def main():
+    arguments = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = arguments.add_subparsers(dest="command", required=True)
+    bench_arguments = commands.add_parser("bench")
+    bench_arguments.add_argument(
+        "--unguarded",
+        action="store_true",
+        help="Also time the render without the length cap and time budget",
+    )
+    fuzz_arguments = commands.add_parser("fuzz")
+    fuzz_arguments.add_argument("--runs", type=int, default=1000)
+    fuzz_arguments.add_argument("--seed", type=int, default=0)
+    args = arguments.parse_args()
+
+    if args.command == "bench":
+        bench(args.unguarded)
+    elif fuzz(args.runs, args.seed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
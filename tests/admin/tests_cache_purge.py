@@ -0,0 +1,43 @@
+from cache.cache_utility import redis_cache
+from tests.admin.admin_endpoint_testing import TestAdminEndpoints
+
+
+class TestCachePurge(TestAdminEndpoints):
+    def setUp(self):
+        super().setUp()
+        redis_cache.fallback.clear()
+        redis_cache.set("test-purge-a", "value", tags=["snap:a"])
+        redis_cache.set("test-purge-b", "value", tags=["snap:b"])
+
+    def _set_canonical(self, is_canonical):
+        with self.client.session_transaction() as s:
+            s["publisher"] = {**s["publisher"], "is_canonical": is_canonical}
+
+    def test_purge_tags(self):
+        self._set_canonical(True)
+
+        response = self.client.post(
+            "/admin/cache/purge", data={"tags": "snap:a, publisher:a"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"success": True, "purged": 1})
+        self.assertIsNone(redis_cache.get("test-purge-a"))
+        self.assertEqual(redis_cache.get("test-purge-b"), "value")
+
+    def test_purge_without_tags(self):
+        self._set_canonical(True)
+
+        response = self.client.post("/admin/cache/purge", data={"tags": ""})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_purge_requires_admin(self):
+        self._set_canonical(False)
+
+        response = self.client.post(
+            "/admin/cache/purge", data={"tags": "snap:a"}
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(redis_cache.get("test-purge-a"), "value")
@@ -0,0 +1,113 @@
+import time
+import unittest
+
+from webapp.api.circuit_breaker import CircuitBreaker, CircuitBreakers
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(
+            "api.snapcraft.io",
+            failure_rate=0.5,
+            min_calls=4,
+            window=30,
+            reset_timeout=0.05,
+        )
+
+    def test_closed_by_default(self):
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_needs_min_calls_to_open(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_opens_above_failure_rate(self):
+        self.breaker.record_success()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_stays_closed_below_failure_rate(self):
+        for _ in range(3):
+            self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failures_expire_with_the_window(self):
+        self.breaker.window = 0.05
+        for _ in range(3):
+            self.breaker.record_failure()
+        time.sleep(0.1)
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def _open(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+
+    def test_half_open_allows_a_single_trial(self):
+        self._open()
+        time.sleep(0.1)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_successful_trial_closes(self):
+        self._open()
+        time.sleep(0.1)
+        self.breaker.allow_request()
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_lost_trial_expires(self):
+        self._open()
+        time.sleep(0.1)
+        self.breaker.allow_request()
+
+        self.assertFalse(self.breaker.allow_request())
+        time.sleep(0.1)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_released_trial_lets_another_request_through(self):
+        self._open()
+        time.sleep(0.1)
+        self.breaker.allow_request()
+        self.breaker.release_trial()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_trial_opens_again(self):
+        self._open()
+        time.sleep(0.1)
+        self.breaker.allow_request()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+class CircuitBreakersTest(unittest.TestCase):
+    def test_one_breaker_per_host(self):
+        breakers = CircuitBreakers(min_calls=1)
+        breakers.get("api.snapcraft.io").record_failure()
+
+        self.assertIs(
+            breakers.get("api.snapcraft.io"), breakers.get("api.snapcraft.io")
+        )
+        self.assertEqual(
+            breakers.get_states(),
+            {"api.snapcraft.io": CircuitBreaker.OPEN},
+        )
+        self.assertEqual(
+            breakers.get("api.launchpad.net").state, CircuitBreaker.CLOSED
+        )
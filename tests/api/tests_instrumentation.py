@@ -0,0 +1,269 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import responses
+
+from webapp.api import instrumentation
+from webapp.api.circuit_breaker import CircuitBreakers
+from webapp.api.instrumentation import (
+    UpstreamMetrics,
+    get_logical_endpoint,
+    merge_snapshots,
+    render_prometheus,
+)
+from webapp.api.requests import Session
+from webapp.app import create_app
+
+
+class LogicalEndpointTest(unittest.TestCase):
+    def test_known_endpoints(self):
+        self.assertEqual(
+            get_logical_endpoint("api.snapcraft.io", "/v2/snaps/info/toto"),
+            "devicegw_details",
+        )
+        self.assertEqual(
+            get_logical_endpoint(
+                "dashboard.snapcraft.io", "/dev/api/snaps/info/toto"
+            ),
+            "dashboard_snap_info",
+        )
+        self.assertEqual(
+            get_logical_endpoint("api.snapcraft.io", "/v2/unknown"),
+            "devicegw_other",
+        )
+
+    def test_unknown_host(self):
+        self.assertEqual(
+            get_logical_endpoint("example.com", "/v2/snaps/info/toto"),
+            "other",
+        )
+
+
+class UpstreamMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.metrics = UpstreamMetrics(self.directory.name, flush_interval=0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_record_request(self):
+        self.metrics.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", 200, 0.2, 1024
+        )
+        self.metrics.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", "timeout", 12
+        )
+
+        snapshot = self.metrics.snapshot()
+        series = "api.snapcraft.io|devicegw_details"
+
+        self.assertEqual(snapshot["requests"][f"{series}|GET|200"], 1)
+        self.assertEqual(snapshot["requests"][f"{series}|GET|timeout"], 1)
+        self.assertEqual(snapshot["timeouts"][series], 1)
+        self.assertEqual(snapshot["response_bytes"][series], 1024)
+        self.assertEqual(snapshot["durations"][series]["count"], 2)
+        self.assertEqual(snapshot["durations"][series]["buckets"][3], 1)
+        self.assertEqual(snapshot["durations"][series]["buckets"][-1], 1)
+
+    def test_collect_merges_workers(self):
+        self.metrics.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", 200, 0.2
+        )
+
+        breakers = CircuitBreakers(min_calls=1)
+        breakers.get("api.snapcraft.io").record_failure()
+        other_worker = UpstreamMetrics(
+            self.directory.name, circuit_breakers=breakers
+        )
+        other_worker.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", 200, 0.1
+        )
+        with patch("os.getpid", return_value=os.getppid()):
+            other_worker.flush()
+
+        metrics = self.metrics.collect()
+
+        self.assertEqual(
+            metrics["requests"]["api.snapcraft.io|devicegw_details|GET|200"],
+            2,
+        )
+        self.assertEqual(metrics["circuits"], {"api.snapcraft.io": "open"})
+
+    def test_collect_deletes_the_dumps_of_dead_workers(self):
+        breakers = CircuitBreakers(min_calls=1)
+        breakers.get("api.snapcraft.io").record_failure()
+        dead_worker = UpstreamMetrics(
+            self.directory.name, circuit_breakers=breakers
+        )
+        dead_worker.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", 200, 0.1
+        )
+        with patch("os.getpid", return_value=123456789):
+            dead_worker.flush()
+
+        metrics = self.metrics.collect()
+
+        self.assertEqual(metrics["requests"], {})
+        self.assertEqual(metrics["circuits"], {})
+        self.assertFalse(
+            os.path.exists(self.metrics._snapshot_path(123456789))
+        )
+
+    def test_collect_skips_the_circuits_of_old_dumps(self):
+        breakers = CircuitBreakers(min_calls=1)
+        breakers.get("api.snapcraft.io").record_failure()
+        idle_worker = UpstreamMetrics(
+            self.directory.name, circuit_breakers=breakers
+        )
+        idle_worker.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", 200, 0.1
+        )
+        with patch("os.getpid", return_value=os.getppid()), patch(
+            "time.time", return_value=time.time() - 3600
+        ):
+            idle_worker.flush()
+
+        metrics = self.metrics.collect()
+
+        self.assertEqual(
+            metrics["requests"]["api.snapcraft.io|devicegw_details|GET|200"],
+            1,
+        )
+        self.assertEqual(metrics["circuits"], {})
+
+    def test_dumps_have_the_current_circuit_states(self):
+        breakers = CircuitBreakers(min_calls=1, reset_timeout=0.05)
+        self.metrics.circuit_breakers = breakers
+        breaker = breakers.get("api.snapcraft.io")
+        breaker.record_failure()
+        self.metrics.flush()
+        self.assertEqual(
+            self._read_dump()["circuits"], {"api.snapcraft.io": "open"}
+        )
+
+        # Closed again, without the metrics endpoint being served
+        time.sleep(0.1)
+        breaker.allow_request()
+        breaker.record_success()
+        self.metrics.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", 200, 0.1
+        )
+
+        self.assertEqual(
+            self._read_dump()["circuits"], {"api.snapcraft.io": "closed"}
+        )
+
+    def _read_dump(self):
+        with open(self.metrics._snapshot_path(os.getpid())) as dump:
+            return json.load(dump)
+
+    def test_render_prometheus(self):
+        self.metrics.record_request(
+            "api.snapcraft.io", "devicegw_details", "GET", 200, 0.2, 10
+        )
+        self.metrics.record_pool_event("api.snapcraft.io", "hits")
+        self.metrics.circuit_breakers = CircuitBreakers()
+        self.metrics.circuit_breakers.get("api.snapcraft.io")
+
+        output = render_prometheus(merge_snapshots([self.metrics.snapshot()]))
+
+        labels = 'host="api.snapcraft.io",endpoint="devicegw_details"'
+        self.assertIn(
+            "snapcraft_upstream_requests_total{"
+            f'{labels},method="GET",status="200"}} 1',
+            output,
+        )
+        self.assertIn(
+            f"snapcraft_upstream_request_duration_seconds_bucket{{{labels},"
+            'le="0.25"} 1',
+            output,
+        )
+        self.assertIn(
+            f"snapcraft_upstream_request_duration_seconds_bucket{{{labels},"
+            'le="0.1"} 0',
+            output,
+        )
+        self.assertIn(
+            "snapcraft_upstream_pool_connections_total{"
+            'host="api.snapcraft.io",event="hits"} 1',
+            output,
+        )
+        self.assertIn(
+            'snapcraft_upstream_circuit_open{host="api.snapcraft.io"} 0',
+            output,
+        )
+
+
+class SessionInstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.metrics = UpstreamMetrics(self.directory.name)
+        patcher = patch("webapp.api.requests.upstream_metrics", self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+
+    @responses.activate
+    def test_records_upstream_calls(self):
+        url = "https://api.snapcraft.io/v2/snaps/info/toto"
+        responses.add(responses.GET, url, body="{}", status=200)
+
+        Session().get(url)
+
+        snapshot = self.metrics.snapshot()
+        series = "api.snapcraft.io|devicegw_details"
+        self.assertEqual(snapshot["requests"][f"{series}|GET|200"], 1)
+        self.assertEqual(snapshot["response_bytes"][series], 2)
+
+
+class MetricsEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = patch.object(
+            instrumentation.upstream_metrics,
+            "directory",
+            self.directory.name,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        token_patcher = patch("webapp.app.METRICS_TOKEN", "secret")
+        token_patcher.start()
+        self.addCleanup(token_patcher.stop)
+
+        self.client = create_app(testing=True).test_client()
+
+    def test_metrics_endpoint(self):
+        response = self.client.get(
+            "/_status/metrics", headers={"Authorization": "Bearer secret"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/plain", response.content_type)
+        self.assertIn(
+            b"# TYPE snapcraft_upstream_requests_total counter",
+            response.data,
+        )
+
+    def test_metrics_endpoint_requires_the_token(self):
+        response = self.client.get("/_status/metrics")
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(
+            "/_status/metrics", headers={"Authorization": "Bearer wrong"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_metrics_endpoint_is_disabled_without_a_token(self):
+        with patch("webapp.app.METRICS_TOKEN", ""):
+            response = self.client.get(
+                "/_status/metrics", headers={"Authorization": "Bearer "}
+            )
+
+        self.assertEqual(response.status_code, 404)
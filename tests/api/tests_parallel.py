@@ -0,0 +1,52 @@
+import threading
+import time
+import unittest
+
+import flask
+
+from webapp.api.exceptions import ApiTimeoutError
+from webapp.api.parallel import run_parallel
+
+
+class RunParallelTest(unittest.TestCase):
+    def test_calls_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=1)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        results = run_parallel(
+            {name: (lambda name=name: call(name)) for name in "abc"}
+        )
+
+        self.assertEqual(
+            [results.get(name) for name in "abc"], ["a", "b", "c"]
+        )
+
+    def test_failures_are_kept_per_call(self):
+        def fail():
+            raise ValueError("boom")
+
+        results = run_parallel({"ok": lambda: 1, "failing": fail})
+
+        self.assertEqual(results.get("ok"), 1)
+        self.assertRaises(ValueError, results.get, "failing")
+        self.assertEqual(results.get_or_default("failing", 0), 0)
+
+    def test_slow_calls_time_out(self):
+        results = run_parallel(
+            {"fast": lambda: 1, "slow": lambda: time.sleep(0.5)},
+            timeouts={"slow": 0.05},
+        )
+
+        self.assertEqual(results.get("fast"), 1)
+        self.assertRaises(ApiTimeoutError, results.get, "slow")
+
+    def test_request_context_is_available(self):
+        app = flask.Flask(__name__)
+
+        with app.test_request_context("/toto"):
+            results = run_parallel({"path": lambda: flask.request.path})
+
+        self.assertEqual(results.get("path"), "/toto")
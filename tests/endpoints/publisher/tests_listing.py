@@ -3,8 +3,8 @@ from tests.endpoints.endpoint_testing import TestEndpoints
 
 
 class TestGetListingData(TestEndpoints):
-    @patch("webapp.endpoints.publisher.listing.helpers.get_yaml")
-    @patch("webapp.endpoints.publisher.listing.helpers.get_licenses")
+    @patch("webapp.endpoints.publisher.listing.content_registry.get")
+    @patch("webapp.endpoints.publisher.listing.reference_data.licenses")
     @patch("webapp.endpoints.publisher.listing.logic.filter_categories")
     @patch(
         "webapp.endpoints.publisher.listing.logic."
@@ -12,18 +12,18 @@ class TestGetListingData(TestEndpoints):
     )
     @patch("webapp.endpoints.publisher.listing.logic.categorise_media")
     @patch("webapp.endpoints.publisher.listing.get_categories")
-    @patch("webapp.endpoints.publisher.listing.device_gateway")
+    @patch("webapp.endpoints.publisher.listing.reference_data.categories")
     @patch("webapp.endpoints.publisher.listing.dashboard")
     def test_get_listing_data_success(
         self,
         mock_dashboard,
-        mock_device_gateway,
+        mock_categories,
         mock_get_categories,
         mock_categorise_media,
         mock_replace_reserved_categories_key,
         mock_filter_categories,
-        mock_get_licenses,
-        mock_get_yaml,
+        mock_licenses,
+        mock_get_content,
     ):
         # Mock snap details from dashboard
         mock_snap_details = {
@@ -54,11 +54,11 @@ class TestGetListingData(TestEndpoints):
         }
         mock_dashboard.get_snap_info.return_value = mock_snap_details
 
-        # Mock device gateway categories
-        mock_device_gateway.get_categories.return_value = [
-            {"name": "productivity", "slug": "productivity"},
-            {"name": "utilities", "slug": "utilities"},
-        ]
+        # Mock the categories of the store API
+        mock_categories.get.return_value.items = (
+            {"name": "productivity"},
+            {"name": "utilities"},
+        )
 
         # Mock get_categories function
         mock_get_categories.return_value = [
@@ -82,13 +82,13 @@ class TestGetListingData(TestEndpoints):
         }
 
         # Mock licenses
-        mock_get_licenses.return_value = [
-            {"licenseId": "MIT", "name": "MIT License"},
-            {"licenseId": "Apache-2.0", "name": "Apache License 2.0"},
-        ]
+        mock_licenses.get.return_value.items = (
+            {"key": "MIT", "name": "MIT License"},
+            {"key": "Apache-2.0", "name": "Apache License 2.0"},
+        )
 
         # Mock YAML tour steps
-        mock_get_yaml.return_value = [
+        mock_get_content.return_value = [
             {"title": "Welcome", "content": "Welcome to the tour"}
         ]
 
@@ -122,11 +122,11 @@ class TestGetListingData(TestEndpoints):
 
         # Verify mocks were called correctly
         mock_dashboard.get_snap_info.assert_called_once()
-        mock_device_gateway.get_categories.assert_called_once()
+        mock_categories.get.assert_called_once()
         mock_categorise_media.assert_called_once()
 
-    @patch("webapp.endpoints.publisher.listing.helpers.get_yaml")
-    @patch("webapp.endpoints.publisher.listing.helpers.get_licenses")
+    @patch("webapp.endpoints.publisher.listing.content_registry.get")
+    @patch("webapp.endpoints.publisher.listing.reference_data.licenses")
     @patch("webapp.endpoints.publisher.listing.logic.filter_categories")
     @patch(
         "webapp.endpoints.publisher.listing.logic."
@@ -134,18 +134,18 @@ class TestGetListingData(TestEndpoints):
     )
     @patch("webapp.endpoints.publisher.listing.logic.categorise_media")
     @patch("webapp.endpoints.publisher.listing.get_categories")
-    @patch("webapp.endpoints.publisher.listing.device_gateway")
+    @patch("webapp.endpoints.publisher.listing.reference_data.categories")
     @patch("webapp.endpoints.publisher.listing.dashboard")
     def test_get_listing_data_minimal_snap_details(
         self,
         mock_dashboard,
-        mock_device_gateway,
+        mock_categories,
         mock_get_categories,
         mock_categorise_media,
         mock_replace_reserved_categories_key,
         mock_filter_categories,
-        mock_get_licenses,
-        mock_get_yaml,
+        mock_licenses,
+        mock_get_content,
     ):
         # Mock minimal snap details
         mock_snap_details = {
@@ -165,13 +165,13 @@ class TestGetListingData(TestEndpoints):
         mock_dashboard.get_snap_info.return_value = mock_snap_details
 
         # Mock other dependencies with minimal data
-        mock_device_gateway.get_categories.return_value = []
+        mock_categories.get.return_value.items = ()
         mock_get_categories.return_value = []
         mock_categorise_media.return_value = ([], [], [])
         mock_replace_reserved_categories_key.return_value = {"categories": []}
         mock_filter_categories.return_value = {"categories": []}
-        mock_get_licenses.return_value = []
-        mock_get_yaml.return_value = []
+        mock_licenses.get.return_value.items = ()
+        mock_get_content.return_value = []
 
         # Make the request
         response = self.client.get("/api/minimal-snap/listing")
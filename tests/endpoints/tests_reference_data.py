@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+from tests.endpoints.endpoint_testing import TestEndpoints
+from webapp.reference_data import ReferenceList
+
+
+class TestReferenceData(TestEndpoints):
+    def setUp(self):
+        super().setUp()
+        patcher = patch("webapp.reference_data.categories.get")
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get.return_value = ReferenceList(
+            [{"name": "games"}, {"name": "social"}], "name"
+        )
+
+    def test_get_reference_data(self):
+        response = self.client.get("/api/reference-data/categories")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json["data"], [{"name": "games"}, {"name": "social"}]
+        )
+        self.assertEqual(
+            response.headers["ETag"], f'"{self.mock_get.return_value.etag}"'
+        )
+
+    def test_unchanged_reference_data_is_not_sent_again(self):
+        etag = self.client.get("/api/reference-data/categories").headers[
+            "ETag"
+        ]
+
+        response = self.client.get(
+            "/api/reference-data/categories",
+            headers={"If-None-Match": etag},
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+    def test_unknown_reference_data(self):
+        response = self.client.get("/api/reference-data/toto")
+
+        self.assertEqual(response.status_code, 404)
@@ -61,7 +61,7 @@ class TestProvenanceMapCaching(TestEndpoints):
 
     def setUp(self):
         super().setUp()
-        cache_patcher = patch("webapp.endpoints.snaps.redis_cache")
+        cache_patcher = patch("cache.decorators.redis_cache")
         self.cache_patch = cache_patcher.start()
         self.cache_patch.get.return_value = None
         self.addCleanup(cache_patcher.stop)
@@ -105,7 +105,7 @@ class TestAuditableEndpoint(TestEndpoints):
     def setUp(self):
         super().setUp()
         # Force cache miss so build_provenance_map is always exercised.
-        cache_patcher = patch("webapp.endpoints.snaps.redis_cache")
+        cache_patcher = patch("cache.decorators.redis_cache")
         self.cache_patch = cache_patcher.start()
         self.cache_patch.get.return_value = None
         self.addCleanup(cache_patcher.stop)
@@ -339,7 +339,7 @@ class TestAuditableEndpoint(TestEndpoints):
 class TestAuditableRevisionsEndpoint(TestEndpoints):
     def setUp(self):
         super().setUp()
-        self.cache_patch = patch("webapp.endpoints.snaps.redis_cache").start()
+        self.cache_patch = patch("cache.decorators.redis_cache").start()
         self.cache_patch.get.return_value = None
         # Real HTTP; keep it off the network.
         self.public_patch = patch(
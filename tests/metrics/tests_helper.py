@@ -0,0 +1,28 @@
+import datetime
+import unittest
+
+from freezegun import freeze_time
+
+import webapp.metrics.helper as helper
+
+
+class MetricsProcessedDateTest(unittest.TestCase):
+    @freeze_time("2024-05-15 10:00:00")
+    def test_last_processed_date(self):
+        self.assertEqual(
+            helper.get_last_metrics_processed_date(),
+            datetime.date(2024, 5, 14),
+        )
+
+    @freeze_time("2024-05-15 10:00:00")
+    def test_seconds_to_next_processed_date(self):
+        # Next change at 3am on the 16th
+        self.assertEqual(
+            helper.get_seconds_to_next_metrics_processed_date(), 17 * 3600
+        )
+
+    @freeze_time("2024-05-15 02:00:00")
+    def test_seconds_to_next_processed_date_before_3am(self):
+        self.assertEqual(
+            helper.get_seconds_to_next_metrics_processed_date(), 3600
+        )
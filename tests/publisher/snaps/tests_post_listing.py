@@ -1,6 +1,7 @@
 import json
 
 import responses
+from cache.cache_utility import redis_cache
 from tests.publisher.endpoint_testing import BaseTestCases
 
 
@@ -79,6 +80,21 @@ class PostMetadataListingPage(BaseTestCases.EndpointLoggedIn):
 
         assert response.status_code == 200
 
+    @responses.activate
+    def test_update_purges_snap_cache(self):
+        redis_cache.set("test-listing", "value", tags=["snap:test-snap"])
+        responses.add(responses.PUT, self.api_url, json={}, status=200)
+
+        changes = {"description": "New description"}
+
+        response = self.client.post(
+            self.endpoint_url,
+            data={"changes": json.dumps(changes), "snap_id": self.snap_id},
+        )
+
+        assert response.status_code == 200
+        assert redis_cache.get("test-listing") is None
+
     @responses.activate
     def test_update_description_with_carriage_return(self):
         responses.add(responses.PUT, self.api_url, json={}, status=200)
@@ -1,5 +1,10 @@
 import responses
+from cache.cache_utility import redis_cache
 from tests.publisher.endpoint_testing import BaseTestCases
+from webapp.endpoints.utils import (
+    get_snap_cache_tag,
+    get_snap_not_found_cache_key,
+)
 
 
 class PostReleasePageNotAuth(BaseTestCases.EndpointLoggedOut):
@@ -98,6 +103,35 @@ class PostDataReleasePage(BaseTestCases.EndpointLoggedIn):
 
         assert response.json == payload
 
+    @responses.activate
+    def test_post_data_purges_snap_cache(self):
+        not_found_key = get_snap_not_found_cache_key(self.snap_name)
+        redis_cache.set(
+            not_found_key,
+            "no-channel-map",
+            ttl=300,
+            tags=[get_snap_cache_tag(self.snap_name)],
+        )
+
+        responses.add(
+            responses.POST,
+            self.api_url,
+            json={"success": True, "channel_map": []},
+            status=200,
+        )
+
+        response = self.client.post(
+            self.endpoint_url,
+            json={
+                "name": self.snap_name,
+                "revision": "1",
+                "channels": ["stable"],
+            },
+        )
+
+        assert response.status_code == 200
+        assert redis_cache.get(not_found_key) is None
+
     @responses.activate
     def test_return_error(self):
         api_payload = {"error_list": [{"code": "code", "name": ["message"]}]}
@@ -0,0 +1,98 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from webapp.app import create_app
+from webapp.store.cache_warmup import get_warmup_paths, warm_paths
+
+POPULAR_PATH = "webapp.store.cache_warmup.get_popular_snaps"
+REDIS_AVAILABLE_PATH = "webapp.store.cache_warmup.redis_cache.redis_available"
+
+POPULAR_SNAPS = [
+    {"details": {"name": "firefox"}},
+    {"details": {"name": "vlc"}},
+    {"details": {"name": "code"}},
+]
+
+
+class GetWarmupPathsTest(TestCase):
+    @patch(POPULAR_PATH, return_value=POPULAR_SNAPS)
+    def test_top_snaps(self, mock_get_popular_snaps):
+        paths = get_warmup_paths(2)
+
+        self.assertEqual(
+            paths,
+            [
+                "/store",
+                "/store/stats",
+                "/publisher/kde",
+                "/publisher/snapcrafters",
+                "/publisher/jetbrains",
+                "/firefox",
+                "/vlc",
+                "/install/firefox/ubuntu",
+            ],
+        )
+
+    @patch(
+        POPULAR_PATH,
+        side_effect=requests.exceptions.ConnectionError("unavailable"),
+    )
+    def test_popular_snaps_unavailable(self, mock_get_popular_snaps):
+        paths = get_warmup_paths(20)
+
+        self.assertNotIn("/firefox", paths)
+        self.assertIn("/store", paths)
+        self.assertIn("/publisher/kde", paths)
+
+
+class WarmCommandTest(TestCase):
+    def setUp(self):
+        self.app = create_app(testing=True)
+
+    def test_warm_paths(self):
+        results = warm_paths(
+            self.app, ["/_status/check", "/no/such/page"], concurrency=2
+        )
+
+        self.assertEqual(
+            results, {"/_status/check": 200, "/no/such/page": 404}
+        )
+
+    @patch(REDIS_AVAILABLE_PATH, False)
+    def test_without_redis(self):
+        runner = self.app.test_cli_runner()
+
+        with patch("webapp.store.cache_warmup.warm_paths") as mock_warm:
+            result = runner.invoke(args=["cache", "warm"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_warm.assert_not_called()
+
+    @patch(REDIS_AVAILABLE_PATH, True)
+    @patch(POPULAR_PATH, return_value=POPULAR_SNAPS)
+    def test_warm(self, mock_get_popular_snaps):
+        runner = self.app.test_cli_runner()
+
+        with patch("webapp.store.cache_warmup.warm_paths") as mock_warm:
+            mock_warm.return_value = {"/store": 200, "/firefox": 200}
+            result = runner.invoke(args=["cache", "warm", "--top-snaps", "1"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("200 /firefox", result.output)
+        paths = mock_warm.call_args[0][1]
+        self.assertIn("/firefox", paths)
+        self.assertNotIn("/vlc", paths)
+
+    @patch(REDIS_AVAILABLE_PATH, True)
+    @patch(POPULAR_PATH, return_value=POPULAR_SNAPS)
+    def test_warm_reports_failures(self, mock_get_popular_snaps):
+        runner = self.app.test_cli_runner()
+
+        with patch("webapp.store.cache_warmup.warm_paths") as mock_warm:
+            mock_warm.return_value = {"/store": 500, "/firefox": None}
+            result = runner.invoke(args=["cache", "warm"])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("2 of 2 pages failed to warm up", result.output)
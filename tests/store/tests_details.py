@@ -5,6 +5,7 @@ from flask_testing import TestCase
 from webapp.app import create_app
 from unittest.mock import patch
 from cache.cache_utility import redis_cache
+from webapp.api.exceptions import ApiCircuitOpenError
 
 POPULAR_PATH = "webapp.store.views.snap_recommendations.get_popular"
 RECENT_PATH = "webapp.store.views.snap_recommendations.get_recent"
@@ -389,6 +390,67 @@ class GetDetailsPageTest(TestCase):
 
         assert response.status_code == 502
 
+    @responses.activate
+    def test_api_500_serves_stale_details(self):
+        redis_cache.set_stale(f"snap-details:{self.snap_name}", SNAP_PAYLOAD)
+        responses.add(
+            responses.Response(method="GET", url=self.api_url, status=500)
+        )
+        responses.add(
+            responses.Response(
+                method="HEAD", url=self.api_url_sboms, json={}, status=200
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="POST",
+                url="https://api.snapcraft.io/api/v1/snaps/metrics",
+                json={},
+                status=200,
+            )
+        )
+
+        response = self.client.get(self.endpoint_url)
+
+        assert response.status_code == 200
+        self.assert_context("snap_title", "Snap Title")
+
+    @responses.activate
+    def test_failing_secondary_calls_do_not_break_the_page(self):
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=SNAP_PAYLOAD, status=200
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="HEAD", url=self.api_url_sboms, status=500
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="POST",
+                url="https://api.snapcraft.io/api/v1/snaps/metrics",
+                status=500,
+            )
+        )
+
+        response = self.client.get(self.endpoint_url)
+
+        assert response.status_code == 200
+        self.assert_context("countries", None)
+        self.assert_context("normalized_os", None)
+        self.assert_context("has_sboms", False)
+
+    def test_open_circuit_returns_503(self):
+        with patch(
+            "webapp.store.snap_details_views.device_gateway.get_item_details",
+            side_effect=ApiCircuitOpenError("api.snapcraft.io is failing"),
+        ):
+            response = self.client.get(self.endpoint_url)
+
+        assert response.status_code == 503
+
     @responses.activate
     def test_no_channel_map(self):
         payload = {
@@ -431,6 +493,56 @@ class GetDetailsPageTest(TestCase):
 
         assert response.status_code == 404
 
+    @responses.activate
+    def test_api_404_is_remembered(self):
+        payload = {"error-list": [{"code": "resource-not-found"}]}
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=payload, status=404
+            )
+        )
+
+        first_response = self.client.get(self.endpoint_url)
+        second_response = self.client.get(self.endpoint_url)
+
+        assert first_response.status_code == 404
+        assert second_response.status_code == 404
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_quarantined_snap_is_remembered(self):
+        payload = copy.deepcopy(SNAP_PAYLOAD)
+        payload["snap"]["publisher"]["username"] = "snap-quarantine"
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=payload, status=200
+            )
+        )
+
+        first_response = self.client.get(self.endpoint_url)
+        second_response = self.client.get(self.endpoint_url)
+
+        assert first_response.status_code == 404
+        assert second_response.status_code == 404
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_no_channel_map_is_remembered(self):
+        payload = copy.deepcopy(SNAP_PAYLOAD)
+        payload["channel-map"] = []
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=payload, status=200
+            )
+        )
+
+        first_response = self.client.get(self.endpoint_url)
+        second_response = self.client.get(self.endpoint_url)
+
+        assert first_response.status_code == 404
+        assert second_response.status_code == 404
+        assert len(responses.calls) == 1
+
     @responses.activate
     def test_user_connected(self):
         payload = SNAP_PAYLOAD
@@ -473,6 +585,195 @@ class GetDetailsPageTest(TestCase):
         self.assert200(response)
         self.assert_context("is_users_snap", True)
 
+    @responses.activate
+    def test_shared_context_is_cached(self):
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=SNAP_PAYLOAD, status=200
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="GET",
+                url=self.api_url_details,
+                json=EMPTY_EXTRA_DETAILS_PAYLOAD,
+                status=200,
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="HEAD", url=self.api_url_sboms, json={}, status=200
+            )
+        )
+        metrics_url = "https://api.snapcraft.io/api/v1/snaps/metrics"
+        responses.add(
+            responses.Response(
+                method="POST", url=metrics_url, json={}, status=200
+            )
+        )
+
+        self.client.get(self.endpoint_url)
+        self.client.get(self.endpoint_url + "/badge.svg")
+        self.client.get(self.endpoint_url + "/embedded")
+
+        with self.client.session_transaction() as s:
+            s["publisher"] = {"nickname": "toto", "fullname": "Totinio"}
+            s["macaroon_exchanged"] = "test"
+            s["user_snaps"] = {"toto": {"snap-id": "test"}}
+
+        response = self.client.get(self.endpoint_url)
+
+        self.assert200(response)
+        self.assert_context("snap_title", "Snap Title")
+        self.assert_context("is_users_snap", True)
+        info_calls = [
+            call
+            for call in responses.calls
+            if call.request.url == self.api_url
+        ]
+        self.assertEqual(len(info_calls), 1)
+
+    @responses.activate
+    def test_public_metrics_are_cached(self):
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=SNAP_PAYLOAD, status=200
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="GET",
+                url=self.api_url_details,
+                json=EMPTY_EXTRA_DETAILS_PAYLOAD,
+                status=200,
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="HEAD", url=self.api_url_sboms, json={}, status=200
+            )
+        )
+        metrics_url = "https://api.snapcraft.io/api/v1/snaps/metrics"
+        metrics_payload = [
+            {
+                "metric_name": "weekly_installed_base_by_country_percent",
+                "series": [{"name": "FR", "values": [100]}],
+                "buckets": ["2024-05-14"],
+                "status": "OK",
+            },
+            {
+                "metric_name": (
+                    "weekly_installed_base_by_operating_system_normalized"
+                ),
+                "series": [{"name": "ubuntu/24.04", "values": [1]}],
+                "buckets": ["2024-05-14"],
+                "status": "OK",
+            },
+        ]
+        responses.add(
+            responses.Response(
+                method="POST", url=metrics_url, json=metrics_payload
+            )
+        )
+
+        self.client.get(self.endpoint_url)
+        # Another User-Agent to get a new render rather than the cached page
+        response = self.client.get(
+            self.endpoint_url, headers={"User-Agent": "X11; Linux x86_64"}
+        )
+
+        self.assert200(response)
+        countries = self.get_context_variable("countries")
+        self.assertEqual(countries["250"]["percentage_of_users"], 100)
+        self.assertEqual(
+            self.get_context_variable("normalized_os"),
+            [{"name": "Ubuntu 24.04", "value": 1}],
+        )
+        metrics_calls = [
+            call for call in responses.calls if call.request.url == metrics_url
+        ]
+        self.assertEqual(len(metrics_calls), 1)
+
+    def add_snap_page_responses(self):
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=SNAP_PAYLOAD, status=200
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="GET",
+                url=self.api_url_details,
+                json=EMPTY_EXTRA_DETAILS_PAYLOAD,
+                status=200,
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="HEAD", url=self.api_url_sboms, json={}, status=200
+            )
+        )
+        responses.add(
+            responses.Response(
+                method="POST",
+                url="https://api.snapcraft.io/api/v1/snaps/metrics",
+                json={},
+                status=200,
+            )
+        )
+
+    @responses.activate
+    def test_page_is_cached_for_anonymous_visitors(self):
+        self.add_snap_page_responses()
+
+        first = self.client.get(self.endpoint_url)
+        calls_count = len(responses.calls)
+        second = self.client.get(self.endpoint_url)
+
+        self.assert200(second)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(len(responses.calls), calls_count)
+
+        response = self.client.get(
+            self.endpoint_url, headers={"User-Agent": "X11; Linux x86_64"}
+        )
+
+        self.assert200(response)
+        self.assert_context("is_linux", True)
+        self.assertGreater(len(responses.calls), calls_count)
+
+    @responses.activate
+    def test_page_is_not_cached_for_logged_in_users(self):
+        self.add_snap_page_responses()
+
+        with self.client.session_transaction() as s:
+            s["publisher"] = {"nickname": "toto", "fullname": "Totinio"}
+            s["macaroon_exchanged"] = "test"
+            s["user_snaps"] = {}
+
+        self.client.get(self.endpoint_url)
+        calls_count = len(responses.calls)
+        response = self.client.get(self.endpoint_url)
+
+        self.assert200(response)
+        self.assert_context("snap_title", "Snap Title")
+        self.assertGreater(len(responses.calls), calls_count)
+
+    @responses.activate
+    def test_cached_page_is_purged_with_the_snap(self):
+        self.add_snap_page_responses()
+
+        self.client.get(self.endpoint_url)
+        redis_cache.invalidate_tags("snap:toto")
+        self.client.get(self.endpoint_url)
+
+        info_calls = [
+            call
+            for call in responses.calls
+            if call.request.url == self.api_url
+        ]
+        self.assertEqual(len(info_calls), 2)
+
     @responses.activate
     def test_user_not_connected(self):
         payload = SNAP_PAYLOAD
@@ -721,6 +1022,37 @@ class GetDetailsPageTest(TestCase):
                                     )
                                 )
 
+    def test_explore_serves_stale_data_when_upstream_fails(self):
+        popular = [
+            {
+                "details": {
+                    "name": "/pop1",
+                    "icon": "",
+                    "title": "Pop 1",
+                    "publisher": "Pub 1",
+                    "developer_validation": None,
+                    "summary": "Popular snap",
+                },
+            }
+        ]
+        redis_cache.set_stale("explore:popular-snaps", popular)
+        error = ApiCircuitOpenError("recommendations.snapcraft.io failing")
+
+        with patch(POPULAR_PATH, side_effect=error), patch(
+            RECENT_PATH, side_effect=error
+        ), patch(TREND_PATH, side_effect=error), patch(
+            TOP_PATH, side_effect=error
+        ), patch(
+            CATEGORIES_PATH, side_effect=error
+        ), patch(
+            FEATURED_PATH, return_value={}
+        ):
+            response = self.client.get("/store")
+
+        self.assert200(response)
+        self.assert_context("popular_snaps", popular)
+        self.assert_context("recent_snaps", [])
+
     @responses.activate
     def test_explore_populates_cache_when_empty(self):
         """When Redis cache is empty, the recommendation/device methods
@@ -2,6 +2,7 @@ import responses
 from urllib.parse import urlencode
 from webapp.app import create_app
 from flask_testing import TestCase
+from cache.cache_utility import redis_cache
 
 
 class GetDistroPageTest(TestCase):
@@ -45,6 +46,7 @@ class GetDistroPageTest(TestCase):
 
     def setUp(self):
         super().setUp()
+        redis_cache.fallback.clear()
         self.snap_name = "toto"
         self.api_url = "".join(
             [
@@ -1,7 +1,9 @@
 import responses
+from unittest.mock import patch
 from urllib.parse import urlencode
 from webapp.app import create_app
 from flask_testing import TestCase
+from cache.cache_utility import redis_cache
 
 
 class GetGitHubBadgeTest(TestCase):
@@ -59,6 +61,7 @@ class GetGitHubBadgeTest(TestCase):
 
     def setUp(self):
         super().setUp()
+        redis_cache.fallback.clear()
         self.snap_name = "toto"
         self.api_url = "".join(
             [
@@ -165,6 +168,109 @@ class GetGitHubBadgeTest(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    @responses.activate
+    def test_badge_etag(self):
+        responses.add(
+            responses.Response(
+                method="GET",
+                url=self.api_url,
+                json=self.snap_payload,
+                status=200,
+            )
+        )
+
+        response = self.client.get(self.badge_url)
+        etag = response.headers["ETag"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(etag.startswith("W/"))
+
+        response = self.client.get(
+            self.badge_url, headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+
+        response = self.client.get(
+            self.badge_url + "?name=0", headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_badge_is_rendered_once(self):
+        responses.add(
+            responses.Response(
+                method="GET",
+                url=self.api_url,
+                json=self.snap_payload,
+                status=200,
+            )
+        )
+
+        with patch(
+            "webapp.store.snap_details_views.badge", return_value="<svg/>"
+        ) as mock_badge:
+            first_response = self.client.get(self.badge_url)
+            second_response = self.client.get(self.badge_url)
+
+        self.assertEqual(first_response.get_data(as_text=True), "<svg/>")
+        self.assertEqual(second_response.get_data(as_text=True), "<svg/>")
+        mock_badge.assert_called_once()
+
+    @responses.activate
+    def test_badge_etag_is_written_once(self):
+        responses.add(
+            responses.Response(
+                method="GET",
+                url=self.api_url,
+                json=self.snap_payload,
+                status=200,
+            )
+        )
+
+        with patch.object(
+            redis_cache, "set", wraps=redis_cache.set
+        ) as mock_set:
+            self.client.get(self.badge_url)
+            self.client.get(self.badge_url)
+
+        etag_writes = [
+            call
+            for call in mock_set.call_args_list
+            if call.args[0][0].startswith("badge-etag:")
+        ]
+        self.assertEqual(len(etag_writes), 1)
+
+    @responses.activate
+    def test_badges_with_the_same_text_link_to_their_snap(self):
+        for snap_name in ["alpha", "beta"]:
+            responses.add(
+                responses.Response(
+                    method="GET",
+                    url=self.api_url.replace(self.snap_name, snap_name),
+                    json=self.snap_payload,
+                    status=200,
+                )
+            )
+
+        alpha_response = self.client.get("/alpha/badge.svg")
+        beta_response = self.client.get("/beta/badge.svg")
+
+        self.assertNotEqual(
+            alpha_response.headers["ETag"], beta_response.headers["ETag"]
+        )
+        self.assertIn(
+            'href="http://localhost/beta"',
+            beta_response.get_data(as_text=True),
+        )
+        self.assertNotIn(
+            "http://localhost/alpha", beta_response.get_data(as_text=True)
+        )
+
     @responses.activate
     def test_get_trending_empty(self):
         payload = self.snap_payload
@@ -264,6 +264,106 @@ class StoreLogicTest(unittest.TestCase):
         )["confinement"]
         self.assertEqual(no_version, None)
 
+    # ChannelMap
+    # ===
+    def _channel_map_entry(self, arch, track, risk, revision, released_at):
+        return {
+            "channel": {
+                "name": f"{track}/{risk}",
+                "architecture": arch,
+                "track": track,
+                "risk": risk,
+                "released-at": released_at,
+            },
+            "confinement": "strict",
+            "download": {"size": 100},
+            "version": f"{revision}.0",
+            "revision": revision,
+        }
+
+    def _get_channel_map(self):
+        return [
+            self._channel_map_entry(
+                "arm64", "latest", "edge", 5, "2023-03-01"
+            ),
+            self._channel_map_entry(
+                "amd64", "latest", "edge", 4, "2023-03-01"
+            ),
+            self._channel_map_entry(
+                "amd64", "latest", "beta", 3, "2023-02-01"
+            ),
+            self._channel_map_entry("amd64", "2.0", "stable", 2, "2023-01-01"),
+            self._channel_map_entry("arm64", "2.0", "stable", 1, "2023-01-02"),
+        ]
+
+    def test_channel_map_matches_the_module_functions(self):
+        raw_channel_map = self._get_channel_map()
+        channel_map = logic.ChannelMap(raw_channel_map)
+        converted = logic.convert_channel_maps(raw_channel_map)
+
+        self.assertEqual(channel_map.by_architecture, converted)
+        self.assertEqual(channel_map.architectures, ["arm64", "amd64"])
+        self.assertEqual(
+            channel_map.revisions, logic.get_revisions(raw_channel_map)
+        )
+        self.assertEqual(
+            channel_map.last_updated_release,
+            logic.get_last_updated_version(raw_channel_map),
+        )
+        self.assertEqual(channel_map.has_stable, logic.has_stable(converted))
+        for track in ["latest", "2.0", "missing"]:
+            lowest_risk = channel_map.get_lowest_available_risk(track)
+            self.assertEqual(
+                lowest_risk, logic.get_lowest_available_risk(converted, track)
+            )
+            self.assertEqual(
+                channel_map.extract_info(track, lowest_risk),
+                logic.extract_info_channel_map(converted, track, lowest_risk),
+            )
+            self.assertEqual(
+                channel_map.get_latest_versions(track, lowest_risk),
+                logic.get_latest_versions(raw_channel_map, track, lowest_risk),
+            )
+
+    def test_channel_map_without_stable(self):
+        channel_map = logic.ChannelMap(self._get_channel_map()[:3])
+
+        self.assertFalse(channel_map.has_stable)
+        self.assertEqual(channel_map.last_updated_release["revision"], 5)
+        self.assertEqual(
+            channel_map.get_lowest_available_risk("latest"), "beta"
+        )
+
+    def test_channel_map_get_release(self):
+        channel_map = logic.ChannelMap(self._get_channel_map())
+
+        release = channel_map.get_release("amd64", "latest", "beta")
+
+        self.assertEqual(release["revision"], 3)
+        self.assertIsNone(channel_map.get_release("amd64", "2.0", "edge"))
+        self.assertIsNone(channel_map.get_release("s390x", "2.0", "stable"))
+
+    def test_channel_map_latest_versions_keep_the_channel_map(self):
+        raw_channel_map = self._get_channel_map()
+        channel_map = logic.ChannelMap(raw_channel_map)
+
+        default, other = channel_map.get_latest_versions(
+            "2.0", "stable", supported_architectures=["amd64"]
+        )
+
+        self.assertEqual(default["released-at-display"], "1 January 2023")
+        self.assertEqual(other["released-at-display"], "1 March 2023")
+        self.assertEqual(other["architecture"], "amd64")
+        self.assertNotIn("released-at-display", raw_channel_map[3]["channel"])
+
+    def test_empty_channel_map_index(self):
+        channel_map = logic.ChannelMap(None)
+
+        self.assertEqual(channel_map.by_architecture, {})
+        self.assertEqual(channel_map.revisions, [])
+        self.assertIsNone(channel_map.last_updated_release)
+        self.assertIsNone(channel_map.get_lowest_available_risk("latest"))
+
     def test_get_categories(self):
         categories = {
             "categories": [
@@ -0,0 +1,157 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import responses
+from flask_testing import TestCase
+
+from cache.cache_utility import redis_cache
+from webapp.app import create_app
+from webapp.store import sboms
+
+SBOM_URL = (
+    "https://api.snapcraft.io/api/v1/sboms/download/"
+    "sbom_snap_id_1.spdx2.3.json"
+)
+SBOM_BODY = b'{"spdxVersion": "SPDX-2.3",  "name": "toto"}'
+
+
+class SbomExistsTest(TestCase):
+    def create_app(self):
+        app = create_app(testing=True)
+        app.secret_key = "secret_key"
+        return app
+
+    def setUp(self):
+        super().setUp()
+        redis_cache.fallback.clear()
+
+    @responses.activate
+    def test_sbom_exists_is_cached(self):
+        responses.add(responses.HEAD, SBOM_URL, status=302)
+
+        self.assertTrue(sboms.sbom_exists("id", 1))
+        self.assertTrue(sboms.sbom_exists("id", 1))
+
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_missing_sbom_is_remembered(self):
+        responses.add(responses.HEAD, SBOM_URL, status=404)
+
+        self.assertFalse(sboms.sbom_exists("id", 1))
+        self.assertFalse(sboms.sbom_exists("id", 1))
+
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_failed_check_is_not_cached(self):
+        responses.add(responses.HEAD, SBOM_URL, status=503)
+        responses.add(responses.HEAD, SBOM_URL, status=200)
+
+        with self.assertRaises(sboms.ApiResponseError):
+            sboms.sbom_exists("id", 1)
+        self.assertTrue(sboms.sbom_exists("id", 1))
+
+    def test_snap_without_revisions(self):
+        self.assertFalse(sboms.snap_has_sboms([], "id"))
+
+
+class StreamSbomTest(TestCase):
+    endpoint_url = "/download/sbom_snap_id_1.spdx2.3.json"
+
+    def create_app(self):
+        app = create_app(testing=True)
+        app.secret_key = "secret_key"
+        return app
+
+    @responses.activate
+    def test_sbom_is_forwarded_unchanged(self):
+        responses.add(
+            responses.GET,
+            SBOM_URL,
+            body=SBOM_BODY,
+            content_type="application/json",
+        )
+
+        response = self.client.get(self.endpoint_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, SBOM_BODY)
+        self.assertEqual(response.mimetype, "application/json")
+
+    @responses.activate
+    def test_missing_sbom(self):
+        responses.add(responses.GET, SBOM_URL, status=404, body=b"")
+
+        response = self.client.get(self.endpoint_url)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_revision(self):
+        response = self.client.get("/download/sbom_snap_id_x.spdx2.3.json")
+
+        self.assertEqual(response.status_code, 404)
+
+    @responses.activate
+    def test_sbom_is_kept_on_disk(self):
+        responses.add(responses.GET, SBOM_URL, body=SBOM_BODY)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch("webapp.store.sboms.SBOM_CACHE_DIR", cache_dir):
+                first = self.client.get(self.endpoint_url)
+                second = self.client.get(self.endpoint_url)
+
+                self.assertEqual(first.data, SBOM_BODY)
+                self.assertEqual(second.data, SBOM_BODY)
+                second.close()
+                self.assertEqual(
+                    os.listdir(cache_dir), ["sbom_snap_id_1.spdx2.3.json"]
+                )
+
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_failed_download_is_not_kept(self):
+        responses.add(responses.GET, SBOM_URL, status=500, body=b"error")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch("webapp.store.sboms.SBOM_CACHE_DIR", cache_dir):
+                response = self.client.get(self.endpoint_url)
+
+                self.assertEqual(response.status_code, 500)
+                self.assertEqual(os.listdir(cache_dir), [])
+
+    @responses.activate
+    def test_sboms_on_disk_are_capped(self):
+        responses.add(responses.GET, SBOM_URL, body=SBOM_BODY)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            old_path = os.path.join(cache_dir, "sbom_snap_old_1.spdx2.3.json")
+            with open(old_path, "wb") as old_file:
+                old_file.write(SBOM_BODY)
+            os.utime(old_path, (0, 0))
+
+            with patch("webapp.store.sboms.SBOM_CACHE_DIR", cache_dir), patch(
+                "webapp.store.sboms.SBOM_CACHE_MAX_BYTES", len(SBOM_BODY)
+            ):
+                response = self.client.get(self.endpoint_url)
+
+                self.assertEqual(response.data, SBOM_BODY)
+                self.assertEqual(
+                    os.listdir(cache_dir), ["sbom_snap_id_1.spdx2.3.json"]
+                )
+
+    @responses.activate
+    def test_upstream_response_is_closed_without_reading_it(self):
+        responses.add(responses.GET, SBOM_URL, body=SBOM_BODY)
+
+        with patch.object(
+            sboms, "_forward", return_value=iter([])
+        ) as mock_forward:
+            response = self.client.head(self.endpoint_url)
+            response.close()
+
+        self.assertEqual(response.status_code, 200)
+        res = mock_forward.call_args.args[0]
+        self.assertTrue(res.raw.closed)
@@ -2,6 +2,7 @@ import responses
 from unittest.mock import patch
 from flask import render_template
 from flask_testing import TestCase
+from cache.cache_utility import redis_cache
 from webapp.app import create_app
 
 SNAP_FIND_RESPONSE = {
@@ -26,6 +27,10 @@ SNAP_FIND_RESPONSE = {
 
 
 class StatusBannerTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        redis_cache.fallback.clear()
+
     def create_app(self):
         app = create_app(testing=True)
         app.secret_key = "secret_key"
@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import flask
+from flask_wtf.csrf import CSRFProtect
+
+from cache.cache_utility import redis_cache
+from webapp.decorators import add_page_cache_tags, cached_page
+
+
+class TestCachedPage(TestCase):
+    """
+    Pages of `cached_page` views are rendered once for all anonymous
+    visitors, but each of them keeps their own CSRF token.
+    """
+
+    def setUp(self):
+        redis_cache.fallback.clear()
+        self.renders = []
+
+        app = flask.Flask(__name__)
+        app.secret_key = "secret_key"
+        CSRFProtect(app)
+
+        @app.route("/<name>")
+        @cached_page(tags=["snap:{name}"])
+        def page(name):
+            self.renders.append(name)
+            add_page_cache_tags("publisher:toto")
+            return flask.render_template_string(
+                "{{ name }} {{ csrf_token() }}", name=name
+            )
+
+        @app.route("/big/<name>")
+        @cached_page()
+        def big_page(name):
+            self.renders.append(name)
+            return "x" * 1024 * 1024
+
+        self.app = app
+
+    def test_page_is_rendered_once(self):
+        first = self.app.test_client().get("/toto")
+        second = self.app.test_client().get("/toto")
+
+        self.assertEqual(self.renders, ["toto"])
+        self.assertTrue(second.text.startswith("toto "))
+        # Each visitor gets the CSRF token of their session
+        self.assertNotEqual(first.text, second.text)
+        self.assertNotIn("__page_cache_csrf_token__", second.text)
+
+    def test_logged_in_users_get_fresh_renders(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["publisher"] = {"nickname": "toto"}
+
+        client.get("/toto")
+        client.get("/toto")
+
+        self.assertEqual(self.renders, ["toto", "toto"])
+
+    def test_page_is_purged_with_its_tags(self):
+        client = self.app.test_client()
+
+        client.get("/toto")
+        redis_cache.invalidate_tags("publisher:toto")
+        client.get("/toto")
+
+        self.assertEqual(self.renders, ["toto", "toto"])
+
+    def test_big_pages_are_not_cached(self):
+        client = self.app.test_client()
+
+        client.get("/big/toto")
+        client.get("/big/toto")
+
+        self.assertEqual(self.renders, ["toto", "toto"])
@@ -0,0 +1,567 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import flask
+import redis
+
+from cache.cache_utility import SnapcraftCache, redis_cache
+from cache import serialization
+from cache.decorators import cached
+from cache.local_cache import LocalCache
+from webapp.api.exceptions import ApiFetchInProgressError
+from webapp.api.instrumentation import UpstreamMetrics
+
+
+class LocalCacheTest(unittest.TestCase):
+    def test_get_set(self):
+        cache = LocalCache(maxsize=10, max_bytes=1000, ttl=60)
+        cache.set("key", "value")
+
+        self.assertEqual(cache.get("key"), "value")
+        self.assertIsNone(cache.get("other"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_entries_expire(self):
+        cache = LocalCache(maxsize=10, max_bytes=1000, ttl=0.01)
+        cache.set("key", "value")
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = LocalCache(maxsize=2, max_bytes=1000, ttl=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_memory_cap(self):
+        cache = LocalCache(maxsize=10, max_bytes=9, ttl=60)
+        cache.set("a", "1234")
+        cache.set("b", "1234")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.size_bytes, 5)
+
+        # Values which can't fit at all aren't kept
+        cache.set("c", "12345678901")
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(cache.size_bytes, 5)
+
+
+class SnapcraftCacheL1Test(unittest.TestCase):
+    def setUp(self):
+        with patch(
+            "canonicalwebteam.stores_web_redis.utility.redis.Redis"
+        ) as redis_client:
+            self.client = redis_client.return_value
+            self.cache = SnapcraftCache(
+                namespace="test",
+                maxsize=10,
+                l1=LocalCache(maxsize=10, max_bytes=1000, ttl=60),
+            )
+        self.app = flask.Flask(__name__)
+
+    def test_reads_hit_redis_once(self):
+        self.client.get.return_value = '{"a": 1}'
+
+        self.assertEqual(self.cache.get("key", expected_type=dict), {"a": 1})
+        self.assertEqual(self.cache.get("key", expected_type=dict), {"a": 1})
+        self.client.get.assert_called_once_with("test:key")
+
+    def test_subscribes_to_invalidations(self):
+        self.client.get.return_value = "value"
+        self.cache.get("key")
+
+        pubsub = self.client.pubsub.return_value
+        pubsub.subscribe.assert_called_once()
+        handler = pubsub.subscribe.call_args.kwargs["test:invalidate"]
+
+        handler({"data": "test:key"})
+        self.client.get.return_value = "new value"
+
+        self.assertEqual(self.cache.get("key"), "new value")
+
+    def test_delete_publishes_invalidation(self):
+        self.client.get.return_value = "value"
+        self.cache.get("key")
+
+        self.cache.delete("key")
+
+        self.client.publish.assert_called_once_with(
+            "test:invalidate", "test:key"
+        )
+        self.assertIsNone(self.cache.l1.get("test:key"))
+
+    def test_set_drops_local_copy(self):
+        self.client.get.return_value = "value"
+        self.cache.get("key")
+
+        self.cache.set("key", "new value")
+
+        self.assertIsNone(self.cache.l1.get("test:key"))
+
+    def test_prefetch_reads_keys_at_once(self):
+        self.client.mget.return_value = ['["a"]', None, None] + [None] * 3
+
+        with self.app.test_request_context():
+            self.cache.prefetch(["first", "second"])
+
+            self.client.mget.assert_called_once_with(
+                ["test:first", "test:recompute:first", "test:stale:first"]
+                + ["test:second", "test:recompute:second"]
+                + ["test:stale:second"]
+            )
+            self.assertEqual(
+                self.cache.get("first", expected_type=list), ["a"]
+            )
+            self.assertIsNone(self.cache.get_stale("second"))
+            self.client.get.assert_not_called()
+
+    def test_prefetch_without_l1(self):
+        self.cache.l1 = None
+        self.client.mget.return_value = [None, None, '["old"]']
+
+        with self.app.test_request_context():
+            self.cache.prefetch(["first"])
+
+            self.assertIsNone(self.cache.get("first"))
+            self.assertEqual(
+                self.cache.get_stale("first", expected_type=list), ["old"]
+            )
+            self.client.get.assert_not_called()
+
+            # Prefetched values are only used once
+            self.client.get.return_value = '["new"]'
+            self.assertEqual(
+                self.cache.get("first", expected_type=list), ["new"]
+            )
+
+    def test_prefetch_is_per_request(self):
+        self.client.mget.return_value = ["a", None, None]
+
+        with self.app.test_request_context():
+            self.cache.prefetch(["first"])
+        self.cache.l1.clear()
+        self.client.get.return_value = "b"
+
+        with self.app.test_request_context():
+            self.assertEqual(self.cache.get("first"), "b")
+
+    def test_tags_are_sets_of_keys_by_expiry(self):
+        pipeline = self.client.pipeline.return_value
+        tag_keys = self.client.register_script.return_value
+
+        with patch("time.time", return_value=1000):
+            self.cache.set(
+                "key", ["a"], ttl=60, stale_ttl=300, tags=["snap:a"]
+            )
+
+        tag_keys.assert_called_once_with(
+            ["test:tag:snap:a"],
+            [1000, "test:key", 1060, "test:stale:key", 1360],
+            client=pipeline,
+        )
+
+    def test_untagged_values_dont_touch_tags(self):
+        self.cache.set("key", ["a"], ttl=60)
+
+        self.client.register_script.return_value.assert_not_called()
+
+    def test_invalidate_tags(self):
+        self.client.get.return_value = "value"
+        self.cache.get("key")
+        pipeline = self.client.pipeline.return_value
+        pipeline.execute.return_value = [{"test:key", "test:stale:key"}, set()]
+
+        purged = self.cache.invalidate_tags("snap:a", "publisher:a")
+
+        self.assertEqual(purged, 2)
+        tag_keys = [
+            call.args[0] for call in pipeline.zrangebyscore.call_args_list
+        ]
+        self.assertEqual(tag_keys, ["test:tag:snap:a", "test:tag:publisher:a"])
+        deleted = self.client.delete.call_args.args
+        self.assertEqual(
+            set(deleted),
+            {
+                "test:key",
+                "test:stale:key",
+                "test:tag:snap:a",
+                "test:tag:publisher:a",
+            },
+        )
+        self.client.publish.assert_any_call("test:invalidate", "test:key")
+        self.assertIsNone(self.cache.l1.get("test:key"))
+
+    def test_disabled_without_redis(self):
+        with patch(
+            "canonicalwebteam.stores_web_redis.utility.redis.Redis",
+            MagicMock(side_effect=redis.RedisError),
+        ):
+            cache = SnapcraftCache(
+                namespace="test",
+                maxsize=10,
+                l1=LocalCache(maxsize=10, max_bytes=1000, ttl=60),
+            )
+
+        self.assertIsNone(cache.l1)
+
+
+class GetOrRefreshTest(unittest.TestCase):
+    def setUp(self):
+        with patch(
+            "canonicalwebteam.stores_web_redis.utility.redis.Redis",
+            MagicMock(side_effect=redis.RedisError),
+        ):
+            self.cache = SnapcraftCache(namespace="test", maxsize=10)
+
+    def _wait_for_refresh(self):
+        for _ in range(100):
+            if not self.cache._refreshing:
+                return
+            time.sleep(0.01)
+
+    def test_fetches_on_miss(self):
+        fetch = MagicMock(return_value=["a"])
+
+        value = self.cache.get_or_refresh("key", fetch, expected_type=list)
+
+        self.assertEqual(value, ["a"])
+        self.assertEqual(self.cache.get("key", expected_type=list), ["a"])
+        self.assertEqual(
+            self.cache.get_stale("key", expected_type=list), ["a"]
+        )
+
+    def test_fresh_value_is_not_refetched(self):
+        self.cache.set("key", ["a"])
+        fetch = MagicMock()
+
+        value = self.cache.get_or_refresh("key", fetch, expected_type=list)
+
+        self.assertEqual(value, ["a"])
+        fetch.assert_not_called()
+
+    def test_stale_value_is_served_and_refreshed(self):
+        self.cache.set_stale("key", ["old"])
+        fetch = MagicMock(return_value=["new"])
+
+        value = self.cache.get_or_refresh("key", fetch, expected_type=list)
+        self._wait_for_refresh()
+
+        self.assertEqual(value, ["old"])
+        fetch.assert_called_once()
+        self.assertEqual(self.cache.get("key", expected_type=list), ["new"])
+
+    def test_stale_value_survives_refresh_errors(self):
+        self.cache.set_stale("key", ["old"])
+        fetch = MagicMock(side_effect=ValueError)
+
+        self.cache.get_or_refresh("key", fetch, expected_type=list)
+        self._wait_for_refresh()
+
+        self.assertEqual(
+            self.cache.get_or_refresh("key", fetch, expected_type=list),
+            ["old"],
+        )
+
+    def test_single_refresh_at_a_time(self):
+        self.cache.set_stale("key", ["old"])
+        fetch = MagicMock(side_effect=lambda: time.sleep(0.1) or ["new"])
+
+        for _ in range(5):
+            self.cache.get_or_refresh("key", fetch, expected_type=list)
+        self._wait_for_refresh()
+
+        fetch.assert_called_once()
+
+    def test_errors_without_value_are_raised(self):
+        fetch = MagicMock(side_effect=ValueError)
+
+        with self.assertRaises(ValueError):
+            self.cache.get_or_refresh("key", fetch, expected_type=list)
+
+    def test_waits_for_the_worker_fetching_the_value(self):
+        self.cache.recompute_poll_interval = 0.01
+        self.cache._refreshing.add("test:key")
+        fetch = MagicMock(return_value=["mine"])
+
+        def fetch_elsewhere():
+            time.sleep(0.05)
+            self.cache.set("key", ["theirs"])
+
+        thread = threading.Thread(target=fetch_elsewhere)
+        thread.start()
+        value = self.cache.get_or_refresh("key", fetch, expected_type=list)
+        thread.join()
+
+        self.assertEqual(value, ["theirs"])
+        fetch.assert_not_called()
+
+    def test_gives_up_waiting_for_a_slow_fetch(self):
+        self.cache.recompute_wait = 0.05
+        self.cache.recompute_poll_interval = 0.01
+        fetch = MagicMock(side_effect=lambda: time.sleep(0.2) or ["slow"])
+        values = []
+        errors = []
+
+        def get():
+            try:
+                values.append(
+                    self.cache.get_or_refresh(
+                        "key", fetch, expected_type=list, lock_ttl=600
+                    )
+                )
+            except ApiFetchInProgressError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=get) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # The other requests don't fetch it again, nor wait for lock_ttl
+        self.assertEqual(values, [["slow"]])
+        self.assertEqual(len(errors), 2)
+        fetch.assert_called_once()
+
+    def test_fetches_straight_away_when_the_redis_lock_fails(self):
+        self.cache.redis_available = True
+        self.cache.client = MagicMock()
+        self.cache.client.lock.return_value.acquire.side_effect = (
+            redis.RedisError
+        )
+        self.cache.client.get.side_effect = redis.RedisError
+        fetch = MagicMock(return_value=["mine"])
+
+        start = time.monotonic()
+        value = self.cache.get_or_refresh("key", fetch, expected_type=list)
+
+        self.assertEqual(value, ["mine"])
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_fetches_when_the_other_worker_gave_up(self):
+        self.cache.recompute_wait = 1
+        self.cache.recompute_poll_interval = 0.01
+        self.cache._refreshing.add("test:key")
+        fetch = MagicMock(return_value=["mine"])
+
+        def give_up():
+            time.sleep(0.1)
+            self.cache._release_refresh("test:key")
+
+        thread = threading.Thread(target=give_up)
+        thread.start()
+        value = self.cache.get_or_refresh("key", fetch, expected_type=list)
+        thread.join()
+
+        self.assertEqual(value, ["mine"])
+
+    def test_invalidate_tags(self):
+        self.cache.set("tagged", "value", tags=["snap:a"])
+        self.cache.set_stale("tagged", "old value", tags=["snap:a"])
+        self.cache.get_or_refresh(
+            "refreshed",
+            MagicMock(return_value=["b", "a"]),
+            expected_type=list,
+            tags=lambda value: [f"snap:{name}" for name in value],
+        )
+        self.cache.set("untagged", "value")
+
+        self.assertEqual(self.cache.invalidate_tags("snap:a"), 5)
+
+        self.assertIsNone(self.cache.get("tagged"))
+        self.assertIsNone(self.cache.get_stale("tagged"))
+        self.assertIsNone(self.cache.get("refreshed"))
+        self.assertIsNone(self.cache.get_stale("refreshed"))
+        self.assertEqual(self.cache.get("untagged"), "value")
+        self.assertEqual(self.cache.invalidate_tags("snap:a"), 0)
+
+    def test_early_recompute(self):
+        self.cache.get_or_refresh("key", lambda: ["old"], expected_type=list)
+        fetch = MagicMock(return_value=["new"])
+
+        # The value is far from expiring
+        self.cache.get_or_refresh(
+            "key", fetch, expected_type=list, early_recompute_beta=1
+        )
+        fetch.assert_not_called()
+
+        # The value is about to expire
+        self.cache.set(
+            "recompute:key", {"delta": 10, "expires_at": time.time()}
+        )
+        value = self.cache.get_or_refresh(
+            "key", fetch, expected_type=list, early_recompute_beta=1
+        )
+        self._wait_for_refresh()
+
+        self.assertEqual(value, ["old"])
+        fetch.assert_called_once()
+        self.assertEqual(self.cache.get("key", expected_type=list), ["new"])
+
+
+class CachedDecoratorTest(unittest.TestCase):
+    def setUp(self):
+        redis_cache.fallback.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.metrics = UpstreamMetrics(directory.name)
+        patcher = patch("cache.decorators.upstream_metrics", self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_caches_by_arguments(self):
+        fetch = MagicMock(side_effect=lambda name: [name])
+
+        @cached("test-posts:{name}", expected_type=list)
+        def get_posts(name):
+            return fetch(name)
+
+        self.assertEqual(get_posts("toto"), ["toto"])
+        self.assertEqual(get_posts(name="toto"), ["toto"])
+        self.assertEqual(get_posts("titi"), ["titi"])
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(
+            redis_cache.get("test-posts:toto", expected_type=list), ["toto"]
+        )
+
+        lookups = self.metrics.snapshot()["cache_lookups"]
+        self.assertEqual(lookups["test-posts|hit"], 1)
+        self.assertEqual(lookups["test-posts|miss"], 2)
+
+    def test_key_function_and_ttl_function(self):
+        @cached(
+            lambda name: f"test-map:{name}",
+            ttl=lambda value: 60 if value.get("failed") else 3600,
+            expected_type=dict,
+        )
+        def get_map(name):
+            return {"failed": True}
+
+        with patch("cache.decorators.redis_cache") as cache:
+            cache.get.return_value = None
+            get_map("toto")
+
+        cache.set.assert_called_once_with(
+            "test-map:toto", {"failed": True}, ttl=60, tags=()
+        )
+
+    def test_tags(self):
+        @cached("test-tagged:{name}", expected_type=list, tags=["t:{name}"])
+        def get_tagged(name):
+            return [name]
+
+        @cached(
+            "test-tagged-stale:{name}",
+            expected_type=list,
+            stale_ttl=60,
+            tags=lambda value: [f"t:{item}" for item in value],
+        )
+        def get_tagged_stale(name):
+            return [name]
+
+        get_tagged("toto")
+        get_tagged_stale("toto")
+        get_tagged("titi")
+
+        self.assertEqual(redis_cache.invalidate_tags("t:toto"), 4)
+        self.assertIsNone(redis_cache.get("test-tagged:toto"))
+        self.assertIsNone(redis_cache.get("test-tagged-stale:toto"))
+        self.assertIsNone(redis_cache.get_stale("test-tagged-stale:toto"))
+        self.assertEqual(
+            redis_cache.get("test-tagged:titi", expected_type=list), ["titi"]
+        )
+
+    def test_empty_values(self):
+        fetch = MagicMock(return_value=[])
+
+        @cached("test-empty:{name}", expected_type=list)
+        def get_uncached(name):
+            return fetch()
+
+        @cached("test-negative:{name}", negative_ttl=60, expected_type=list)
+        def get_negative(name):
+            return fetch()
+
+        get_uncached("toto")
+        get_uncached("toto")
+        self.assertEqual(fetch.call_count, 2)
+
+        self.assertEqual(get_negative("toto"), [])
+        self.assertEqual(get_negative("toto"), [])
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(
+            self.metrics.snapshot()["cache_lookups"][
+                "test-negative|negative-hit"
+            ],
+            1,
+        )
+
+    def test_stale_values(self):
+        redis_cache.set_stale("test-stale", ["old"])
+        fetch = MagicMock(return_value=["new"])
+
+        @cached("test-stale", expected_type=list, stale_ttl=60)
+        def get_value():
+            return fetch()
+
+        self.assertEqual(get_value(), ["old"])
+
+
+class SerializationTest(unittest.TestCase):
+    def test_small_values_are_plain(self):
+        self.assertEqual(
+            serialization.compress("value", min_bytes=10), "value"
+        )
+        self.assertEqual(serialization.decompress("value"), "value")
+
+    def test_large_values_are_compressed(self):
+        value = serialization.dumps([{"name": "snap"}] * 1000)
+
+        for compression in serialization.COMPRESSIONS:
+            stored = serialization.compress(
+                value, min_bytes=10, compression=compression
+            )
+            self.assertTrue(
+                stored.startswith(f"{serialization.VERSION_TAG}{compression}")
+            )
+            self.assertLess(len(stored), len(value) / 10)
+            self.assertEqual(serialization.decompress(stored), value)
+
+    def test_lenient_dumps(self):
+        self.assertEqual(
+            serialization.loads(serialization.dumps({"a": {1, 2}, 1: b"b"})),
+            {"a": [1, 2], "1": "b"},
+        )
+
+    def test_cache_round_trip(self):
+        with patch(
+            "canonicalwebteam.stores_web_redis.utility.redis.Redis",
+            MagicMock(side_effect=redis.RedisError),
+        ):
+            cache = SnapcraftCache(namespace="test", maxsize=10)
+
+        snaps = [{"name": f"snap-{index}"} for index in range(1000)]
+        cache.set("snaps", snaps)
+        cache.set("sitemap", "<xml>" * 1000)
+
+        self.assertTrue(
+            cache.fallback["test:snaps"].startswith(serialization.VERSION_TAG)
+        )
+        self.assertEqual(cache.get("snaps", expected_type=list), snaps)
+        self.assertEqual(cache.get("sitemap"), "<xml>" * 1000)
+
+        # Values stored before compression was added are still readable
+        cache.fallback["test:legacy"] = '{"a": 1}'
+        self.assertEqual(cache.get("legacy", expected_type=dict), {"a": 1})
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from webapp import content
+from webapp.content import ContentRegistry, content_registry
+
+
+class ContentRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_path)
+        os.makedirs(os.path.join(self.root_path, "store/content/distros"))
+        self.write("store/content/distros/toto.yaml", "name: Toto\n")
+        self.write("other.yaml", "name: Other\n")
+
+    def write(self, path, data, mtime=None):
+        path = os.path.join(self.root_path, path)
+        with open(path, "w") as f:
+            f.write(data)
+        if mtime:
+            os.utime(path, (mtime, mtime))
+
+    def get_registry(self, reload=False):
+        return ContentRegistry(
+            ["store/content"], root_path=self.root_path, reload=reload
+        )
+
+    def test_files_are_parsed_once(self):
+        registry = self.get_registry()
+
+        with patch.object(
+            content._yaml, "load", wraps=content._yaml.load
+        ) as mock_load:
+            for _ in range(3):
+                distro = registry.get("store/content/distros/toto.yaml")
+
+        self.assertEqual(distro, {"name": "Toto"})
+        self.assertEqual(mock_load.call_count, 1)
+
+    def test_only_content_files_are_served(self):
+        registry = self.get_registry()
+
+        self.assertIsNone(registry.get("other.yaml"))
+        self.assertIsNone(registry.get("store/content/../../other.yaml"))
+        self.assertIsNone(registry.get("store/content/distros/titi.yaml"))
+
+    def test_content_is_immutable(self):
+        self.write(
+            "store/content/distros/toto.yaml",
+            "name: Toto\nsupported-archs:\n  - amd64\n",
+        )
+        distro = self.get_registry().get("store/content/distros/toto.yaml")
+
+        with self.assertRaises(TypeError):
+            distro["name"] = "Titi"
+        with self.assertRaises(TypeError):
+            distro.update({"name": "Titi"})
+        self.assertEqual(distro["supported-archs"], ("amd64",))
+        self.assertEqual(
+            json.loads(json.dumps(distro)),
+            {"name": "Toto", "supported-archs": ["amd64"]},
+        )
+        # Copies can be changed
+        copy = dict(distro)
+        copy["name"] = "Titi"
+        self.assertEqual(distro["name"], "Toto")
+
+    def test_invalid_files_are_skipped(self):
+        self.write("store/content/distros/titi.yaml", "name: [Titi\n")
+
+        with self.assertLogs("webapp.content", level="ERROR"):
+            registry = self.get_registry()
+            self.assertIsNone(registry.get("store/content/distros/titi.yaml"))
+
+        self.assertEqual(
+            registry.get("store/content/distros/toto.yaml"),
+            {"name": "Toto"},
+        )
+
+    @patch("webapp.content.CONTENT_RELOAD_INTERVAL", 0)
+    def test_changed_files_are_reloaded(self):
+        path = "store/content/distros/toto.yaml"
+        registry = self.get_registry(reload=True)
+        registry.get(path)
+
+        self.write(path, "name: Titi\n", mtime=1)
+        self.write("store/content/distros/tata.yaml", "name: Tata\n")
+
+        self.assertEqual(registry.get(path), {"name": "Titi"})
+        self.assertEqual(
+            registry.get("store/content/distros/tata.yaml"),
+            {"name": "Tata"},
+        )
+
+    @patch("webapp.content.CONTENT_RELOAD_INTERVAL", 0)
+    def test_files_are_not_reloaded_in_production(self):
+        path = "store/content/distros/toto.yaml"
+        registry = self.get_registry()
+        registry.get(path)
+
+        self.write(path, "name: Titi\n", mtime=1)
+
+        self.assertEqual(registry.get(path), {"name": "Toto"})
+
+    def test_app_content_files_are_loaded(self):
+        for path in [
+            "publisher/content/listing_tour.yaml",
+            "snapcraft/content/snapcraft_live.yaml",
+            "store/content/developers/snaps.yaml",
+            "store/content/distros/ubuntu.yaml",
+            "store/content/publishers/snapcrafters.yaml",
+        ]:
+            self.assertIsNotNone(content_registry.get(path), path)
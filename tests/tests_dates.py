@@ -0,0 +1,58 @@
+import datetime
+import unittest
+
+from dateutil import parser
+
+from webapp import dates
+
+
+class DatesTest(unittest.TestCase):
+    def setUp(self):
+        dates.parse_date.cache_clear()
+        dates.format_date.cache_clear()
+
+    def test_parse_store_api_dates(self):
+        for date_string in [
+            "2019-01-12T16:48:41.821037+00:00",
+            "2019-01-12T16:48:41+02:00",
+            "2019-01-12T16:48:41.821037",
+            "2019-01-12",
+        ]:
+            self.assertEqual(
+                dates.parse_date(date_string), parser.parse(date_string)
+            )
+
+    def test_parse_z_suffix(self):
+        self.assertEqual(
+            dates.parse_date("2019-01-12T16:48:41Z"),
+            datetime.datetime(
+                2019, 1, 12, 16, 48, 41, tzinfo=datetime.timezone.utc
+            ),
+        )
+
+    def test_parse_other_formats(self):
+        self.assertEqual(
+            dates.parse_date("12 January 2019 16:48"),
+            datetime.datetime(2019, 1, 12, 16, 48),
+        )
+        self.assertEqual(
+            dates.parse_date("2019-01-12T16:48:41.8210+00:00"),
+            parser.parse("2019-01-12T16:48:41.8210+00:00"),
+        )
+
+    def test_parse_invalid_dates(self):
+        with self.assertRaises(ValueError):
+            dates.parse_date("not a date")
+
+        with self.assertRaises(TypeError):
+            dates.parse_date(None)
+
+    def test_format_date_is_memoized(self):
+        for _ in range(3):
+            formatted = dates.format_date(
+                "2019-01-12T16:48:41.821037+00:00", "%-d %B %Y"
+            )
+
+        self.assertEqual(formatted, "12 January 2019")
+        self.assertEqual(dates.format_date.cache_info().misses, 1)
+        self.assertEqual(dates.format_date.cache_info().hits, 2)
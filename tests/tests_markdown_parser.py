@@ -1,5 +1,10 @@
+import random
+import time
 import unittest
+from unittest.mock import patch
 
+from cache.cache_utility import redis_cache
+from webapp import markdown
 from webapp.markdown import parse_markdown_description
 
 
@@ -10,6 +15,10 @@ class TestMarkdownParser(unittest.TestCase):
     to keep.
     """
 
+    def setUp(self):
+        markdown.markdown_cache.clear()
+        redis_cache.fallback.clear()
+
     def test_parse_title(self):
         """Title conversion shouldn't work"""
         markdown = "# title"
@@ -256,3 +265,138 @@ class TestMarkdownParser(unittest.TestCase):
             "<p>&lt;script&gt;alert(&quot;hi!&quot;)&lt;/script&gt;</p>\n"
         )
         self.assertEqual(parse_markdown_description(markdown), expected)
+
+
+class TestMarkdownCache(unittest.TestCase):
+    description = "A **snap**\n\n* with\n* a list"
+
+    def setUp(self):
+        markdown.markdown_cache.clear()
+        redis_cache.fallback.clear()
+
+    def test_description_is_rendered_once(self):
+        with patch(
+            "webapp.markdown._render_markdown_description",
+            wraps=markdown._render_markdown_description,
+        ) as mock_render:
+            first = parse_markdown_description(self.description)
+            second = parse_markdown_description(self.description)
+
+        self.assertEqual(first, second)
+        self.assertIn("<strong>snap</strong>", first)
+        mock_render.assert_called_once()
+
+    def test_render_is_shared_through_redis(self):
+        rendered = parse_markdown_description(self.description)
+        # As in another worker
+        markdown.markdown_cache.clear()
+
+        with patch(
+            "webapp.markdown._render_markdown_description"
+        ) as mock_render:
+            self.assertEqual(
+                parse_markdown_description(self.description), rendered
+            )
+
+        mock_render.assert_not_called()
+
+    @patch("webapp.markdown.MARKDOWN_RENDER_TIME_BUDGET", -1)
+    def test_slow_render_is_not_kept(self):
+        rendered = parse_markdown_description(self.description)
+        cache_key = markdown.get_markdown_cache_key(self.description)
+
+        self.assertNotIn("<strong>", rendered)
+        self.assertIsNone(redis_cache.get(cache_key))
+        self.assertEqual(markdown.markdown_cache.get(cache_key), rendered)
+        # Kept in the worker for a minute rather than a week
+        in_two_minutes = time.monotonic() + 120
+        with patch(
+            "cache.local_cache.time.monotonic", return_value=in_two_minutes
+        ):
+            self.assertIsNone(markdown.markdown_cache.get(cache_key))
+
+    @patch("webapp.markdown.MARKDOWN_MAX_LENGTH", 10)
+    def test_long_description_fallback_is_kept(self):
+        rendered = parse_markdown_description(self.description)
+
+        self.assertEqual(
+            redis_cache.get(markdown.get_markdown_cache_key(self.description)),
+            rendered,
+        )
+
+    def test_cache_key_depends_on_the_parser_version(self):
+        key = markdown.get_markdown_cache_key(self.description)
+
+        with patch("webapp.markdown.PARSER_VERSION", "next"):
+            next_key = markdown.get_markdown_cache_key(self.description)
+
+        self.assertNotEqual(key, next_key)
+        self.assertNotEqual(
+            key, markdown.get_markdown_cache_key(self.description + " ")
+        )
+
+
+class TestGuardedRender(unittest.TestCase):
+    def test_long_description_is_plain_text(self):
+        description = "**a** <b>" * 10
+
+        result = markdown.render_markdown_description(
+            description, max_length=20
+        )
+
+        self.assertEqual(result, markdown.render_plain_text(description))
+        self.assertIn("**a** &lt;b&gt;", result)
+
+    def test_slow_description_is_plain_text(self):
+        description = "**a**\n\n* list"
+
+        result = markdown.render_markdown_description(
+            description, time_budget=-1
+        )
+
+        self.assertEqual(result, "<p>**a**\n\n* list</p>\n")
+
+    def test_link_chain_stops_at_the_time_budget(self):
+        description = "[a](" * 5000
+
+        start = time.monotonic()
+        result = markdown.render_markdown_description(
+            description, time_budget=0.1
+        )
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(result, markdown.render_plain_text(description))
+
+    def test_longest_single_rules_are_fast(self):
+        # The budget can't stop a rule while it runs, e.g. a link whose
+        # URL never ends, or an emphasis never closed
+        length = markdown.MARKDOWN_MAX_LENGTH
+        descriptions = [
+            "[a](" + "(" * (length - 4),
+            "[" + "a" * (length - 3) + "](",
+            "*" + "a " * (length // 2 - 1),
+            "<" + "a " * (length // 2 - 1),
+            "   a" + "\n" * (length - 5) + "x",
+        ]
+
+        for description in descriptions:
+            start = time.monotonic()
+            markdown.render_markdown_description(description)
+
+            self.assertLess(time.monotonic() - start, 1)
+
+    def test_random_descriptions(self):
+        snippets = ["*", "`", "[", "](", "<script>", "\n", "   ", "http://a/"]
+        rng = random.Random(0)
+
+        for _ in range(50):
+            description = "".join(
+                rng.choice(snippets) for _ in range(rng.randint(1, 500))
+            )
+            start = time.monotonic()
+            result = markdown.render_markdown_description(
+                description, time_budget=0.1
+            )
+
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertNotIn("<script", result)
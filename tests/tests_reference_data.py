@@ -0,0 +1,97 @@
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from canonicalwebteam.exceptions import StoreApiError
+
+from webapp import reference_data
+from webapp.reference_data import ReferenceData, ReferenceList
+
+
+class ReferenceListTest(unittest.TestCase):
+    def test_items_are_indexed_by_key(self):
+        reference_list = ReferenceList(
+            [{"key": "MIT", "name": "MIT License"}], "key"
+        )
+
+        self.assertEqual(reference_list.get("MIT")["name"], "MIT License")
+        self.assertIsNone(reference_list.get("GPL"))
+        self.assertEqual(len(reference_list), 1)
+        with self.assertRaises(TypeError):
+            reference_list.items[0]["name"] = "GPL"
+
+    def test_etag_changes_with_the_items(self):
+        etag = ReferenceList([{"name": "games"}], "name").etag
+
+        self.assertEqual(ReferenceList([{"name": "games"}], "name").etag, etag)
+        self.assertNotEqual(
+            ReferenceList([{"name": "social"}], "name").etag, etag
+        )
+
+
+class ReferenceDataTest(unittest.TestCase):
+    def setUp(self):
+        self.load = Mock(return_value=[{"name": "games"}])
+        self.reference_data = ReferenceData(
+            "categories", self.load, key="name", refresh_interval=60
+        )
+
+    @patch("webapp.reference_data.time.monotonic")
+    def test_list_is_refreshed_on_schedule(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        self.reference_data.get()
+        loading = threading.Event()
+        self.load.side_effect = lambda: loading.wait() and [{"name": "social"}]
+
+        mock_monotonic.return_value = 59
+        self.assertIsNotNone(self.reference_data.get().get("games"))
+
+        # The previous list is served while the next one is loaded
+        mock_monotonic.return_value = 60
+        self.assertIsNotNone(self.reference_data.get().get("games"))
+        loading.set()
+        self._wait_for_refresh()
+        self.assertIsNotNone(self.reference_data.get().get("social"))
+        self.assertEqual(self.load.call_count, 2)
+
+    def _wait_for_refresh(self):
+        with self.reference_data._lock:
+            pass
+
+    @patch("webapp.reference_data.time.monotonic")
+    def test_previous_list_is_kept_on_errors(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        self.reference_data.get()
+        self.load.side_effect = StoreApiError("Error", 500)
+
+        mock_monotonic.return_value = 60
+        with self.assertLogs("webapp.reference_data", level="WARNING"):
+            self.reference_data.get()
+            self._wait_for_refresh()
+
+        self.assertIsNotNone(self.reference_data.get().get("games"))
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_empty_list_without_the_store_api(self):
+        self.load.side_effect = StoreApiError("Error", 500)
+
+        with self.assertLogs("webapp.reference_data", level="WARNING"):
+            self.assertEqual(len(self.reference_data.get()), 0)
+
+    def test_static_lists_are_loaded_once(self):
+        load = Mock(return_value=[{"key": "FR", "name": "France"}])
+        countries = ReferenceData("countries", load)
+
+        for _ in range(3):
+            countries.get()
+
+        load.assert_called_once()
+
+    def test_licenses_and_countries(self):
+        self.assertEqual(
+            reference_data.licenses.get().get("Proprietary")["name"],
+            "Proprietary",
+        )
+        self.assertEqual(
+            reference_data.countries.get().get("FR")["name"], "France"
+        )
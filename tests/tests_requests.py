@@ -1,10 +1,21 @@
+import http.server
+import threading
+import time
 import unittest
+import unittest.mock
 
-from requests.exceptions import ConnectionError, Timeout
+import redis
+from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
+from requests.models import Response
 
 import responses
 from webapp.api import requests
-from webapp.api.exceptions import ApiConnectionError, ApiTimeoutError
+from webapp.api.circuit_breaker import CircuitBreakers
+from webapp.api.exceptions import (
+    ApiCircuitOpenError,
+    ApiConnectionError,
+    ApiTimeoutError,
+)
 
 
 class RequestsCacheTest(unittest.TestCase):
@@ -23,3 +34,353 @@ class RequestsCacheTest(unittest.TestCase):
         responses.add(responses.GET, test_url, body=Timeout())
         with self.assertRaises(ApiTimeoutError):
             session.get(test_url)
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), KeepAliveHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_default_session_closes_connections(self):
+        session = requests.Session()
+        session.get(self.url)
+
+        self.assertEqual(session.headers["Connection"], "close")
+        self.assertEqual(session.get_pool_stats(), {})
+
+    def test_pooled_session_reuses_connections(self):
+        session = requests.Session(pooled=True)
+        for _ in range(3):
+            session.get(self.url)
+
+        self.assertEqual(session.headers["Connection"], "keep-alive")
+        self.assertEqual(
+            session.get_pool_stats(),
+            {"127.0.0.1": {"hits": 2, "misses": 1, "evictions": 0}},
+        )
+
+    def test_pooled_session_evicts_idle_connections(self):
+        session = requests.Session(pooled=True, idle_timeout=0.05)
+        session.get(self.url)
+        time.sleep(0.1)
+        session.get(self.url)
+
+        self.assertEqual(
+            session.get_pool_stats(),
+            {"127.0.0.1": {"hits": 0, "misses": 2, "evictions": 1}},
+        )
+
+    def test_pooled_session_evicts_old_connections(self):
+        session = requests.Session(pooled=True, max_age=0)
+        session.get(self.url)
+        session.get(self.url)
+
+        self.assertEqual(session.get_pool_stats()["127.0.0.1"]["evictions"], 1)
+
+
+class SingleFlightTest(unittest.TestCase):
+    def _run_concurrently(self, singleflight, key, fn, count=5):
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(singleflight.do(key, fn))
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results, errors
+
+    def test_concurrent_calls_share_one_call(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(0.1)
+            return "response"
+
+        results, errors = self._run_concurrently(
+            requests.SingleFlight(), "key", fn
+        )
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["response"] * 5)
+        self.assertEqual(errors, [])
+
+    def test_concurrent_calls_share_the_error(self):
+        def fn():
+            time.sleep(0.1)
+            raise ApiTimeoutError("timeout")
+
+        results, errors = self._run_concurrently(
+            requests.SingleFlight(), "key", fn
+        )
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+
+    def test_followers_call_again_when_the_leader_is_killed(self):
+        class Killed(BaseException):
+            pass
+
+        calls = []
+        singleflight = requests.SingleFlight()
+        leader_errors = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(0.1)
+            if len(calls) == 1:
+                raise Killed()
+            return "response"
+
+        def leader():
+            try:
+                singleflight.do("key", fn)
+            except Killed as error:
+                leader_errors.append(error)
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        time.sleep(0.02)
+        results, errors = self._run_concurrently(singleflight, "key", fn)
+        thread.join()
+
+        self.assertEqual(len(leader_errors), 1)
+        self.assertEqual(results, ["response"] * 5)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 2)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        singleflight = requests.SingleFlight()
+        calls = []
+
+        for _ in range(2):
+            singleflight.do("key", lambda: calls.append(1))
+
+        self.assertEqual(len(calls), 2)
+
+    @responses.activate
+    def test_session_coalesces_identical_gets(self):
+        test_url = "https://api.snapcraft.io/v2/snaps/info/toto"
+        responses.add(responses.GET, test_url, json={"name": "toto"})
+        session = requests.Session(coalesce=True)
+        original_request = session._request
+
+        def slow_request(*args, **kwargs):
+            time.sleep(0.1)
+            return original_request(*args, **kwargs)
+
+        session._request = slow_request
+
+        threads = [
+            threading.Thread(target=session.get, args=(test_url,))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_session_does_not_coalesce_different_headers(self):
+        test_url = "https://dashboard.snapcraft.io/dev/api/account"
+        responses.add(responses.GET, test_url, json={})
+        session = requests.Session(coalesce=True)
+        session.singleflight = unittest.mock.Mock(wraps=session.singleflight)
+
+        session.get(test_url, headers={"Authorization": "user-1"})
+        session.get(test_url, headers={"Authorization": "user-2"})
+
+        keys = [call.args[0] for call in session.singleflight.do.mock_calls]
+        self.assertNotEqual(keys[0], keys[1])
+
+    @responses.activate
+    def test_session_does_not_coalesce_posts(self):
+        test_url = "https://api.snapcraft.io/v1/metrics"
+        responses.add(responses.POST, test_url, json={})
+        session = requests.Session(coalesce=True)
+        session.singleflight = unittest.mock.Mock()
+
+        session.post(test_url, json={})
+
+        session.singleflight.do.assert_not_called()
+
+
+class RedisSingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.client = unittest.mock.Mock()
+        self.singleflight = requests.RedisSingleFlight(
+            self.client, poll_interval=0
+        )
+        self.response = Response()
+        self.response.status_code = 200
+        self.response._content = b'{"name": "toto"}'
+        self.response.headers["Content-Type"] = "application/json"
+
+    def test_leader_shares_response(self):
+        self.client.get.return_value = None
+        self.client.set.return_value = True
+
+        response = self.singleflight.do("key", lambda: self.response)
+
+        self.assertIs(response, self.response)
+        self.client.setex.assert_called_once()
+        self.client.delete.assert_called_once_with("singleflight:lock:key")
+
+    def test_follower_reuses_shared_response(self):
+        shared = requests._encode_response(self.response)
+        self.client.get.side_effect = [None, shared]
+        self.client.set.return_value = False
+        fn = unittest.mock.Mock()
+
+        response = self.singleflight.do("key", fn)
+
+        fn.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"name": "toto"})
+        self.assertEqual(response.headers["content-type"], "application/json")
+
+    def test_follower_calls_upstream_when_leader_gives_up(self):
+        self.client.get.return_value = None
+        self.client.set.return_value = False
+        self.client.exists.return_value = False
+
+        response = self.singleflight.do("key", lambda: self.response)
+
+        self.assertIs(response, self.response)
+
+    def test_redis_errors_fall_back_to_upstream(self):
+        self.client.get.side_effect = redis.RedisError("down")
+
+        response = self.singleflight.do("key", lambda: self.response)
+
+        self.assertIs(response, self.response)
+
+
+class CircuitBreakerSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.breakers = CircuitBreakers(min_calls=2, reset_timeout=60)
+        self.session = requests.Session(circuit_breakers=self.breakers)
+        self.test_url = "https://api.snapcraft.io/v2/snaps/info/toto"
+
+    @responses.activate
+    def test_open_circuit_fails_fast(self):
+        responses.add(responses.GET, self.test_url, body=Timeout())
+
+        for _ in range(2):
+            with self.assertRaises(ApiTimeoutError):
+                self.session.get(self.test_url)
+
+        with self.assertRaises(ApiCircuitOpenError):
+            self.session.get(self.test_url)
+
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_server_errors_count_as_failures(self):
+        responses.add(responses.GET, self.test_url, status=503)
+
+        for _ in range(2):
+            self.session.get(self.test_url)
+
+        self.assertEqual(
+            self.breakers.get_states(), {"api.snapcraft.io": "open"}
+        )
+
+    @responses.activate
+    def test_client_errors_count_as_successes(self):
+        responses.add(responses.GET, self.test_url, status=404)
+
+        for _ in range(2):
+            self.session.get(self.test_url)
+
+        self.assertEqual(
+            self.breakers.get_states(), {"api.snapcraft.io": "closed"}
+        )
+
+    @responses.activate
+    def test_other_errors_count_as_failures(self):
+        responses.add(responses.GET, self.test_url, body=TooManyRedirects())
+
+        for _ in range(2):
+            with self.assertRaises(TooManyRedirects):
+                self.session.get(self.test_url)
+
+        self.assertEqual(
+            self.breakers.get_states(), {"api.snapcraft.io": "open"}
+        )
+
+    def test_killed_calls_are_not_failures(self):
+        class Killed(BaseException):
+            pass
+
+        with unittest.mock.patch(
+            "webapp.api.requests.RequestsSession.request",
+            side_effect=Killed(),
+        ):
+            for _ in range(2):
+                with self.assertRaises(Killed):
+                    self.session.get(self.test_url)
+
+        self.assertEqual(
+            self.breakers.get_states(), {"api.snapcraft.io": "closed"}
+        )
+
+    @responses.activate
+    def test_failed_trial_opens_the_circuit_again(self):
+        self.breakers.settings["reset_timeout"] = 0.05
+        self.breakers.reset()
+        responses.add(responses.GET, self.test_url, body=Timeout())
+        for _ in range(2):
+            with self.assertRaises(ApiTimeoutError):
+                self.session.get(self.test_url)
+        time.sleep(0.1)
+
+        responses.replace(
+            responses.GET, self.test_url, body=TooManyRedirects()
+        )
+        with self.assertRaises(TooManyRedirects):
+            self.session.get(self.test_url)
+
+        self.assertEqual(
+            self.breakers.get_states(), {"api.snapcraft.io": "open"}
+        )
+
+    @responses.activate
+    def test_disabled_breakers_are_ignored(self):
+        self.breakers.enabled = False
+        responses.add(responses.GET, self.test_url, status=503)
+
+        for _ in range(3):
+            self.session.get(self.test_url)
+
+        self.assertEqual(len(responses.calls), 3)
@@ -7,6 +7,7 @@ from canonicalwebteam.store_api.publishergw import PublisherGW
 from canonicalwebteam.store_api.devicegw import DeviceGW
 
 # Local
+from cache.cache_utility import redis_cache
 from webapp.decorators import login_required, exchange_required
 from webapp.helpers import api_publisher_session, api_session
 
@@ -106,3 +107,43 @@ def post_featured_snaps():
         }
         return make_response(response, 500)
     return make_response({"success": True}, 200)
+
+
+# -------------------- CACHE PURGE ------------------
+@admin.route("/admin/cache/purge", methods=["POST"])
+@login_required
+def post_cache_purge():
+    """
+    Delete every cached value with any of the given cache tags, e.g.
+    "snap:firefox,publisher:mozilla", for the store pages to show the
+    latest data straight away.
+
+    Args:
+        None
+
+    Returns:
+        dict: A dictionary containing the number of purged keys and the
+        success status.
+    """
+    if not flask.session["publisher"].get("is_canonical", False):
+        return make_response(
+            {"success": False, "message": "Only admins can purge the cache"},
+            403,
+        )
+
+    tags = [
+        tag.strip()
+        for tag in flask.request.form.get("tags", "").split(",")
+        if tag.strip()
+    ]
+
+    if not tags:
+        response = {
+            "success": False,
+            "message": "Tags cannot be empty",
+        }
+        return make_response(response, 400)
+
+    purged = redis_cache.invalidate_tags(*tags)
+
+    return make_response({"success": True, "purged": purged}, 200)
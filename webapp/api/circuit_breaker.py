@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+
+from webapp.config import (
+    UPSTREAM_BREAKER_ENABLED,
+    UPSTREAM_BREAKER_FAILURE_RATE,
+    UPSTREAM_BREAKER_MIN_CALLS,
+    UPSTREAM_BREAKER_RESET_TIMEOUT,
+    UPSTREAM_BREAKER_WINDOW,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Track the health of a single upstream host
+
+    - closed: requests go through, failures are counted over a rolling
+      window of `window` seconds. Once at least `min_calls` requests were
+      made and `failure_rate` of them failed, the circuit opens.
+    - open: requests are refused straight away for `reset_timeout` seconds.
+    - half-open: a single trial request goes through. The circuit closes
+      if it succeeds and opens again if it fails. A trial that doesn't
+      report back within `reset_timeout` seconds is given up on, and
+      another request goes through.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self, host, failure_rate=0.5, min_calls=10, window=30, reset_timeout=15
+    ):
+        self.host = host
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._trial_started_at = None
+        self._reset_window(time.monotonic())
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def allow_request(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_started_at = time.monotonic()
+                return True
+            return False
+
+    def release_trial(self):
+        """Let another request be the trial, without recording anything,
+        for a request interrupted on our side
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+
+            if self._state == self.HALF_OPEN:
+                self._close(now)
+            else:
+                self._calls += 1
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+
+            if self._state == self.HALF_OPEN:
+                self._open(now)
+                return
+
+            self._calls += 1
+            self._failures += 1
+            if (
+                self._calls >= self.min_calls
+                and self._failures / self._calls >= self.failure_rate
+            ):
+                self._open(now)
+
+    def _refresh(self, now):
+        if self._state == self.OPEN:
+            if now - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+        elif self._state == self.HALF_OPEN:
+            if (
+                self._trial_in_flight
+                and now - self._trial_started_at >= self.reset_timeout
+            ):
+                self._trial_in_flight = False
+        elif now - self._window_start >= self.window:
+            self._reset_window(now)
+
+    def _reset_window(self, now):
+        self._window_start = now
+        self._calls = 0
+        self._failures = 0
+
+    def _open(self, now):
+        logger.warning("Circuit opened for upstream %s", self.host)
+        self._state = self.OPEN
+        self._opened_at = now
+        self._trial_in_flight = False
+
+    def _close(self, now):
+        logger.info("Circuit closed for upstream %s", self.host)
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+        self._reset_window(now)
+
+
+class CircuitBreakers:
+    """Registry holding one circuit breaker per upstream host"""
+
+    def __init__(self, enabled=True, **settings):
+        self.enabled = enabled
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(host, **self.settings)
+            return self._breakers[host]
+
+    def get_states(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.host: breaker.state for breaker in breakers}
+
+    def reset(self):
+        with self._lock:
+            self._breakers = {}
+
+
+# Shared by every session of the worker, so that all the clients of an
+# upstream see its circuit open at the same time
+upstream_circuit_breakers = CircuitBreakers(
+    enabled=UPSTREAM_BREAKER_ENABLED,
+    failure_rate=UPSTREAM_BREAKER_FAILURE_RATE,
+    min_calls=UPSTREAM_BREAKER_MIN_CALLS,
+    window=UPSTREAM_BREAKER_WINDOW,
+    reset_timeout=UPSTREAM_BREAKER_RESET_TIMEOUT,
+)
@@ -14,6 +14,23 @@ class ApiConnectionError(ApiError):
     pass
 
 
+class ApiCircuitOpenError(ApiConnectionError):
+    """
+    The upstream has been failing, so the request was not attempted
+    """
+
+    pass
+
+
+class ApiFetchInProgressError(ApiConnectionError):
+    """
+    Another worker is still fetching the missing value, the request was
+    not attempted
+    """
+
+    pass
+
+
 class ApiTimeoutError(ApiError):
     """
     Communication with the API timed out
@@ -0,0 +1,393 @@
+"""
+Latency, status, timeout and size metrics for the calls made to upstream
+APIs, and hit rates of the cache in front of them, exposed in the
+Prometheus text format.
+
+Each gunicorn worker records its own metrics in memory and regularly dumps
+them into a file of UPSTREAM_METRICS_DIR, so that whichever worker serves
+the metrics endpoint can aggregate the numbers of every worker. The dumps
+of the workers that died are deleted, and the circuit states of the dumps
+older than UPSTREAM_METRICS_MAX_AGE seconds are left out.
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from webapp.api.circuit_breaker import upstream_circuit_breakers
+from webapp.config import UPSTREAM_METRICS_DIR, UPSTREAM_METRICS_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "snapcraft_upstream"
+CACHE_METRIC_PREFIX = "snapcraft_cache"
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Logical endpoints, matched in order against the host and path of a URL
+ENDPOINTS = [
+    ("api.snapcraft.io", r"^/v2/snaps/info/", "devicegw_details"),
+    ("api.snapcraft.io", r"^/v2/snaps/find", "devicegw_find"),
+    ("api.snapcraft.io", r"^/v2/snaps/categories", "devicegw_categories"),
+    ("api.snapcraft.io", r"^/api/v1/snaps/details/", "devicegw_snap_details"),
+    ("api.snapcraft.io", r"^/api/v1/snaps/metrics", "devicegw_metrics"),
+    ("api.snapcraft.io", r"^/api/v1/snaps/search", "devicegw_search"),
+    ("api.snapcraft.io", r"^/api/v1/sboms/", "devicegw_sbom"),
+    ("api.snapcraft.io", r"", "devicegw_other"),
+    (
+        "dashboard.snapcraft.io",
+        r"^/dev/api/snaps/info/",
+        "dashboard_snap_info",
+    ),
+    ("dashboard.snapcraft.io", r"/releases$", "dashboard_releases"),
+    ("dashboard.snapcraft.io", r"/channel-map$", "dashboard_channel_map"),
+    ("dashboard.snapcraft.io", r"^/dev/api/account", "dashboard_account"),
+    ("dashboard.snapcraft.io", r"", "dashboard_other"),
+    ("api.launchpad.net", r"builds", "launchpad_builds"),
+    ("api.launchpad.net", r"\+snaps", "launchpad_snaps"),
+    ("api.launchpad.net", r"", "launchpad_other"),
+    ("api.github.com", r"", "github"),
+    ("recommendations.snapcraft.io", r"", "recommendations"),
+]
+_ENDPOINTS = [(host, re.compile(path), name) for host, path, name in ENDPOINTS]
+
+
+def get_logical_endpoint(host, path):
+    """Name the kind of call made to an upstream, e.g. "devicegw_details"
+
+    Paths of unknown hosts aren't used, to keep the number of series low.
+    """
+    for endpoint_host, path_regex, name in _ENDPOINTS:
+        if host == endpoint_host and path_regex.search(path):
+            return name
+    return "other"
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _empty_histogram():
+    return {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+
+
+class UpstreamMetrics:
+    """Metrics of the upstream calls made by the current worker"""
+
+    def __init__(
+        self,
+        directory=UPSTREAM_METRICS_DIR,
+        flush_interval=5,
+        circuit_breakers=None,
+        max_age=UPSTREAM_METRICS_MAX_AGE,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        # Read on every snapshot, for the dump of each worker to have the
+        # current state of its circuits
+        self.circuit_breakers = circuit_breakers
+        self._lock = threading.Lock()
+        self._last_flush = 0
+        self._reset()
+
+    def _reset(self):
+        self.requests = defaultdict(int)
+        self.timeouts = defaultdict(int)
+        self.response_bytes = defaultdict(int)
+        self.durations = defaultdict(_empty_histogram)
+        self.pool_events = defaultdict(int)
+        self.cache_lookups = defaultdict(int)
+        self.cache_seconds = defaultdict(float)
+
+    def record_request(self, host, endpoint, method, status, duration, size=0):
+        """Record an upstream call
+
+        `status` is the response status code, or "timeout" and
+        "connection-error" for calls that didn't get a response.
+        """
+        series = f"{host}|{endpoint}"
+        with self._lock:
+            self.requests[f"{series}|{method}|{status}"] += 1
+            self.response_bytes[series] += size
+            if status == "timeout":
+                self.timeouts[series] += 1
+
+            histogram = self.durations[series]
+            histogram["sum"] += duration
+            histogram["count"] += 1
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    histogram["buckets"][index] += 1
+
+        self._maybe_flush()
+
+    def record_pool_event(self, host, event):
+        with self._lock:
+            self.pool_events[f"{host}|{event}"] += 1
+
+    def record_cache_lookup(self, prefix, outcome, duration):
+        """Record a lookup of a cached value
+
+        `outcome` is "hit", "negative-hit" or "miss", and `duration`
+        includes fetching the value on misses.
+        """
+        with self._lock:
+            self.cache_lookups[f"{prefix}|{outcome}"] += 1
+            self.cache_seconds[f"{prefix}|{outcome}"] += duration
+
+        self._maybe_flush()
+
+    def snapshot(self):
+        circuits = (
+            self.circuit_breakers.get_states() if self.circuit_breakers else {}
+        )
+        with self._lock:
+            return {
+                "time": time.time(),
+                "requests": dict(self.requests),
+                "timeouts": dict(self.timeouts),
+                "response_bytes": dict(self.response_bytes),
+                "durations": {
+                    series: {
+                        "buckets": list(histogram["buckets"]),
+                        "sum": histogram["sum"],
+                        "count": histogram["count"],
+                    }
+                    for series, histogram in self.durations.items()
+                },
+                "pool_events": dict(self.pool_events),
+                "circuits": circuits,
+                "cache_lookups": dict(self.cache_lookups),
+                "cache_seconds": dict(self.cache_seconds),
+            }
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Dump the metrics of this worker for the other workers to read"""
+        self._last_flush = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.directory, suffix=".tmp", delete=False
+            ) as snapshot_file:
+                json.dump(self.snapshot(), snapshot_file)
+            os.replace(snapshot_file.name, self._snapshot_path(os.getpid()))
+        except OSError as error:
+            logger.warning("Failed to write upstream metrics: %s", error)
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def collect(self):
+        """Return the metrics of all the workers, merged"""
+        self.flush()
+
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                pid = int(os.path.basename(path)[: -len(".json")])
+            except ValueError:
+                continue
+
+            # The numbers of a dead worker would be counted forever, and
+            # its circuits reported open
+            if pid <= 0 or not _is_alive(pid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+
+            try:
+                with open(path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError) as error:
+                logger.warning("Skipping upstream metrics %s: %s", path, error)
+                continue
+
+            # An idle worker doesn't dump its metrics, whose circuit states
+            # may not be true anymore
+            if time.time() - snapshot.get("time", 0) > self.max_age:
+                snapshot.pop("circuits", None)
+            snapshots.append(snapshot)
+
+        return merge_snapshots(snapshots)
+
+
+def merge_snapshots(snapshots):
+    merged = {
+        "requests": defaultdict(int),
+        "timeouts": defaultdict(int),
+        "response_bytes": defaultdict(int),
+        "durations": {},
+        "pool_events": defaultdict(int),
+        "circuits": {},
+        "cache_lookups": defaultdict(int),
+        "cache_seconds": defaultdict(float),
+    }
+
+    for snapshot in snapshots:
+        for counter in (
+            "requests",
+            "timeouts",
+            "response_bytes",
+            "cache_lookups",
+            "cache_seconds",
+        ):
+            for series, value in snapshot.get(counter, {}).items():
+                merged[counter][series] += value
+
+        for series, value in snapshot.get("pool_events", {}).items():
+            merged["pool_events"][series] += value
+
+        for series, histogram in snapshot.get("durations", {}).items():
+            total = merged["durations"].setdefault(series, _empty_histogram())
+            total["sum"] += histogram["sum"]
+            total["count"] += histogram["count"]
+            for index, count in enumerate(histogram["buckets"]):
+                total["buckets"][index] += count
+
+        # A circuit counts as open if it is open in any worker
+        for host, state in snapshot.get("circuits", {}).items():
+            if merged["circuits"].get(host) != "open":
+                merged["circuits"][host] = state
+
+    return merged
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _labels(**labels):
+    return ",".join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+
+
+def render_prometheus(metrics):
+    """Render merged snapshots in the Prometheus text exposition format"""
+    lines = []
+
+    def metric_header(name, metric_type, help_text):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+    metric_header(
+        "requests_total", "counter", "Requests made to upstream APIs."
+    )
+    for series, value in sorted(metrics["requests"].items()):
+        host, endpoint, method, status = series.split("|")
+        labels = _labels(
+            host=host, endpoint=endpoint, method=method, status=status
+        )
+        lines.append(f"{METRIC_PREFIX}_requests_total{{{labels}}} {value}")
+
+    metric_header(
+        "timeouts_total", "counter", "Requests to upstream APIs timing out."
+    )
+    for series, value in sorted(metrics["timeouts"].items()):
+        host, endpoint = series.split("|")
+        labels = _labels(host=host, endpoint=endpoint)
+        lines.append(f"{METRIC_PREFIX}_timeouts_total{{{labels}}} {value}")
+
+    metric_header(
+        "response_bytes_total",
+        "counter",
+        "Bytes received from upstream APIs.",
+    )
+    for series, value in sorted(metrics["response_bytes"].items()):
+        host, endpoint = series.split("|")
+        labels = _labels(host=host, endpoint=endpoint)
+        lines.append(
+            f"{METRIC_PREFIX}_response_bytes_total{{{labels}}} {value}"
+        )
+
+    metric_header(
+        "request_duration_seconds",
+        "histogram",
+        "Duration of the requests made to upstream APIs.",
+    )
+    for series, histogram in sorted(metrics["durations"].items()):
+        host, endpoint = series.split("|")
+        name = f"{METRIC_PREFIX}_request_duration_seconds"
+        count = histogram["count"]
+        for bound, bucket_count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+            labels = _labels(host=host, endpoint=endpoint, le=bound)
+            lines.append(f"{name}_bucket{{{labels}}} {bucket_count}")
+        labels = _labels(host=host, endpoint=endpoint, le="+Inf")
+        lines.append(f"{name}_bucket{{{labels}}} {count}")
+        labels = _labels(host=host, endpoint=endpoint)
+        lines.append(f"{name}_sum{{{labels}}} {histogram['sum']}")
+        lines.append(f"{name}_count{{{labels}}} {count}")
+
+    metric_header(
+        "pool_connections_total",
+        "counter",
+        "Keep-alive pool hits, misses and evictions.",
+    )
+    for series, value in sorted(metrics["pool_events"].items()):
+        host, event = series.split("|")
+        labels = _labels(host=host, event=event)
+        lines.append(
+            f"{METRIC_PREFIX}_pool_connections_total{{{labels}}} {value}"
+        )
+
+    metric_header(
+        "circuit_open",
+        "gauge",
+        "Whether the circuit breaker of an upstream is open.",
+    )
+    for host, state in sorted(metrics["circuits"].items()):
+        labels = _labels(host=host)
+        value = 1 if state == "open" else 0
+        lines.append(f"{METRIC_PREFIX}_circuit_open{{{labels}}} {value}")
+
+    lines.append(
+        f"# HELP {CACHE_METRIC_PREFIX}_lookups_total Lookups of cached values."
+    )
+    lines.append(f"# TYPE {CACHE_METRIC_PREFIX}_lookups_total counter")
+    for series, value in sorted(metrics["cache_lookups"].items()):
+        prefix, outcome = series.split("|")
+        labels = _labels(prefix=prefix, outcome=outcome)
+        lines.append(
+            f"{CACHE_METRIC_PREFIX}_lookups_total{{{labels}}} {value}"
+        )
+
+    lines.append(
+        f"# HELP {CACHE_METRIC_PREFIX}_lookup_seconds_total "
+        "Time spent looking up cached values, fetching them on misses."
+    )
+    lines.append(f"# TYPE {CACHE_METRIC_PREFIX}_lookup_seconds_total counter")
+    for series, value in sorted(metrics["cache_seconds"].items()):
+        prefix, outcome = series.split("|")
+        labels = _labels(prefix=prefix, outcome=outcome)
+        lines.append(
+            f"{CACHE_METRIC_PREFIX}_lookup_seconds_total{{{labels}}} {value}"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+upstream_metrics = UpstreamMetrics(circuit_breakers=upstream_circuit_breakers)
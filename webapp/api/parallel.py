@@ -0,0 +1,115 @@
+"""
+Run independent upstream calls concurrently.
+
+Under the gevent workers of gunicorn each call runs in its own greenlet,
+elsewhere (tests, flask run) in a thread. The request context is carried
+over to the calls so that they can use `flask.request` and friends.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import flask
+
+from webapp.api.exceptions import ApiTimeoutError
+from webapp.config import UPSTREAM_FANOUT_TIMEOUT
+
+try:
+    import gevent
+    from gevent import monkey
+except ImportError:
+    gevent = None
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelResults:
+    """Outcome of each of the calls of `run_parallel`, by name"""
+
+    def __init__(self):
+        self.values = {}
+        self.errors = {}
+
+    def get(self, name):
+        """Return the value of a call, raising its error if it failed"""
+        if name in self.errors:
+            raise self.errors[name]
+        return self.values[name]
+
+    def get_or_default(self, name, default=None):
+        """Return the value of a call, or `default` if it failed"""
+        if name in self.errors:
+            logger.warning(
+                "Parallel call %s failed: %r", name, self.errors[name]
+            )
+            return default
+        return self.values.get(name, default)
+
+
+def _uses_gevent():
+    return gevent is not None and monkey.is_module_patched("socket")
+
+
+def _with_context(function):
+    if flask.has_request_context():
+        return flask.copy_current_request_context(function)
+    if flask.has_app_context():
+        app = flask.current_app._get_current_object()
+
+        def run_in_app_context():
+            with app.app_context():
+                return function()
+
+        return run_in_app_context
+    return function
+
+
+def run_parallel(calls, timeouts=None, timeout=UPSTREAM_FANOUT_TIMEOUT):
+    """Run the functions of `calls` concurrently
+
+    `calls` maps names to functions taking no arguments. A call still
+    running `timeouts[name]` (or `timeout`) seconds after they all started
+    fails with `ApiTimeoutError`. Failures don't affect the other calls:
+    each call's value or error is available from the returned results.
+    """
+    timeouts = timeouts or {}
+    results = ParallelResults()
+    start = time.monotonic()
+
+    if _uses_gevent():
+        tasks = {
+            name: gevent.spawn(_with_context(function))
+            for name, function in calls.items()
+        }
+    else:
+        executor = ThreadPoolExecutor(max_workers=max(len(calls), 1))
+        tasks = {
+            name: executor.submit(_with_context(function))
+            for name, function in calls.items()
+        }
+        executor.shutdown(wait=False)
+
+    for name, task in tasks.items():
+        remaining = max(
+            start + timeouts.get(name, timeout) - time.monotonic(), 0
+        )
+
+        try:
+            if _uses_gevent():
+                task.join(timeout=remaining)
+                if not task.ready():
+                    task.kill(block=False)
+                    raise FutureTimeoutError()
+                results.values[name] = task.get()
+            else:
+                results.values[name] = task.result(timeout=remaining)
+        except FutureTimeoutError:
+            results.errors[name] = ApiTimeoutError(
+                f"The {name} call took too long"
+            )
+        except Exception as error:
+            results.errors[name] = error
+
+    return results
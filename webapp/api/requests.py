@@ -1,22 +1,363 @@
+import base64
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
 
+import redis
 from requests import Session as RequestsSession
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
 from requests.exceptions import Timeout, ConnectionError
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
 
-from webapp.api.exceptions import ApiConnectionError, ApiTimeoutError
+from webapp.api.circuit_breaker import upstream_circuit_breakers
+from webapp.api.exceptions import (
+    ApiCircuitOpenError,
+    ApiConnectionError,
+    ApiTimeoutError,
+)
+from webapp.api.instrumentation import (
+    get_logical_endpoint,
+    upstream_metrics,
+)
+from webapp.config import (
+    UPSTREAM_POOL_IDLE_TIMEOUT,
+    UPSTREAM_POOL_MAX_AGE,
+    UPSTREAM_POOL_MAXSIZE,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class GeventGreenletTimeout(Exception):
     pass
 
 
+class PoolStats:
+    """Keep-alive counters for a pooled session, grouped by upstream host
+
+    - hits: a request reused an open connection (no TCP/TLS handshake)
+    - misses: a request had to open a new connection
+    - evictions: an open connection was dropped for being idle or too old
+    """
+
+    def __init__(self):
+        self._counters = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "evictions": 0}
+        )
+
+    def increment(self, host, counter):
+        self._counters[host][counter] += 1
+
+    def as_dict(self):
+        return {
+            host: dict(counters) for host, counters in self._counters.items()
+        }
+
+
+class _KeepAliveMixin:
+    """Connection pool behaviour shared by the HTTP and HTTPS pools
+
+    Connections are checked on the way out of the pool: the ones idle for
+    longer than `idle_timeout` or opened more than `max_age` seconds ago are
+    closed so that a fresh connection gets opened in their place.
+    """
+
+    idle_timeout = UPSTREAM_POOL_IDLE_TIMEOUT
+    max_age = UPSTREAM_POOL_MAX_AGE
+    stats = None
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        now = time.monotonic()
+
+        if conn.sock is not None:
+            connected_at = getattr(conn, "_keepalive_connected_at", now)
+            last_used_at = getattr(conn, "_keepalive_last_used_at", now)
+
+            if (
+                now - last_used_at > self.idle_timeout
+                or now - connected_at > self.max_age
+            ):
+                conn.close()
+                self._record("evictions")
+
+        if conn.sock is None:
+            conn._keepalive_connected_at = now
+            self._record("misses")
+        else:
+            self._record("hits")
+
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._keepalive_last_used_at = time.monotonic()
+        super()._put_conn(conn)
+
+    def _record(self, counter):
+        if self.stats is not None:
+            self.stats.increment(self.host, counter)
+            upstream_metrics.record_pool_event(self.host, counter)
+
+
+class KeepAliveHTTPConnectionPool(_KeepAliveMixin, HTTPConnectionPool):
+    pass
+
+
+class KeepAliveHTTPSConnectionPool(_KeepAliveMixin, HTTPSConnectionPool):
+    pass
+
+
+class KeepAlivePoolManager(PoolManager):
+    def __init__(self, *args, idle_timeout, max_age, stats, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.stats = stats
+        self.pool_classes_by_scheme = {
+            "http": KeepAliveHTTPConnectionPool,
+            "https": KeepAliveHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.idle_timeout = self.idle_timeout
+        pool.max_age = self.max_age
+        pool.stats = self.stats
+        return pool
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTP adapter keeping a pool of persistent connections per host"""
+
+    def __init__(self, idle_timeout, max_age, stats, **kwargs):
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+
+        self.poolmanager = KeepAlivePoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            idle_timeout=self.idle_timeout,
+            max_age=self.max_age,
+            stats=self.stats,
+            **kwargs,
+        )
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.interrupted = False
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls within a worker
+
+    The first caller for a key runs the call, any caller arriving with the
+    same key while it is in flight waits for it and gets the same result
+    (or exception) instead of making its own call. If the first caller is
+    killed before the call returns, the waiting callers make it again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.interrupted:
+                return self.do(key, fn)
+            if call.error:
+                raise call.error
+            return call.response
+
+        try:
+            call.response = fn()
+        except Exception as error:
+            call.error = error
+            raise
+        except BaseException:
+            # The leader was killed, e.g. by the timeout of run_parallel,
+            # which isn't the followers' fate: they make the call again
+            call.interrupted = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.response
+
+
+class RedisSingleFlight(SingleFlight):
+    """Coalesce identical concurrent calls across workers and pods
+
+    Calls are first coalesced within the worker, then the worker holding a
+    short-lived Redis lock for the key runs the call and shares the
+    response through Redis for `result_ttl` seconds. The other workers poll
+    for it for up to `wait_timeout` seconds, and make the call themselves
+    if it doesn't show up or if Redis fails.
+    """
+
+    def __init__(
+        self,
+        client,
+        lock_ttl=15,
+        result_ttl=2,
+        wait_timeout=12,
+        poll_interval=0.05,
+    ):
+        super().__init__()
+        self.client = client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def do(self, key, fn):
+        return super().do(key, lambda: self._do_shared(key, fn))
+
+    def _do_shared(self, key, fn):
+        lock_key = f"singleflight:lock:{key}"
+        result_key = f"singleflight:result:{key}"
+
+        try:
+            shared = self.client.get(result_key)
+            if shared:
+                return _decode_response(shared)
+
+            if not self.client.set(lock_key, 1, nx=True, ex=self.lock_ttl):
+                return self._wait_for_result(lock_key, result_key, fn)
+        except redis.RedisError as error:
+            logger.warning("Redis singleflight unavailable: %s", error)
+            return fn()
+
+        try:
+            response = fn()
+            self.client.setex(
+                result_key, self.result_ttl, _encode_response(response)
+            )
+            return response
+        except redis.RedisError as error:
+            logger.warning("Redis singleflight result not shared: %s", error)
+            return response
+        finally:
+            try:
+                self.client.delete(lock_key)
+            except redis.RedisError:
+                pass
+
+    def _wait_for_result(self, lock_key, result_key, fn):
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            shared = self.client.get(result_key)
+            if shared:
+                return _decode_response(shared)
+            if not self.client.exists(lock_key):
+                break
+
+        return fn()
+
+
+def _encode_response(response):
+    return json.dumps(
+        {
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "url": response.url,
+            "encoding": response.encoding,
+            "headers": dict(response.headers),
+            "content": base64.b64encode(response.content).decode("ascii"),
+        }
+    )
+
+
+def _decode_response(data):
+    data = json.loads(data)
+    response = Response()
+    response.status_code = data["status_code"]
+    response.reason = data["reason"]
+    response.url = data["url"]
+    response.encoding = data["encoding"]
+    response.headers = CaseInsensitiveDict(data["headers"])
+    response._content = base64.b64decode(data["content"])
+    return response
+
+
+def _coalescing_key(method, url, kwargs):
+    """Identify a request by everything that can change its response"""
+    parts = json.dumps(
+        {
+            "method": method.upper(),
+            "url": url,
+            "params": kwargs.get("params"),
+            "headers": kwargs.get("headers"),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+
 class BaseSession:
     """A base session interface to implement common functionality
 
     Create an interface to manage exceptions and return API exceptions
+
+    By default every request closes its connection. With `pooled=True`,
+    connections are kept alive and reused per host, up to `pool_maxsize`
+    connections per host, evicting the ones idle for `idle_timeout`
+    seconds or older than `max_age` seconds.
+
+    With `coalesce=True`, identical concurrent GET and HEAD requests made
+    through the session share a single upstream call. Pass a
+    `RedisSingleFlight` as `singleflight` to share it across workers.
+
+    Requests to an upstream host that keeps failing or timing out fail fast
+    with `ApiCircuitOpenError` instead of waiting for the timeout. Pass
+    `circuit_breakers=None` to always attempt them.
     """
 
-    def __init__(self, *args, **kwargs):
+    COALESCED_METHODS = ("GET", "HEAD")
+
+    def __init__(
+        self,
+        *args,
+        pooled=False,
+        pool_maxsize=UPSTREAM_POOL_MAXSIZE,
+        idle_timeout=UPSTREAM_POOL_IDLE_TIMEOUT,
+        max_age=UPSTREAM_POOL_MAX_AGE,
+        coalesce=False,
+        singleflight=None,
+        circuit_breakers=upstream_circuit_breakers,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
 
         # TODO allow user to choose it's own user agent
@@ -24,22 +365,130 @@ class BaseSession:
             commit_hash=os.getenv("COMMIT_ID", "commit_id"),
             environment=os.getenv("ENVIRONMENT", "devel"),
         )
-        headers = {"User-Agent": storefront_header, "Connection": "close"}
+        headers = {"User-Agent": storefront_header}
+
+        self.pooled = pooled
+        self.pool_stats = PoolStats() if pooled else None
+
+        if pooled:
+            adapter = KeepAliveAdapter(
+                idle_timeout=idle_timeout,
+                max_age=max_age,
+                stats=self.pool_stats,
+                pool_maxsize=pool_maxsize,
+            )
+            self.mount("https://", adapter)
+            self.mount("http://", adapter)
+        else:
+            headers["Connection"] = "close"
+
         self.headers.update(headers)
 
+        self.singleflight = None
+        if coalesce:
+            self.singleflight = singleflight or SingleFlight()
+
+        self.circuit_breakers = circuit_breakers
+
+    def get_pool_stats(self):
+        """Return the keep-alive hit/miss counters per upstream host"""
+        if not self.pool_stats:
+            return {}
+        return self.pool_stats.as_dict()
+
     def request(self, method, url, timeout=12, **kwargs):
+        if (
+            self.singleflight
+            and method.upper() in self.COALESCED_METHODS
+            and not kwargs.get("stream")
+            and not kwargs.get("data")
+            and not kwargs.get("json")
+        ):
+            return self.singleflight.do(
+                _coalescing_key(method, url, kwargs),
+                lambda: self._request(method, url, timeout, **kwargs),
+            )
+
+        return self._request(method, url, timeout, **kwargs)
+
+    def _request(self, method, url, timeout, **kwargs):
+        parsed_url = urlparse(url)
+        host = parsed_url.hostname
+
+        breaker = None
+        if self.circuit_breakers and self.circuit_breakers.enabled:
+            breaker = self.circuit_breakers.get(host)
+            if not breaker.allow_request():
+                raise ApiCircuitOpenError(
+                    "The request to {} was not attempted, {} is "
+                    "failing".format(url, breaker.host)
+                )
+
+        endpoint = get_logical_endpoint(host, parsed_url.path)
+        start = time.monotonic()
+
         try:
-            return super().request(
+            response = super().request(
                 method=method, url=url, timeout=timeout, **kwargs
             )
         except Timeout:
+            if breaker:
+                breaker.record_failure()
+            upstream_metrics.record_request(
+                host, endpoint, method, "timeout", time.monotonic() - start
+            )
             raise ApiTimeoutError(
                 "The request to {} took too long".format(url)
             )
         except ConnectionError:
+            if breaker:
+                breaker.record_failure()
+            upstream_metrics.record_request(
+                host,
+                endpoint,
+                method,
+                "connection-error",
+                time.monotonic() - start,
+            )
             raise ApiConnectionError(
                 "Failed to establish connection to {}.".format(url)
             )
+        except Exception:
+            # Any other upstream error, e.g. TooManyRedirects, must still be
+            # recorded, or a half-open circuit would wait for its trial
+            if breaker:
+                breaker.record_failure()
+            raise
+        except BaseException:
+            # The greenlet was killed by the time budget of its caller, e.g.
+            # in run_parallel, which says nothing about the upstream
+            if breaker:
+                breaker.release_trial()
+            raise
+
+        if breaker:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+        upstream_metrics.record_request(
+            host,
+            endpoint,
+            method,
+            response.status_code,
+            time.monotonic() - start,
+            _get_response_size(response),
+        )
+
+        return response
+
+
+def _get_response_size(response):
+    # The body of streamed responses isn't read yet
+    if response.raw is None or response._content_consumed:
+        return len(response.content or b"")
+    return int(response.headers.get("Content-Length", 0))
 
 
 class Session(BaseSession, RequestsSession):
@@ -8,11 +8,14 @@ The web frontend for the snap store.
 # loaded properly and the FLASK_* prefix is stripped before they are parsed
 import webapp.config  # noqa: F401
 
+import hmac
+
 import sentry_sdk
-from flask import send_from_directory
+from flask import abort, make_response, request, send_from_directory
 
 from canonicalwebteam.flask_base.app import FlaskBase
 from webapp.blog.views import init_blog
+from webapp.content import content_registry
 from webapp.docs.views import init_docs
 from webapp.extensions import csrf, vite
 from webapp.handlers import set_handlers
@@ -24,6 +27,7 @@ from webapp.admin.views import admin
 from webapp.publisher.views import account
 from webapp.snapcraft.views import snapcraft_blueprint
 from webapp.store.views import store_blueprint
+from webapp.store.cache_warmup import cache_cli
 from webapp.tutorials.views import init_tutorials
 from webapp.packages.store_packages import store_packages
 from webapp.endpoints.views import endpoints
@@ -36,7 +40,13 @@ from webapp.endpoints.validation_sets import validation_sets
 from webapp.endpoints.invites import invites
 from webapp.endpoints.settings import settings
 from webapp.feeds.feeds import feeds
-from webapp.config import SENTRY_DSN
+from webapp.api.circuit_breaker import upstream_circuit_breakers
+from webapp.api.instrumentation import render_prometheus, upstream_metrics
+from webapp.config import (
+    METRICS_TOKEN,
+    SENTRY_DSN,
+    UPSTREAM_BREAKER_ENABLED,
+)
 
 
 def create_app(testing=False):
@@ -54,6 +64,11 @@ def create_app(testing=False):
     app.name = "snapcraft"
     app.testing = testing
 
+    # Upstream failures mocked by the tests must not open the circuits
+    upstream_circuit_breakers.enabled = (
+        UPSTREAM_BREAKER_ENABLED and not testing
+    )
+
     # This is required because Pragma icons are served from `/icons` at the
     # root of the project, which is a problem for snapcraft.io as that is
     # the URL pattern we use for snap names. To resolve this, we are
@@ -74,9 +89,32 @@ def create_app(testing=False):
         serve_ds_icon,
     )
 
+    # Metrics of the calls made to upstream APIs, aggregated across workers,
+    # only for the scrapers that have the METRICS_TOKEN
+    def upstream_metrics_view():
+        authorization = request.headers.get("Authorization", "")
+        if not METRICS_TOKEN or not hmac.compare_digest(
+            authorization, f"Bearer {METRICS_TOKEN}"
+        ):
+            abort(404)
+
+        response = make_response(render_prometheus(upstream_metrics.collect()))
+        response.headers["Content-Type"] = "text/plain; version=0.0.4"
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    app.add_url_rule(
+        "/_status/metrics",
+        "upstream-metrics",
+        upstream_metrics_view,
+    )
+
     init_extensions(app)
     set_handlers(app)
 
+    # Parse the YAML content files once, before serving any page
+    content_registry.load()
+
     app.register_blueprint(snapcraft_blueprint())
     app.register_blueprint(store_packages)
     app.register_blueprint(login)
@@ -100,6 +138,8 @@ def create_app(testing=False):
     init_blog(app, "/blog")
     init_tutorials(app, "/tutorials")
 
+    app.cli.add_command(cache_cli)
+
     return app
 
 
@@ -8,7 +8,7 @@ from canonicalwebteam.blog import (
     build_blueprint,
     NotFoundError,
 )
-from cache.cache_utility import redis_cache
+from cache.decorators import cached
 from dateutil import parser
 from requests.exceptions import RequestException
 
@@ -29,15 +29,10 @@ def init_blog(app, url_prefix):
         )
     )
 
-    @blog.route("/api/snap-posts/<snap>")
-    def snap_posts(snap):
-        cached_articles_key = f"snap_posts:{snap}"
-        cached_articles = redis_cache.get(
-            cached_articles_key, expected_type=list
-        )
-        if cached_articles:
-            return flask.jsonify(cached_articles)
-
+    @cached(
+        "snap_posts:{snap}", ttl=3600, negative_ttl=300, expected_type=list
+    )
+    def get_snap_posts(snap):
         try:
             blog_tags = blog_api.get_tag_by_slug(f"sc:snap:{snap}")
         except NotFoundError:
@@ -84,18 +79,19 @@ def init_blog(app, url_prefix):
                         "image": featured_media,
                     }
                 )
-        redis_cache.set(cached_articles_key, articles, ttl=3600)
-        return flask.jsonify(articles)
+        return articles
 
-    @blog.route("/api/series/<series>")
-    def snap_series(series):
-        cached_articles_key = f"snap_series:{series}"
-        cached_articles = redis_cache.get(
-            cached_articles_key, expected_type=list
-        )
-        if cached_articles:
-            return flask.jsonify(cached_articles)
+    @blog.route("/api/snap-posts/<snap>")
+    def snap_posts(snap):
+        return flask.jsonify(get_snap_posts(snap))
 
+    @cached(
+        "snap_series:{series}",
+        ttl=3600,
+        negative_ttl=300,
+        expected_type=list,
+    )
+    def get_snap_series(series):
         blog_articles = None
         articles = []
 
@@ -111,8 +107,11 @@ def init_blog(app, url_prefix):
                     "title": article["title"]["rendered"],
                 }
             )
-        redis_cache.set(cached_articles_key, articles, ttl=3600)
-        return flask.jsonify(articles)
+        return articles
+
+    @blog.route("/api/series/<series>")
+    def snap_series(series):
+        return flask.jsonify(get_snap_series(series))
 
     @blog.context_processor
     def add_newsletter():
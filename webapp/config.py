@@ -1,4 +1,5 @@
 import os
+import tempfile
 from canonicalwebteam.flask_base.env import load_plain_env_variables
 
 
@@ -21,6 +22,120 @@ LP_MAX_BUILD_PAGES = int(os.getenv("LP_MAX_BUILD_PAGES", "5"))
 # Max Launchpad recipes to scan per store name: one name can match dozens
 # (firefox has 62), so the right one is rarely the first.
 LP_MAX_RECIPES = int(os.getenv("LP_MAX_RECIPES", "5"))
+# Keep-alive connection pooling for the shared upstream API sessions.
+# Connections idle for longer than UPSTREAM_POOL_IDLE_TIMEOUT seconds, or
+# opened more than UPSTREAM_POOL_MAX_AGE seconds ago, are reopened.
+UPSTREAM_POOL_ENABLED = (
+    os.getenv("UPSTREAM_POOL_ENABLED", "true").lower() == "true"
+)
+UPSTREAM_POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", "10"))
+UPSTREAM_POOL_IDLE_TIMEOUT = int(os.getenv("UPSTREAM_POOL_IDLE_TIMEOUT", "30"))
+UPSTREAM_POOL_MAX_AGE = int(os.getenv("UPSTREAM_POOL_MAX_AGE", "300"))
+# Identical concurrent GET requests to the public store API share a single
+# upstream call per worker, or across workers through Redis when
+# UPSTREAM_COALESCE_SHARED is enabled.
+UPSTREAM_COALESCE_ENABLED = (
+    os.getenv("UPSTREAM_COALESCE_ENABLED", "true").lower() == "true"
+)
+UPSTREAM_COALESCE_SHARED = (
+    os.getenv("UPSTREAM_COALESCE_SHARED", "false").lower() == "true"
+)
+# Per-upstream circuit breakers: once UPSTREAM_BREAKER_FAILURE_RATE of at
+# least UPSTREAM_BREAKER_MIN_CALLS requests to a host failed within
+# UPSTREAM_BREAKER_WINDOW seconds, requests to it fail fast for
+# UPSTREAM_BREAKER_RESET_TIMEOUT seconds.
+UPSTREAM_BREAKER_ENABLED = (
+    os.getenv("UPSTREAM_BREAKER_ENABLED", "true").lower() == "true"
+)
+UPSTREAM_BREAKER_FAILURE_RATE = float(
+    os.getenv("UPSTREAM_BREAKER_FAILURE_RATE", "0.5")
+)
+UPSTREAM_BREAKER_MIN_CALLS = int(os.getenv("UPSTREAM_BREAKER_MIN_CALLS", "10"))
+UPSTREAM_BREAKER_WINDOW = int(os.getenv("UPSTREAM_BREAKER_WINDOW", "30"))
+UPSTREAM_BREAKER_RESET_TIMEOUT = int(
+    os.getenv("UPSTREAM_BREAKER_RESET_TIMEOUT", "15")
+)
+# How long the last good copy of cached upstream data is kept around to be
+# served while the upstream is unavailable
+STALE_CACHE_TTL = int(os.getenv("STALE_CACHE_TTL", "86400"))
+# How long a page waits for the upstream calls it makes concurrently
+UPSTREAM_FANOUT_TIMEOUT = float(os.getenv("UPSTREAM_FANOUT_TIMEOUT", "10"))
+# In-process LRU in front of Redis, for each worker. Entries are kept for
+# CACHE_L1_TTL seconds, within CACHE_L1_MAXSIZE entries and
+# CACHE_L1_MAX_BYTES bytes
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "true").lower() == "true"
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "5"))
+CACHE_L1_MAXSIZE = int(os.getenv("CACHE_L1_MAXSIZE", "1000"))
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(32 * 1024**2)))
+# Cached values from this size, in characters, are stored compressed
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "2048"))
+# How long snap pages keep answering 404 for snaps that are unknown,
+# quarantined or without any channel, without asking the store API again
+SNAP_NOT_FOUND_CACHE_TTL = int(os.getenv("SNAP_NOT_FOUND_CACHE_TTL", "300"))
+# `flask cache warm` primes the pages of the CACHE_WARM_TOP_SNAPS most
+# popular snaps, requesting CACHE_WARM_CONCURRENCY pages at a time
+CACHE_WARM_TOP_SNAPS = int(os.getenv("CACHE_WARM_TOP_SNAPS", "20"))
+CACHE_WARM_CONCURRENCY = int(os.getenv("CACHE_WARM_CONCURRENCY", "4"))
+# How long the part of the snap pages context shared by all visitors is
+# cached for
+SNAP_CONTEXT_CACHE_TTL = int(os.getenv("SNAP_CONTEXT_CACHE_TTL", "60"))
+# SBOMs never change once published: how long a revision is remembered as
+# having one, or as not having one yet
+SBOM_FOUND_CACHE_TTL = int(os.getenv("SBOM_FOUND_CACHE_TTL", "604800"))
+SBOM_MISSING_CACHE_TTL = int(os.getenv("SBOM_MISSING_CACHE_TTL", "3600"))
+# Directory SBOM downloads are kept in, to serve them again without the
+# store API. Not kept when empty
+SBOM_CACHE_DIR = os.getenv("SBOM_CACHE_DIR", "")
+# Size in bytes the SBOMs kept on disk are capped at, the least recently
+# served ones are deleted first
+SBOM_CACHE_MAX_BYTES = int(
+    os.getenv("SBOM_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))
+)
+# How long the pages rendered for anonymous visitors are cached for, pages
+# bigger than PAGE_CACHE_MAX_BYTES aren't
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "300"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", "524288"))
+# Rendered markdown descriptions are cached in Redis for
+# MARKDOWN_CACHE_TTL seconds, and in a per-worker LRU of
+# MARKDOWN_CACHE_MAXSIZE entries and MARKDOWN_CACHE_MAX_BYTES bytes
+MARKDOWN_CACHE_TTL = int(os.getenv("MARKDOWN_CACHE_TTL", "604800"))
+MARKDOWN_CACHE_MAXSIZE = int(os.getenv("MARKDOWN_CACHE_MAXSIZE", "2000"))
+MARKDOWN_CACHE_MAX_BYTES = int(
+    os.getenv("MARKDOWN_CACHE_MAX_BYTES", str(16 * 1024**2))
+)
+# Descriptions longer than MARKDOWN_MAX_LENGTH characters, or taking more
+# than MARKDOWN_RENDER_TIME_BUDGET seconds to render, are shown as plain
+# text, for a pathological description not to hold a worker
+MARKDOWN_MAX_LENGTH = int(os.getenv("MARKDOWN_MAX_LENGTH", "20000"))
+MARKDOWN_RENDER_TIME_BUDGET = float(
+    os.getenv("MARKDOWN_RENDER_TIME_BUDGET", "0.5")
+)
+# A description over the time budget may render in time on a less busy
+# worker, its plain text is only kept for MARKDOWN_FALLBACK_CACHE_TTL
+# seconds, in the worker
+MARKDOWN_FALLBACK_CACHE_TTL = int(
+    os.getenv("MARKDOWN_FALLBACK_CACHE_TTL", "60")
+)
+# Seconds between two refreshes of the reference data from the store API,
+# e.g. the categories, and before retrying a refresh that failed
+REFERENCE_DATA_REFRESH_INTERVAL = int(
+    os.getenv("REFERENCE_DATA_REFRESH_INTERVAL", "3600")
+)
+REFERENCE_DATA_RETRY_INTERVAL = int(
+    os.getenv("REFERENCE_DATA_RETRY_INTERVAL", "60")
+)
+# Where each worker dumps its upstream call metrics, for the metrics
+# endpoint to aggregate them across workers
+UPSTREAM_METRICS_DIR = os.getenv(
+    "UPSTREAM_METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), "snapcraft-upstream-metrics"),
+)
+# Age in seconds from which the circuit states dumped by a worker are not
+# reported anymore
+UPSTREAM_METRICS_MAX_AGE = int(os.getenv("UPSTREAM_METRICS_MAX_AGE", "60"))
+# Token the scrapers of the metrics endpoint send as a bearer token. The
+# endpoint answers 404 when it isn't set
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 ENVIRONMENT = os.getenv("ENVIRONMENT", "devel")
 IS_DEVELOPMENT = ENVIRONMENT == "devel"
 COMMIT_ID = os.getenv("COMMIT_ID", "commit_id")
@@ -0,0 +1,131 @@
+"""
+Registry of the YAML content files of the app: developers, distros,
+publisher pages, the listing tour and the livestreams.
+
+The files are parsed once at startup instead of on every page view, and
+served from memory as immutable structures, for a request not to change
+them for the next ones. In development, the files are checked for changes
+at most every CONTENT_RELOAD_INTERVAL seconds and reloaded.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from ruamel.yaml import YAML
+
+from webapp.config import IS_DEVELOPMENT
+
+logger = logging.getLogger(__name__)
+
+# Directories of the content files, relative to the webapp directory
+CONTENT_DIRECTORIES = [
+    "publisher/content",
+    "snapcraft/content",
+    "store/content",
+]
+
+# Minimum number of seconds between two checks for changed files
+CONTENT_RELOAD_INTERVAL = 1
+
+_yaml = YAML(typ="safe")
+
+
+class FrozenDict(dict):
+    """A dict that can't be changed, still serializable to JSON"""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("Content from the registry can't be changed")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(data):
+    """Return `data` with its dicts and lists made immutable"""
+    if isinstance(data, dict):
+        return FrozenDict((key, freeze(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(item) for item in data)
+    return data
+
+
+class ContentRegistry:
+    def __init__(self, directories, root_path=None, reload=False):
+        self.directories = directories
+        self.root_path = root_path or os.path.dirname(
+            os.path.abspath(__file__)
+        )
+        self.reload = reload
+        self._files = None
+        self._last_check = 0
+        self._lock = threading.Lock()
+
+    def _list_files(self):
+        """Return the modification time of each content file, by path
+        relative to the root path
+        """
+        mtimes = {}
+
+        for directory in self.directories:
+            top = os.path.join(self.root_path, directory)
+            for dirpath, _, filenames in os.walk(top):
+                for filename in filenames:
+                    if not filename.endswith((".yaml", ".yml")):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    relative_path = os.path.relpath(path, self.root_path)
+                    try:
+                        mtimes[relative_path] = os.stat(path).st_mtime_ns
+                    except OSError:
+                        continue
+
+        return mtimes
+
+    def _parse(self, relative_path):
+        try:
+            with open(os.path.join(self.root_path, relative_path)) as f:
+                return freeze(_yaml.load(f))
+        except Exception:
+            logger.exception("Can't load the content file %s", relative_path)
+            return None
+
+    def load(self):
+        """Parse the content files that changed since the last load"""
+        with self._lock:
+            previous_files = self._files or {}
+            files = {}
+
+            for path, mtime in self._list_files().items():
+                previous = previous_files.get(path)
+                if previous and previous[0] == mtime:
+                    files[path] = previous
+                else:
+                    files[path] = (mtime, self._parse(path))
+
+            self._files = files
+            self._last_check = time.monotonic()
+
+    def get(self, path):
+        """
+        Return the immutable content of the YAML file at `path`, relative
+        to the webapp directory, e.g. "store/content/distros/ubuntu.yaml",
+        or None if there is no such content file
+        """
+        if self._files is None:
+            self.load()
+        elif (
+            self.reload
+            and time.monotonic() - self._last_check >= CONTENT_RELOAD_INTERVAL
+        ):
+            self.load()
+
+        file = self._files.get(os.path.normpath(path))
+        return file[1] if file else None
+
+
+content_registry = ContentRegistry(CONTENT_DIRECTORIES, reload=IS_DEVELOPMENT)
@@ -0,0 +1,41 @@
+"""
+Parsing and formatting of the dates from the store API.
+
+The store API sends ISO 8601 timestamps, e.g.
+2019-01-12T16:48:41.821037+00:00, which datetime.fromisoformat parses many
+times faster than dateutil. dateutil is only used for the other formats.
+The same timestamps come up on every page view, so the results are
+memoized.
+"""
+
+import datetime
+import functools
+
+from dateutil import parser
+
+# Number of distinct dates each memo keeps
+DATES_MEMO_SIZE = 8192
+
+
+@functools.lru_cache(maxsize=DATES_MEMO_SIZE)
+def parse_date(date_string):
+    """Parse a date from the store API, raising ValueError when it isn't
+    a date, like `dateutil.parser.parse`
+    """
+    if not isinstance(date_string, str):
+        raise TypeError(f"Expected a date string, got {date_string!r}")
+
+    # Python < 3.11 doesn't accept the Z suffix
+    if date_string.endswith("Z"):
+        date_string = date_string[:-1] + "+00:00"
+
+    try:
+        return datetime.datetime.fromisoformat(date_string)
+    except ValueError:
+        return parser.parse(date_string)
+
+
+@functools.lru_cache(maxsize=DATES_MEMO_SIZE)
+def format_date(date_string, format):
+    """Format a date from the store API with `strftime` `format`"""
+    return parse_date(date_string).strftime(format)
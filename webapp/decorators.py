@@ -5,17 +5,23 @@ from datetime import datetime, timezone
 
 # Third party packages
 import flask
+from flask_wtf.csrf import generate_csrf
 
 from canonicalwebteam.store_api.dashboard import Dashboard
 from canonicalwebteam.store_api.publishergw import PublisherGW
 
+from cache.cache_utility import redis_cache
 from webapp import authentication
+from webapp.config import PAGE_CACHE_MAX_BYTES, PAGE_CACHE_TTL
 from webapp.helpers import api_publisher_session
 
 publisher_gateway = PublisherGW(api_publisher_session)
 _dashboard = Dashboard(api_publisher_session)
 logger = logging.getLogger(__name__)
 
+# Stands for the CSRF token of the visitor in the cached pages
+_CSRF_TOKEN_PLACEHOLDER = "__page_cache_csrf_token__"
+
 # Per-<snap_name> endpoints that must stay reachable even when the snap has
 # no published revisions.
 _UNRELEASED_GATE_SKIP_ENDPOINTS = frozenset(
@@ -146,3 +152,83 @@ def exchange_required(func):
         return func(*args, **kwargs)
 
     return is_exchanged
+
+
+def add_page_cache_tags(*tags):
+    """
+    Tag the page being rendered by a `cached_page` view, e.g. with the
+    tags of the snaps it lists.
+    """
+    if "page_cache_tags" in flask.g:
+        flask.g.page_cache_tags.extend(tags)
+
+
+def _get_csrf_token():
+    """Return the CSRF token if the page being rendered used one"""
+    field_name = flask.current_app.config.get(
+        "WTF_CSRF_FIELD_NAME", "csrf_token"
+    )
+    return flask.g.get(field_name)
+
+
+def cached_page(tags=(), vary=None):
+    """
+    Decorator caching the page rendered by a view for anonymous visitors,
+    for PAGE_CACHE_TTL seconds. Logged in users always get a fresh render.
+
+    Pages are cached per path, and per the dict returned by `vary`, a
+    function of the request for the inputs the page depends on, e.g. the
+    User-Agent.
+
+    `tags` are format strings of the view arguments, e.g.
+    ["snap:{snap_name}"], see `SnapcraftCache.invalidate_tags`. The view
+    can add more with `add_page_cache_tags`.
+
+    Only 200 HTML responses up to PAGE_CACHE_MAX_BYTES are cached.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def cached_view(*args, **kwargs):
+            if "publisher" in flask.session:
+                return func(*args, **kwargs)
+
+            cache_key = (
+                f"page:{flask.request.path}",
+                vary() if vary else {},
+            )
+            page = redis_cache.get(cache_key)
+            if page is not None:
+                if _CSRF_TOKEN_PLACEHOLDER in page:
+                    page = page.replace(
+                        _CSRF_TOKEN_PLACEHOLDER, generate_csrf()
+                    )
+                return page
+
+            flask.g.page_cache_tags = [tag.format(**kwargs) for tag in tags]
+            response = flask.make_response(func(*args, **kwargs))
+
+            if (
+                response.status_code != 200
+                or response.mimetype != "text/html"
+                or response.direct_passthrough
+                or response.calculate_content_length() > PAGE_CACHE_MAX_BYTES
+            ):
+                return response
+
+            page = response.get_data(as_text=True)
+            csrf_token = _get_csrf_token()
+            if csrf_token:
+                page = page.replace(csrf_token, _CSRF_TOKEN_PLACEHOLDER)
+            redis_cache.set(
+                cache_key,
+                page,
+                ttl=PAGE_CACHE_TTL,
+                tags=flask.g.page_cache_tags,
+            )
+
+            return response
+
+        return cached_view
+
+    return decorator
@@ -4,14 +4,15 @@ from json import loads
 # Packages
 import flask
 from canonicalwebteam.exceptions import (
-    StoreApiError,
     StoreApiResponseErrorList,
 )
 from canonicalwebteam.store_api.dashboard import Dashboard
-from canonicalwebteam.store_api.devicegw import DeviceGW
 
 # Local
-from webapp import helpers
+from cache.cache_utility import redis_cache
+from webapp import reference_data
+from webapp.content import content_registry
+from webapp.endpoints.utils import get_snap_cache_tag
 from webapp.helpers import api_session
 from webapp.decorators import login_required
 from webapp.publisher.snaps import logic
@@ -20,7 +21,6 @@ from webapp.store.logic import (
 )
 
 dashboard = Dashboard(api_session)
-device_gateway = DeviceGW("snap", api_session)
 
 
 @login_required
@@ -55,9 +55,7 @@ def get_listing_data(snap_name):
                 result.append({"url": url})
         return result
 
-    licenses = []
-    for license in helpers.get_licenses():
-        licenses.append({"key": license["licenseId"], "name": license["name"]})
+    licenses = reference_data.licenses.get().items
 
     license = snap_details["license"]
     license_type = "custom"
@@ -65,13 +63,8 @@ def get_listing_data(snap_name):
     if " AND " not in license.upper() and " WITH " not in license.upper():
         license_type = "simple"
 
-    try:
-        categories_results = device_gateway.get_categories()
-    except StoreApiError:
-        categories_results = []
-
     categories = sorted(
-        get_categories(categories_results),
+        get_categories({"categories": reference_data.categories.get().items}),
         key=lambda category: category["slug"],
     )
 
@@ -86,7 +79,7 @@ def get_listing_data(snap_name):
     ]
 
     filename = "publisher/content/listing_tour.yaml"
-    tour_steps = helpers.get_yaml(filename, typ="rt")
+    tour_steps = content_registry.get(filename)
 
     primary_category = ""
     if len(snap_categories["categories"]) > 0:
@@ -201,6 +194,8 @@ def post_listing_data(snap_name):
                 if api_response_error_list.status_code != 404:
                     error_list = error_list + api_response_error_list.errors
 
+        redis_cache.invalidate_tags(get_snap_cache_tag(snap_name))
+
         if error_list:
             try:
                 snap_details = dashboard.get_snap_info(
@@ -214,14 +209,6 @@ def post_listing_data(snap_name):
                 else:
                     error_list = error_list + api_response_error_list.errors
 
-            licenses = []
-            for license in helpers.get_licenses():
-                licenses.append(
-                    {"key": license["licenseId"], "name": license["name"]}
-                )
-
-            license = snap_details["license"]
-
             snap_categories = logic.replace_reserved_categories_key(
                 snap_details["categories"]
             )
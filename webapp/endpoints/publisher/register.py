@@ -6,8 +6,10 @@ from canonicalwebteam.exceptions import StoreApiResponseErrorList
 from flask.json import jsonify
 
 # Local
+from cache.cache_utility import redis_cache
 from webapp.helpers import api_publisher_session
 from webapp.decorators import login_required
+from webapp.endpoints.utils import get_snap_not_found_cache_key
 
 dashboard = Dashboard(api_publisher_session)
 
@@ -67,6 +69,8 @@ def post_register_name():
 
         return jsonify(res)
 
+    redis_cache.delete(get_snap_not_found_cache_key(snap_name))
+
     return jsonify({"success": True})
 
 
@@ -3,13 +3,15 @@ from json import loads
 
 # Packages
 import flask
-import pycountry
 from canonicalwebteam.store_api.dashboard import Dashboard
 from canonicalwebteam.exceptions import (
     StoreApiResponseErrorList,
 )
 
 # Local
+from cache.cache_utility import redis_cache
+from webapp import reference_data
+from webapp.endpoints.utils import get_snap_cache_tag
 from webapp.helpers import api_publisher_session, launchpad
 from webapp.decorators import login_required
 from webapp.publisher.snaps import logic
@@ -39,9 +41,7 @@ def get_settings_data(snap_name):
     else:
         blacklist_country_codes = []
 
-    countries = []
-    for country in pycountry.countries:
-        countries.append({"key": country.alpha_2, "name": country.name})
+    countries = reference_data.countries.get().items
 
     is_on_lp = False
     lp_snap = launchpad.get_snap_by_store_name(snap_name)
@@ -91,6 +91,7 @@ def post_settings_data(snap_name):
                 response = dashboard.snap_metadata(
                     flask.session, snap_id, body_json
                 )
+                redis_cache.invalidate_tags(get_snap_cache_tag(snap_name))
 
                 return flask.jsonify(response)
             except StoreApiResponseErrorList as api_response_error_list:
@@ -116,11 +117,7 @@ def post_settings_data(snap_name):
 
             field_errors, other_errors = logic.invalid_field_errors(error_list)
 
-            countries = []
-            for country in pycountry.countries:
-                countries.append(
-                    {"key": country.alpha_2, "name": country.name}
-                )
+            countries = reference_data.countries.get().items
 
             is_on_lp = False
             lp_snap = launchpad.get_snap_by_store_name(
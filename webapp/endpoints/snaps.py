@@ -13,7 +13,7 @@ from webapp.config import LP_MAX_BUILD_PAGES, LP_MAX_RECIPES
 from webapp.api.github import repository_is_public
 from webapp.api.launchpad_provenance import LaunchpadProvenance
 from webapp.endpoints.utils import get_auditable_map_cache_key
-from cache.cache_utility import redis_cache
+from cache.decorators import cached
 
 from canonicalwebteam.store_api.devicegw import DeviceGW
 from canonicalwebteam.store_api.dashboard import Dashboard
@@ -100,6 +100,14 @@ def dns_verified_status(snap_name):
     return response
 
 
+@cached(
+    get_auditable_map_cache_key,
+    ttl=lambda provenance_map: (
+        FAILED_PROVENANCE_TTL if provenance_map.get("failed") else 3600
+    ),
+    expected_type=dict,
+    tags=["snap:{snap_name}"],
+)
 def _get_provenance_map(snap_name):
     """Return the (cached) Launchpad provenance map for a snap.
 
@@ -111,19 +119,12 @@ def _get_provenance_map(snap_name):
     back to an already-struggling Launchpad. The repository check lives here
     so its single GitHub call rides the same cache.
     """
-    cache_key = get_auditable_map_cache_key(snap_name)
-    cached = redis_cache.get(cache_key, expected_type=dict)
-    if cached is not None:
-        return cached
-
     provenance_map = launchpad_provenance.build_provenance_map(
         snap_name, LP_MAX_BUILD_PAGES, LP_MAX_RECIPES
     )
     provenance_map["source_available"] = repository_is_public(
         provenance_map.get("github_repository")
     )
-    ttl = FAILED_PROVENANCE_TTL if provenance_map.get("failed") else 3600
-    redis_cache.set(cache_key, provenance_map, ttl=ttl)
     return provenance_map
 
 
@@ -134,19 +135,18 @@ def _resolve_default_install(details):
     track, lowest available risk, and a deterministic architecture preference
     (amd64 if published, otherwise the first architecture sorted).
     """
-    channel_maps = logic.convert_channel_maps(details.get("channel-map"))
-    if not channel_maps:
+    channel_map = logic.ChannelMap(details.get("channel-map"))
+    if not channel_map.by_architecture:
         return None, None
 
     default_track = details.get("default-track") or "latest"
-    lowest_risk = logic.get_lowest_available_risk(channel_maps, default_track)
+    lowest_risk = channel_map.get_lowest_available_risk(default_track)
 
-    architecture = logic.get_default_architecture(channel_maps.keys())
+    architecture = logic.get_default_architecture(channel_map.architectures)
 
-    releases = channel_maps.get(architecture, {}).get(default_track, [])
-    for release in releases:
-        if release["risk"] == lowest_risk:
-            return architecture, release["revision"]
+    release = channel_map.get_release(architecture, default_track, lowest_risk)
+    if release:
+        return architecture, release["revision"]
 
     return architecture, None
 
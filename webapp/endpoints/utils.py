@@ -21,3 +21,19 @@ def get_item_details_cache_key(snap_name):
 
 def get_auditable_map_cache_key(snap_name):
     return f"auditable_map:{snap_name}"
+
+
+def get_snap_not_found_cache_key(snap_name):
+    return f"snap_not_found:{snap_name}"
+
+
+def get_snap_cache_tag(snap_name):
+    """
+    Generate the cache tag of the cached data of a snap, see
+    `SnapcraftCache.invalidate_tags`.
+    """
+    return f"snap:{snap_name}"
+
+
+def get_publisher_cache_tag(publisher):
+    return f"publisher:{publisher}"
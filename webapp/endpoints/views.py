@@ -11,6 +11,7 @@ from flask.json import jsonify
 # Local
 from webapp.decorators import login_required, exchange_required
 from webapp.helpers import api_publisher_session, api_session, get_brand_id
+from webapp.reference_data import REFERENCE_DATA
 
 dashboard = Dashboard(api_session)
 publisher_gateway = PublisherGW("snap", api_publisher_session)
@@ -94,3 +95,26 @@ def get_brand_store(store_id: str):
     response.cache_control.max_age = 3600
 
     return response
+
+
+@endpoints.route("/api/reference-data/<name>")
+def get_reference_data(name):
+    """
+    Return the categories, countries or licenses, with an ETag for the
+    clients to revalidate them instead of downloading them again
+    """
+    if name not in REFERENCE_DATA:
+        flask.abort(404)
+
+    reference_list = REFERENCE_DATA[name].get()
+
+    if flask.request.if_none_match.contains(reference_list.etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(
+            {"success": True, "data": reference_list.items}
+        )
+
+    response.set_etag(reference_list.etag)
+
+    return response
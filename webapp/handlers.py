@@ -40,6 +40,8 @@ from canonicalwebteam.exceptions import (
 )
 
 from webapp.api.exceptions import (
+    ApiCircuitOpenError,
+    ApiFetchInProgressError,
     ApiError,
     ApiConnectionError,
     ApiResponseErrorList,
@@ -250,6 +252,8 @@ def set_handlers(app):
         )
 
     @app.errorhandler(503)
+    @app.errorhandler(ApiCircuitOpenError)
+    @app.errorhandler(ApiFetchInProgressError)
     def service_unavailable(error):
         return render_template("503.html"), 503
 
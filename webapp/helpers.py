@@ -6,14 +6,28 @@ import sentry_sdk
 import flask
 from canonicalwebteam.launchpad import Launchpad
 from ruamel.yaml import YAML
-from webapp.api.requests import PublisherSession, Session
+from webapp.api.requests import PublisherSession, RedisSingleFlight, Session
 from canonicalwebteam.store_api.dashboard import Dashboard
 import webapp.api.marketo as marketo_api
+from webapp.config import (
+    UPSTREAM_COALESCE_ENABLED,
+    UPSTREAM_COALESCE_SHARED,
+    UPSTREAM_POOL_ENABLED,
+)
+from cache.cache_utility import redis_cache
 
 _yaml = YAML(typ="rt")
 _yaml_safe = YAML(typ="safe")
-api_session = Session()
-api_publisher_session = PublisherSession()
+api_session = Session(
+    pooled=UPSTREAM_POOL_ENABLED,
+    coalesce=UPSTREAM_COALESCE_ENABLED,
+    singleflight=(
+        RedisSingleFlight(redis_cache.client)
+        if UPSTREAM_COALESCE_SHARED and redis_cache.redis_available
+        else None
+    ),
+)
+api_publisher_session = PublisherSession(pooled=UPSTREAM_POOL_ENABLED)
 marketo = marketo_api.Marketo()
 dashboard = Dashboard(api_session)
 
@@ -1,6 +1,10 @@
+import hashlib
+import logging
 import re
 import html
+import time
 
+import mistune
 from mistune import HTMLRenderer, Markdown
 from mistune.block_parser import BlockParser
 from mistune.inline_parser import InlineParser
@@ -8,11 +12,50 @@ from mistune.plugins.formatting import strikethrough
 from mistune.plugins.url import url
 from mistune.util import expand_leading_tab
 
+from cache.cache_utility import redis_cache
+from cache.local_cache import LocalCache
+from webapp.config import (
+    MARKDOWN_CACHE_MAX_BYTES,
+    MARKDOWN_CACHE_MAXSIZE,
+    MARKDOWN_CACHE_TTL,
+    MARKDOWN_FALLBACK_CACHE_TTL,
+    MARKDOWN_MAX_LENGTH,
+    MARKDOWN_RENDER_TIME_BUDGET,
+)
+
+logger = logging.getLogger(__name__)
+
 # All the overrides were discussed here:
 # https://forum.snapcraft.io/t/use-of-markdown-in-snap-metadata-summary-description/2128
 
 _INDENT_CODE_TRIM = re.compile(r"^ {1,3}", flags=re.M)
 
+# Bump when the parsers below change how descriptions are rendered, for the
+# cached renders to be dropped
+PARSER_VERSION = f"1-{mistune.__version__}"
+
+# The renders of a description never change, they are kept in each worker
+# as long as in Redis
+markdown_cache = LocalCache(
+    maxsize=MARKDOWN_CACHE_MAXSIZE,
+    max_bytes=MARKDOWN_CACHE_MAX_BYTES,
+    ttl=MARKDOWN_CACHE_TTL,
+)
+
+
+class RenderBudgetExceeded(Exception):
+    """A description took longer than its time budget to render"""
+
+
+def _check_deadline(state):
+    # Checked before each rule: a rule already running can't be stopped,
+    # a regex least of all. Each rule is linear in the length of the
+    # description, capped at MARKDOWN_MAX_LENGTH, and takes a few
+    # milliseconds at most, it's their number that can blow up
+    deadline = state.env.get("deadline")
+    if deadline and time.monotonic() > deadline:
+        raise RenderBudgetExceeded()
+
 
 class SnapcraftBlockParser(BlockParser):
     SPECIFICATION = {
@@ -46,6 +89,7 @@ class SnapcraftBlockParser(BlockParser):
         return m.end()
 
     def parse_method(self, m, state):
+        _check_deadline(state)
         # mistune's list parser invokes parse_method for rules outside
         # DEFAULT_RULES (atx_heading, block_quote, ...) render those as
         # paragraph text instead of letting the inherited methods run.
@@ -94,6 +138,10 @@ class SnapcraftInlineParser(InlineParser):
         if "softbreak" in self.rules:
             self.rules.remove("softbreak")
 
+    def parse_method(self, m, state):
+        _check_deadline(state)
+        return super().parse_method(m, state)
+
     def parse_link(self, m, state):
         # Keep markdown link syntax as literal text instead of creating links;
         # only create anchor tags for the URLs themselves.
@@ -148,6 +196,85 @@ parser = Markdown(
 )
 
 
-def parse_markdown_description(content):
+def render_plain_text(content):
+    return f"<p>{html.escape(content)}</p>\n"
+
+
+def _render_markdown_description(content, max_length, time_budget):
+    """Return the render of `render_markdown_description` and whether it
+    is final, i.e. not a fallback for going over `time_budget`, which
+    depends on the load of the worker
+    """
     unescaped_content = html.unescape(content)
-    return parser(unescaped_content)
+    if len(unescaped_content) > max_length:
+        logger.warning(
+            "Markdown description too long to render: %s characters",
+            len(unescaped_content),
+        )
+        return render_plain_text(unescaped_content), True
+
+    state = parser.block.state_cls()
+    state.env["deadline"] = time.monotonic() + time_budget
+    try:
+        return parser.parse(unescaped_content, state)[0], True
+    except RecursionError:
+        logger.warning(
+            "Markdown description too nested to render: %s characters",
+            len(unescaped_content),
+        )
+        return render_plain_text(unescaped_content), True
+    except RenderBudgetExceeded:
+        logger.warning(
+            "Markdown description too slow to render: %s characters",
+            len(unescaped_content),
+        )
+        return render_plain_text(unescaped_content), False
+
+
+def render_markdown_description(
+    content,
+    max_length=MARKDOWN_MAX_LENGTH,
+    time_budget=MARKDOWN_RENDER_TIME_BUDGET,
+):
+    """Render a markdown description, falling back to escaped plain text
+    for the descriptions longer than `max_length` characters or taking
+    more than `time_budget` seconds
+
+    The time budget is best effort: it is checked between the parser
+    rules, so a render can go over it by the time of a single rule, which
+    `max_length` bounds.
+    """
+    return _render_markdown_description(content, max_length, time_budget)[0]
+
+
+def get_markdown_cache_key(content):
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    return f"markdown:{PARSER_VERSION}:{digest}"
+
+
+def parse_markdown_description(content):
+    """Return the HTML of a markdown description, rendered once for all
+    the workers, see `render_markdown_description`
+    """
+    if not content:
+        return render_markdown_description(content)
+
+    cache_key = get_markdown_cache_key(content)
+    rendered = markdown_cache.get(cache_key)
+    if rendered is not None:
+        return rendered
+
+    rendered = redis_cache.get(cache_key)
+    if rendered is None:
+        rendered, final = _render_markdown_description(
+            content, MARKDOWN_MAX_LENGTH, MARKDOWN_RENDER_TIME_BUDGET
+        )
+        if not final:
+            markdown_cache.set(
+                cache_key, rendered, ttl=MARKDOWN_FALLBACK_CACHE_TTL
+            )
+            return rendered
+        redis_cache.set(cache_key, rendered, ttl=MARKDOWN_CACHE_TTL)
+
+    markdown_cache.set(cache_key, rendered)
+    return rendered
@@ -31,6 +31,20 @@ def get_last_metrics_processed_date():
     return last_metrics_processed.date() - days_to_skip
 
 
+def get_seconds_to_next_metrics_processed_date():
+    """Return the number of seconds until the result of
+    `get_last_metrics_processed_date` can change, at 3am
+    """
+    now = datetime.datetime.now()
+    three_hours = relativedelta.relativedelta(hours=3)
+    next_change = datetime.datetime.combine(
+        (now - three_hours).date() + relativedelta.relativedelta(days=1),
+        datetime.time(hour=3),
+    )
+
+    return max(math.ceil((next_change - now).total_seconds()), 1)
+
+
 def get_dates_for_metric(metric_period=30, metric_bucket="d"):
     end = get_last_metrics_processed_date()
 
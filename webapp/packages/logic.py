@@ -3,13 +3,13 @@ import datetime
 from flask import make_response
 from typing import List, Dict, TypedDict, Any, Union
 
-from canonicalwebteam.exceptions import StoreApiError
 from canonicalwebteam.store_api.devicegw import DeviceGW
 
+from webapp import reference_data
 from webapp.endpoints.utils import get_item_details_cache_key
 from webapp.helpers import get_icon
 from webapp.helpers import api_session
-from cache.cache_utility import redis_cache
+from cache.decorators import cached
 
 device_gateway = DeviceGW("snap", api_session)
 
@@ -93,6 +93,20 @@ def fetch_packages(fields: List[str], query_params) -> Packages:
     return packages
 
 
+@cached(
+    lambda package_name, fields: get_item_details_cache_key(package_name),
+    ttl=300,
+    expected_type=dict,
+    tags=["snap:{package_name}"],
+)
+def _get_item_details(package_name: str, fields: List[str]) -> Dict:
+    return device_gateway.get_item_details(
+        name=package_name,
+        fields=fields,
+        api_version=2,
+    )
+
+
 def fetch_package(package_name: str, fields: List[str]) -> Package:
     """
     Fetches a package from the store API based on the specified package name.
@@ -102,17 +116,7 @@ def fetch_package(package_name: str, fields: List[str]) -> Package:
 
     :returns: a dictionary containing the fetched package.
     """
-    get_item_details_key = get_item_details_cache_key(package_name)
-    cached_package = redis_cache.get(get_item_details_key, expected_type=dict)
-    if cached_package:
-        package = cached_package
-    else:
-        package = device_gateway.get_item_details(
-            name=package_name,
-            fields=fields,
-            api_version=2,
-        )
-        redis_cache.set(get_item_details_key, package, ttl=300)
+    package = _get_item_details(package_name, fields)
     response = make_response({"package": package})
     response.cache_control.max_age = 3600
     return response.json
@@ -284,21 +288,11 @@ def get_store_categories() -> List[Dict[str, str]]:
     :returns: A list of categories in the format:
     [{"name": "Category", "slug": "category"}]
     """
-    try:
-        all_categories = device_gateway.get_categories()
-    except StoreApiError:
-        all_categories = []
-
-    for cat in all_categories["categories"]:
-        cat["display_name"] = format_slug(cat["name"])
-
-    categories = list(
-        filter(
-            lambda cat: cat["name"] != "featured", all_categories["categories"]
-        )
-    )
-
-    return categories
+    return [
+        {**category, "display_name": format_slug(category["name"])}
+        for category in reference_data.categories.get()
+        if category["name"] != "featured"
+    ]
 
 
 def get_snaps_account_info(account_info):
@@ -2,7 +2,7 @@ import datetime
 import hashlib
 from json import dumps
 
-from dateutil import parser
+from webapp import dates
 
 
 def get_snaps_account_info(account_info):
@@ -371,9 +371,7 @@ def convert_date(date_to_convert):
     :param date_to_convert: Date to convert
     :returns: Readable date
     """
-    local_timezone = datetime.datetime.utcnow().tzinfo
-    date_parsed = parser.parse(date_to_convert).replace(tzinfo=local_timezone)
-    return date_parsed.strftime("%B %Y")
+    return dates.format_date(date_to_convert, "%B %Y")
 
 
 def categorise_media(media):
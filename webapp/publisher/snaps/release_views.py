@@ -5,7 +5,7 @@ from canonicalwebteam.exceptions import StoreApiResponseErrorList
 
 # Local
 from cache.cache_utility import redis_cache
-from webapp.endpoints.utils import get_auditable_map_cache_key
+from webapp.endpoints.utils import get_snap_cache_tag
 from webapp.helpers import api_publisher_session
 from webapp.decorators import login_required
 
@@ -91,7 +91,7 @@ def post_release(snap_name):
                 400,
             )
 
-    redis_cache.delete(get_auditable_map_cache_key(snap_name))
+    redis_cache.invalidate_tags(get_snap_cache_tag(snap_name))
 
     return flask.jsonify(response)
 
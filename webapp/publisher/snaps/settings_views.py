@@ -1,9 +1,9 @@
 # Packages
 import flask
-import pycountry
 from canonicalwebteam.store_api.dashboard import Dashboard
 
 # Local
+from webapp import reference_data
 from webapp.helpers import api_publisher_session, launchpad
 from webapp.decorators import login_required
 
@@ -37,9 +37,7 @@ def get_settings(snap_name, return_json=False):
     else:
         blacklist_country_codes = []
 
-    countries = []
-    for country in pycountry.countries:
-        countries.append({"key": country.alpha_2, "name": country.name})
+    countries = reference_data.countries.get().items
 
     is_on_lp = False
     lp_snap = launchpad.get_snap_by_store_name(snap_name)
@@ -9,6 +9,7 @@ from canonicalwebteam.exceptions import (
 from flask.json import jsonify
 
 # Local
+from cache.cache_utility import redis_cache
 from webapp import authentication
 from webapp.helpers import api_publisher_session, launchpad
 from webapp.api.exceptions import ApiError
@@ -46,6 +47,7 @@ from webapp.endpoints.publisher.register import (
     post_register_name_dispute,
 )
 from webapp.endpoints import releases, builds
+from webapp.endpoints.utils import get_snap_not_found_cache_key
 from webapp.publisher.snaps.builds import map_snap_build_status
 
 dashboard = Dashboard(api_publisher_session)
@@ -491,6 +493,8 @@ def post_register_name_json():
             api_response_error_list.status_code,
         )
 
+    redis_cache.delete(get_snap_not_found_cache_key(snap_name))
+
     response["code"] = "created"
 
     return flask.jsonify(response)
@@ -0,0 +1,175 @@
+"""
+Reference data of the publisher pages: the categories, licenses and
+countries a snap can have.
+
+Each list is built once per worker and held in memory, indexed by key,
+instead of on every request. The lists from the store API are refreshed
+every REFERENCE_DATA_REFRESH_INTERVAL seconds, in a background thread
+started by the first request after that, while the requests keep getting
+the previous list. Each list has an ETag, for the publisher frontend to
+only download it when it changed.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import flask
+import pycountry
+import requests
+from canonicalwebteam.exceptions import StoreApiError
+from canonicalwebteam.store_api.devicegw import DeviceGW
+
+from webapp.api.exceptions import ApiError
+from webapp.config import (
+    REFERENCE_DATA_REFRESH_INTERVAL,
+    REFERENCE_DATA_RETRY_INTERVAL,
+)
+from webapp.content import freeze
+from webapp.helpers import api_session, get_licenses
+
+logger = logging.getLogger(__name__)
+
+device_gateway = DeviceGW("snap", api_session)
+
+
+class ReferenceList:
+    """An immutable list of `items`, indexed by their `key` field"""
+
+    def __init__(self, items, key):
+        self.items = freeze(items)
+        self.by_key = {item[key]: item for item in self.items}
+        self.etag = hashlib.sha256(
+            json.dumps(self.items, sort_keys=True).encode()
+        ).hexdigest()
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key, default=None):
+        return self.by_key.get(key, default)
+
+
+class ReferenceData:
+    """
+    The reference list returned by `load`, refreshed every
+    `refresh_interval` seconds, or never if it is None
+    """
+
+    def __init__(self, name, load, key="key", refresh_interval=None):
+        self.name = name
+        self.load = load
+        self.key = key
+        self.refresh_interval = refresh_interval
+        self._list = None
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+
+    def _is_due(self):
+        if self._list is None:
+            return True
+        return (
+            self.refresh_interval is not None
+            and time.monotonic() >= self._next_refresh
+        )
+
+    def refresh(self):
+        """Load the list again, keeping the previous one if that fails"""
+        try:
+            self._list = ReferenceList(self.load(), self.key)
+            interval = self.refresh_interval
+        except (
+            ApiError,
+            StoreApiError,
+            requests.exceptions.RequestException,
+        ):
+            logger.warning("Could not refresh the %s", self.name)
+            if self._list is None:
+                self._list = ReferenceList([], self.key)
+            interval = REFERENCE_DATA_RETRY_INTERVAL
+
+        self._next_refresh = time.monotonic() + (interval or 0)
+
+    def get(self):
+        """Return the current ReferenceList"""
+        if self._list is None:
+            # The first requests wait for the first list to be loaded
+            with self._lock:
+                if self._list is None:
+                    self.refresh()
+        elif self._is_due() and self._lock.acquire(blocking=False):
+            self._refresh_in_background()
+
+        return self._list
+
+    def _refresh_in_background(self):
+        """Refresh the list in a thread, which releases the lock"""
+        app = (
+            flask.current_app._get_current_object()
+            if flask.has_app_context()
+            else None
+        )
+
+        def refresh():
+            try:
+                if not self._is_due():
+                    # Another thread refreshed it in the meantime
+                    return
+                if app:
+                    with app.app_context():
+                        self.refresh()
+                else:
+                    self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh the %s", self.name)
+                self._next_refresh = (
+                    time.monotonic() + REFERENCE_DATA_RETRY_INTERVAL
+                )
+            finally:
+                self._lock.release()
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+        return thread
+
+
+def _load_categories():
+    categories_json = device_gateway.get_categories()
+    if "categories" in categories_json:
+        return categories_json["categories"]
+    return []
+
+
+def _load_licenses():
+    return [
+        {"key": license["licenseId"], "name": license["name"]}
+        for license in get_licenses()
+    ]
+
+
+def _load_countries():
+    return [
+        {"key": country.alpha_2, "name": country.name}
+        for country in pycountry.countries
+    ]
+
+
+categories = ReferenceData(
+    "categories",
+    _load_categories,
+    key="name",
+    refresh_interval=REFERENCE_DATA_REFRESH_INTERVAL,
+)
+licenses = ReferenceData("licenses", _load_licenses)
+countries = ReferenceData("countries", _load_countries)
+
+REFERENCE_DATA = {
+    "categories": categories,
+    "countries": countries,
+    "licenses": licenses,
+}
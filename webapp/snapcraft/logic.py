@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 
-from webapp import helpers
+from webapp.content import content_registry
 
 
 def get_livestreams():
@@ -9,9 +9,7 @@ def get_livestreams():
     :returns: Dictionary of livestream details
     """
     livestream_to_show = None
-    livestreams = helpers.get_yaml(
-        "snapcraft/content/snapcraft_live.yaml", typ="safe"
-    )
+    livestreams = content_registry.get("snapcraft/content/snapcraft_live.yaml")
 
     if livestreams:
         now = datetime.now()
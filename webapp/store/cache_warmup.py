@@ -0,0 +1,118 @@
+"""
+Prime the cache of the public store pages, so that the first visitors after
+a deploy or a Redis flush don't pay for the upstream calls.
+
+The pages are requested through the app itself, which fills the same cache
+keys as real visits would.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import flask
+import requests
+from flask.cli import AppGroup
+
+from cache.cache_utility import redis_cache
+from webapp.api.exceptions import ApiError
+from webapp.config import CACHE_WARM_CONCURRENCY, CACHE_WARM_TOP_SNAPS
+from webapp.store.views import CUSTOM_PUBLISHER_PAGES, get_popular_snaps
+
+logger = logging.getLogger(__name__)
+
+cache_cli = AppGroup("cache", help="Manage the cache of the store pages.")
+
+# Pages that don't depend on the popular snaps. The sitemap is left out: it
+# crawls the whole store, or waits on the refresh of another pod, which
+# would hold back the start of the app
+STORE_PAGES = ["/store", "/store/stats"]
+
+
+def get_warmup_paths(top_snaps):
+    """
+    Return the paths of the pages to prime: the store pages, the custom
+    publisher pages and the pages of the `top_snaps` most popular snaps.
+    """
+    paths = list(STORE_PAGES)
+    paths += [f"/publisher/{name}" for name in CUSTOM_PUBLISHER_PAGES]
+
+    try:
+        popular_snaps = get_popular_snaps()
+    except (ApiError, requests.exceptions.RequestException):
+        logger.warning("Could not get the popular snaps to warm up")
+        popular_snaps = []
+
+    snap_names = [snap["details"]["name"] for snap in popular_snaps]
+    paths += [f"/{name}" for name in snap_names[:top_snaps]]
+
+    # The featured snaps of the install pages are shared by all the snaps
+    if snap_names:
+        paths.append(f"/install/{snap_names[0]}/ubuntu")
+
+    return paths
+
+
+def warm_paths(app, paths, concurrency):
+    """
+    Request `paths` from `app`, `concurrency` at a time.
+
+    Returns the status code of each path, None for the requests that
+    raised.
+    """
+
+    def warm(path):
+        start = time.monotonic()
+        try:
+            status_code = app.test_client().get(path).status_code
+        except Exception:
+            logger.exception("Failed to warm up %s", path)
+            status_code = None
+
+        logger.info(
+            "Warmed up %s (%s) in %.2fs",
+            path,
+            status_code,
+            time.monotonic() - start,
+        )
+        return status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(zip(paths, executor.map(warm, paths)))
+
+
+@cache_cli.command("warm")
+@click.option(
+    "--top-snaps",
+    default=CACHE_WARM_TOP_SNAPS,
+    show_default=True,
+    help="Number of popular snaps whose page gets primed.",
+)
+@click.option(
+    "--concurrency",
+    default=CACHE_WARM_CONCURRENCY,
+    show_default=True,
+    help="Number of pages requested at a time.",
+)
+def warm(top_snaps, concurrency):
+    """Prime the cache of the most visited store pages."""
+    if not redis_cache.redis_available:
+        click.echo("Redis is not available, nothing to warm up")
+        return
+
+    app = flask.current_app._get_current_object()
+    results = warm_paths(app, get_warmup_paths(top_snaps), concurrency)
+
+    failed = [
+        path
+        for path, status_code in results.items()
+        if status_code is None or status_code >= 500
+    ]
+    for path, status_code in results.items():
+        click.echo(f"{status_code or 'error'} {path}")
+
+    if failed:
+        raise click.ClickException(
+            f"{len(failed)} of {len(results)} pages failed to warm up"
+        )
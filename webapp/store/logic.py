@@ -1,14 +1,21 @@
 import datetime
+import functools
 import random
 import re
 from urllib.parse import parse_qs, urlparse
 
 import humanize
-from dateutil import parser
 from dateutil.relativedelta import relativedelta
 from canonicalwebteam.exceptions import StoreApiError
-from cache.cache_utility import redis_cache
-from webapp import helpers
+from cache.decorators import cached
+from webapp import dates
+from webapp.api.exceptions import ApiError
+from webapp.config import STALE_CACHE_TTL
+from webapp.content import content_registry
+from webapp.endpoints.utils import (
+    get_publisher_cache_tag,
+    get_snap_cache_tag,
+)
 
 
 def get_n_random_snaps(snaps, choice_number):
@@ -25,19 +32,37 @@ def get_publisher_snaps(device_gateway, publisher):
     snaps (unlisted/removed snaps are excluded). The result is cached so
     we don't fetch the full publisher catalogue on every page view.
     """
-    cache_key = f"publisher-snaps:{publisher}"
-    snaps = redis_cache.get(cache_key, expected_type=list)
-    if not snaps:
-        try:
-            snaps = device_gateway.find(
-                publisher=publisher,
-                fields=["title", "summary", "media", "publisher"],
-            ).get("results", [])
-        except StoreApiError:
-            snaps = []
-        if snaps:
-            redis_cache.set(cache_key, snaps, ttl=3600)
-    return snaps
+    try:
+        return _find_publisher_snaps(device_gateway, publisher)
+    except (StoreApiError, ApiError):
+        return []
+
+
+def get_snap_list_cache_tags(snaps):
+    """Return the cache tags of a list of snaps from the store API, for
+    the list to be invalidated along with any of its snaps
+    """
+    tags = set()
+    for snap in snaps:
+        tags.add(get_snap_cache_tag(snap["name"]))
+        publisher = snap["snap"].get("publisher")
+        if publisher:
+            tags.add(get_publisher_cache_tag(publisher["username"]))
+    return sorted(tags)
+
+
+@cached(
+    "publisher-snaps:{publisher}",
+    ttl=3600,
+    expected_type=list,
+    stale_ttl=STALE_CACHE_TTL,
+    tags=get_snap_list_cache_tags,
+)
+def _find_publisher_snaps(device_gateway, publisher):
+    return device_gateway.find(
+        publisher=publisher,
+        fields=["title", "summary", "media", "publisher"],
+    ).get("results", [])
 
 
 def hydrate_featured_snaps(featured_snaps, snaps_by_name):
@@ -201,29 +226,125 @@ def convert_channel_maps(channel_map):
 
     :returns: The channel maps reshaped
     """
-    channel_map_restruct = {}
-
-    for channel in channel_map:
-        arch = channel.get("channel").get("architecture")
-        track = channel.get("channel").get("track")
-        if arch not in channel_map_restruct:
-            channel_map_restruct[arch] = {}
-        if track not in channel_map_restruct[arch]:
-            channel_map_restruct[arch][track] = []
-
-        info = {
-            "released-at": convert_date(channel["channel"].get("released-at")),
-            "version": channel.get("version"),
-            "channel": channel["channel"].get("name"),
-            "risk": channel["channel"].get("risk"),
-            "confinement": channel.get("confinement"),
-            "size": channel["download"].get("size"),
-            "revision": channel["revision"],
-        }
+    return ChannelMap(channel_map).by_architecture
+
+
+def _get_release_info(channel_map_entry):
+    channel = channel_map_entry["channel"]
+    return {
+        "released-at": convert_date(channel.get("released-at")),
+        "version": channel_map_entry.get("version"),
+        "channel": channel.get("name"),
+        "risk": channel.get("risk"),
+        "confinement": channel_map_entry.get("confinement"),
+        "size": channel_map_entry["download"].get("size"),
+        "revision": channel_map_entry["revision"],
+    }
 
-        channel_map_restruct[arch][track].append(info)
 
-    return channel_map_restruct
+RISK_ORDER = ["stable", "candidate", "beta", "edge"]
+
+
+def _risk_rank(risk):
+    # Unknown risks come after the known ones
+    if risk in RISK_ORDER:
+        return RISK_ORDER.index(risk)
+    return len(RISK_ORDER)
+
+
+class ChannelMap:
+    """The releases of a snap, from the "channel-map" of the store API,
+    indexed in a single pass over it
+
+    `by_architecture` is the arch -> track -> releases shape of
+    `convert_channel_maps`, the other attributes and methods answer what
+    the module functions of the same name do without walking the channel
+    map again.
+    """
+
+    def __init__(self, channel_map):
+        self.channel_map = channel_map or []
+        self.by_architecture = {}
+        self.has_stable = False
+        # The first stable release, or the first release without any
+        self.last_updated_release = None
+
+        revisions = set()
+        self._lowest_risks = {}
+
+        for entry in self.channel_map:
+            channel = entry["channel"]
+            arch = channel.get("architecture")
+            track = channel.get("track")
+            risk = channel.get("risk")
+
+            self.by_architecture.setdefault(arch, {}).setdefault(
+                track, []
+            ).append(_get_release_info(entry))
+            revisions.add(entry["revision"])
+
+            lowest = self._lowest_risks.get(track)
+            if lowest is None or _risk_rank(risk) < _risk_rank(lowest):
+                self._lowest_risks[track] = risk
+
+            if risk == "stable":
+                if not self.has_stable:
+                    self.last_updated_release = entry
+                self.has_stable = True
+            elif self.last_updated_release is None:
+                self.last_updated_release = entry
+
+        self.revisions = sorted(revisions, reverse=True)
+
+    @property
+    def architectures(self):
+        return list(self.by_architecture.keys())
+
+    @functools.cached_property
+    def last_updated_channels(self):
+        """The channels in order of updates, see
+        `get_last_updated_versions`
+        """
+        return get_last_updated_versions(self.channel_map)
+
+    def get_lowest_available_risk(self, track):
+        return self._lowest_risks.get(track)
+
+    def get_releases(self, architecture, track):
+        return self.by_architecture.get(architecture, {}).get(track, [])
+
+    def get_release(self, architecture, track, risk):
+        for release in self.get_releases(architecture, track):
+            if release["risk"] == risk:
+                return release
+        return None
+
+    def extract_info(self, track, risk):
+        """Return the confinement and version of a channel, see
+        `extract_info_channel_map`
+        """
+        for architecture in self.by_architecture:
+            release = self.get_release(architecture, track, risk)
+            if release:
+                return {
+                    "confinement": release.get("confinement"),
+                    "version": release.get("version"),
+                }
+
+        return {"confinement": None, "version": None}
+
+    def get_latest_versions(
+        self, default_track, lowest_risk, supported_architectures=None
+    ):
+        """Return the latest default track channel at `lowest_risk` and the
+        latest of all other channels, see `get_latest_versions`
+        """
+        return _get_latest_versions(
+            self.last_updated_channels,
+            default_track,
+            lowest_risk,
+            supported_architectures,
+        )
 
 
 def convert_date(date_to_convert):
@@ -237,14 +358,14 @@ def convert_date(date_to_convert):
     :param date_to_convert: Date to convert
     :returns: Readable date
     """
-    local_timezone = datetime.datetime.utcnow().tzinfo
-    date_parsed = parser.parse(date_to_convert).replace(tzinfo=local_timezone)
+    date_parsed = dates.parse_date(date_to_convert).replace(tzinfo=None)
     delta = datetime.datetime.utcnow() - datetime.timedelta(days=1)
 
     if delta < date_parsed:
         return humanize.naturalday(date_parsed).title()
     else:
-        return date_parsed.strftime("%-d %B %Y")
+        # Only the older dates are memoized, the others depend on today
+        return dates.format_date(date_to_convert, "%-d %B %Y")
 
 
 def is_snap_old(last_updated_date, old_threshold_years=2.0):
@@ -262,7 +383,7 @@ def is_snap_old(last_updated_date, old_threshold_years=2.0):
         return False
 
     try:
-        date_parsed = parser.parse(last_updated_date)
+        date_parsed = dates.parse_date(last_updated_date)
         if date_parsed.tzinfo is None:
             date_parsed = date_parsed.replace(tzinfo=datetime.timezone.utc)
 
@@ -362,8 +483,17 @@ def get_latest_versions(
 
     :returns: A tuple of default/stable, track/risk channel map objects
     """
-    ordered_versions = get_last_updated_versions(channel_maps)
+    return _get_latest_versions(
+        get_last_updated_versions(channel_maps),
+        default_track,
+        lowest_risk,
+        supported_architectures,
+    )
+
 
+def _get_latest_versions(
+    ordered_versions, default_track, lowest_risk, supported_architectures
+):
     default_stable = None
     other = None
     for channel in ordered_versions:
@@ -380,12 +510,17 @@ def get_latest_versions(
             elif not other:
                 other = channel
 
+    # Copies, not to change the channel map
     if default_stable:
-        default_stable["released-at-display"] = convert_date(
-            default_stable["released-at"]
-        )
+        default_stable = {
+            **default_stable,
+            "released-at-display": convert_date(default_stable["released-at"]),
+        }
     if other:
-        other["released-at-display"] = convert_date(other["released-at"])
+        other = {
+            **other,
+            "released-at-display": convert_date(other["released-at"]),
+        }
     return default_stable, other
 
 
@@ -605,7 +740,7 @@ def get_snap_developer(snap_name):
 
     """
     filename = "store/content/developers/snaps.yaml"
-    snaps = helpers.get_yaml(filename, typ="rt")
+    snaps = content_registry.get(filename)
 
     if snaps and snap_name in snaps:
         return snaps[snap_name]
@@ -0,0 +1,165 @@
+"""
+SBOMs (software bills of materials) of snap revisions, from the store API.
+
+The SBOM of a revision never changes once published, so whether it exists
+is cached, and the documents can be kept on disk in SBOM_CACHE_DIR, up to
+SBOM_CACHE_MAX_BYTES.
+"""
+
+import logging
+import os
+import re
+import tempfile
+
+import flask
+from canonicalwebteam.store_api.devicegw import DeviceGW
+
+from cache.decorators import cached
+from webapp.api.exceptions import ApiResponseError
+from webapp.config import (
+    SBOM_CACHE_DIR,
+    SBOM_CACHE_MAX_BYTES,
+    SBOM_FOUND_CACHE_TTL,
+    SBOM_MISSING_CACHE_TTL,
+)
+from webapp.helpers import api_session
+
+logger = logging.getLogger(__name__)
+
+device_gateway_sbom = DeviceGW("sbom", api_session)
+
+# Size of the chunks SBOMs are forwarded in
+SBOM_CHUNK_SIZE = 64 * 1024
+
+
+def get_sbom_filename(snap_id, revision):
+    return f"sbom_snap_{snap_id}_{revision}.spdx2.3.json"
+
+
+def get_sbom_url(snap_id, revision):
+    return device_gateway_sbom.get_endpoint_url(
+        f"download/{get_sbom_filename(snap_id, revision)}"
+    )
+
+
+@cached(
+    "sbom-exists:{snap_id}:{revision}",
+    ttl=SBOM_FOUND_CACHE_TTL,
+    negative_ttl=SBOM_MISSING_CACHE_TTL,
+    expected_type=bool,
+)
+def sbom_exists(snap_id, revision):
+    res = api_session.head(get_sbom_url(snap_id, revision))
+
+    # Don't remember an SBOM as missing because the backend failed
+    if res.status_code >= 500:
+        raise ApiResponseError(
+            "Failed to check the SBOM of {} revision {}".format(
+                snap_id, revision
+            ),
+            res.status_code,
+        )
+
+    # backend returns 302 instead of 200 for a successful request
+    # adding the check for 200 in case this is changed without us knowing
+    return res.status_code == 200 or res.status_code == 302
+
+
+def snap_has_sboms(revisions, snap_id):
+    if not revisions:
+        return False
+
+    return sbom_exists(snap_id, revisions[0])
+
+
+def stream_sbom(snap_id, revision):
+    """
+    Return a response forwarding the SBOM of a revision from the store API
+    as it is downloaded, without parsing it.
+
+    With SBOM_CACHE_DIR set, SBOMs are saved there and served from disk
+    afterwards.
+    """
+    if not re.fullmatch(r"[A-Za-z0-9]+", snap_id) or not revision.isdigit():
+        flask.abort(404)
+
+    cache_path = None
+    if SBOM_CACHE_DIR:
+        cache_path = os.path.join(
+            SBOM_CACHE_DIR, get_sbom_filename(snap_id, revision)
+        )
+        if os.path.exists(cache_path):
+            try:
+                # For the eviction to keep the most recently served ones
+                os.utime(cache_path)
+                return flask.send_file(cache_path, mimetype="application/json")
+            except OSError:
+                # Evicted in the meantime
+                pass
+
+    res = api_session.get(get_sbom_url(snap_id, revision), stream=True)
+
+    if res.status_code != 200:
+        cache_path = None
+
+    response = flask.Response(
+        _forward(res, cache_path),
+        status=res.status_code,
+        mimetype=res.headers.get("Content-Type", "application/json"),
+    )
+    # The body isn't read when the client goes away before it, or for HEAD
+    # requests, and the connection must still go back to the pool
+    response.call_on_close(res.close)
+    return response
+
+
+def _forward(res, cache_path=None):
+    """Yield the body of `res`, saving it to `cache_path` once complete"""
+    try:
+        if not cache_path:
+            yield from res.iter_content(SBOM_CHUNK_SIZE)
+            return
+
+        os.makedirs(SBOM_CACHE_DIR, exist_ok=True)
+        part_file = tempfile.NamedTemporaryFile(
+            dir=SBOM_CACHE_DIR, prefix=".", suffix=".part", delete=False
+        )
+        try:
+            with part_file:
+                for chunk in res.iter_content(SBOM_CHUNK_SIZE):
+                    part_file.write(chunk)
+                    yield chunk
+            os.replace(part_file.name, cache_path)
+        finally:
+            if os.path.exists(part_file.name):
+                os.unlink(part_file.name)
+        evict_sboms(SBOM_CACHE_DIR, SBOM_CACHE_MAX_BYTES)
+    finally:
+        res.close()
+
+
+def evict_sboms(directory, max_bytes):
+    """Delete the least recently served SBOMs of `directory`, until they
+    take `max_bytes` at most
+    """
+    files = []
+    for entry in os.scandir(directory):
+        # Downloads in progress start with a dot
+        if entry.name.startswith(".") or not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError as error:
+            logger.warning("Could not evict the SBOM %s: %s", path, error)
+            continue
+        total -= size
@@ -2,6 +2,8 @@ import flask
 from flask import Response
 import requests
 
+import hashlib
+import json
 import logging
 import humanize
 import os
@@ -10,19 +12,35 @@ import webapp.helpers as helpers
 import webapp.metrics.helper as metrics_helper
 import webapp.metrics.metrics as metrics
 import webapp.store.logic as logic
+import webapp.store.sboms as sboms
 from webapp import authentication
+from webapp.api.exceptions import ApiConnectionError, ApiTimeoutError
+from webapp.api.parallel import run_parallel
+from webapp.content import content_registry
+from webapp.config import SNAP_CONTEXT_CACHE_TTL, SNAP_NOT_FOUND_CACHE_TTL
+from webapp.decorators import cached_page
+from webapp.endpoints.utils import (
+    get_snap_cache_tag,
+    get_snap_not_found_cache_key,
+)
 from webapp.markdown import parse_markdown_description
 from cache.cache_utility import redis_cache
+from cache.decorators import cached
 
 from canonicalwebteam.flask_base.decorators import (
     exclude_xframe_options_header,
 )
-from canonicalwebteam.exceptions import StoreApiError
+from canonicalwebteam.exceptions import (
+    StoreApiConnectionError,
+    StoreApiError,
+    StoreApiResourceNotFound,
+    StoreApiResponseErrorList,
+    StoreApiTimeoutError,
+)
 from canonicalwebteam.store_api.devicegw import DeviceGW
 from pybadges import badge
 
 device_gateway = DeviceGW("snap", helpers.api_session)
-device_gateway_sbom = DeviceGW("sbom", helpers.api_session)
 
 logger = logging.getLogger(__name__)
 
@@ -51,39 +69,261 @@ FIELDS_EXTRA_DETAILS = [
     "aliases",
 ]
 
+# Seconds each of the concurrent calls of the snap details page can take,
+# the page is rendered without the ones that take longer
+FANOUT_TIMEOUTS = {
+    "extra_details": 5,
+    "metrics": 5,
+    "has_sboms": 3,
+    "publisher_snaps": 5,
+}
+
+# Rendered badges are cached by the hash of what they show, so they never
+# get out of date
+BADGE_SVG_CACHE_TTL = 86400
+
+EMPTY_SVG = (
+    '<svg height="20" width="1" xmlns="http://www.w3.org/2000/svg" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink"></svg>'
+)
+
+# Errors meaning the store API could not answer, as opposed to answering
+# that the snap doesn't exist
+UPSTREAM_UNAVAILABLE_ERRORS = (
+    ApiConnectionError,
+    ApiTimeoutError,
+    StoreApiConnectionError,
+    StoreApiTimeoutError,
+)
+
+
+@cached(
+    "public-metrics:{snap_id}:{processed_date}",
+    ttl=lambda _: metrics_helper.get_seconds_to_next_metrics_processed_date(),
+    expected_type=dict,
+)
+def get_public_metrics(snap_id, processed_date):
+    """Return the share of devices of a snap per country and per OS on
+    `processed_date`, cached until the next metrics are processed
+    """
+    country_metric_name = "weekly_installed_base_by_country_percent"
+    os_metric_name = "weekly_installed_base_by_operating_system_normalized"
+
+    metrics_query_json = [
+        metrics_helper.get_filter(
+            metric_name=country_metric_name,
+            snap_id=snap_id,
+            start=processed_date,
+            end=processed_date,
+        ),
+        metrics_helper.get_filter(
+            metric_name=os_metric_name,
+            snap_id=snap_id,
+            start=processed_date,
+            end=processed_date,
+        ),
+    ]
+
+    metrics_response = device_gateway.get_public_metrics(metrics_query_json)
+
+    public_metrics = {"countries": None, "normalized_os": None}
+    if metrics_response:
+        oses = metrics_helper.find_metric(metrics_response, os_metric_name)
+        os_metrics = metrics.OsMetric(
+            name=oses["metric_name"],
+            series=oses["series"],
+            buckets=oses["buckets"],
+            status=oses["status"],
+        )
+
+        territories = metrics_helper.find_metric(
+            metrics_response, country_metric_name
+        )
+        country_devices = metrics.CountryDevices(
+            name=territories["metric_name"],
+            series=territories["series"],
+            buckets=territories["buckets"],
+            status=territories["status"],
+            private=False,
+        )
+
+        # Only the derived data is kept, not the raw series
+        public_metrics = {
+            "countries": country_devices.country_data,
+            "normalized_os": os_metrics.os,
+        }
+
+    return public_metrics
+
+
+def is_linux_user_agent():
+    user_agent = flask.request.headers.get("User-Agent", "")
+    return "Linux" in user_agent and "Android" not in user_agent
+
 
 def snap_details_views(store):
     snap_regex = "[a-z0-9-]*[a-z][a-z0-9-]*"
     snap_regex_upercase = "[A-Za-z0-9-]*[A-Za-z][A-Za-z0-9-]*"
 
-    def _get_context_snap_details(snap_name, supported_architectures=None):
-        details = device_gateway.get_item_details(
-            snap_name, fields=FIELDS, api_version=2
+    def _get_item_details(snap_name):
+        """Fetch the snap details, falling back to the last good copy
+        while the store API is unavailable
+        """
+        stale_key = f"snap-details:{snap_name}"
+        try:
+            details = device_gateway.get_item_details(
+                snap_name, fields=FIELDS, api_version=2
+            )
+        except UPSTREAM_UNAVAILABLE_ERRORS:
+            details = redis_cache.get_stale(stale_key, expected_type=dict)
+            if not details:
+                raise
+            logger.warning("Serving stale details for %s", snap_name)
+            return details
+
+        redis_cache.set_stale(
+            stale_key, details, tags=[get_snap_cache_tag(snap_name)]
+        )
+        return details
+
+    def _snap_not_found(snap_name, reason):
+        """Abort with a 404, and keep doing so for a while without asking
+        the store API, so that bots probing snap names stay cheap
+        """
+        redis_cache.set(
+            get_snap_not_found_cache_key(snap_name),
+            reason,
+            ttl=SNAP_NOT_FOUND_CACHE_TTL,
+            tags=[get_snap_cache_tag(snap_name)],
         )
+        flask.abort(404, "No snap named {}".format(snap_name))
+
+    def _get_snap_details(snap_name):
+        if redis_cache.get(get_snap_not_found_cache_key(snap_name)):
+            flask.abort(404, "No snap named {}".format(snap_name))
+
+        try:
+            details = _get_item_details(snap_name)
+        except StoreApiResourceNotFound:
+            _snap_not_found(snap_name, "unknown")
+        except StoreApiResponseErrorList as error:
+            if error.status_code == 404:
+                _snap_not_found(snap_name, "unknown")
+            raise
+
         # 404 for any snap under quarantine
         if details["snap"]["publisher"]["username"] == "snap-quarantine":
-            flask.abort(404, "No snap named {}".format(snap_name))
+            _snap_not_found(snap_name, "quarantined")
 
         # When removing all the channel maps of an existing snap the API,
         # responds that the snaps still exists with data.
         # Return a 404 if not channel maps, to avoid having a error.
         # For example: mir-kiosk-browser
         if not details.get("channel-map"):
-            flask.abort(404, "No snap named {}".format(snap_name))
+            _snap_not_found(snap_name, "no-channel-map")
 
-        formatted_description = parse_markdown_description(
-            details.get("snap", {}).get("description", "")
+        return details
+
+    def _get_publisher_info(details):
+        return content_registry.get(
+            "{}{}.yaml".format(
+                flask.current_app.config["CONTENT_DIRECTORY"][
+                    "PUBLISHER_PAGES"
+                ],
+                details["snap"]["publisher"]["username"],
+            )
+        )
+
+    def _get_context_cache_key(snap_name, supported_architectures=None):
+        return (
+            f"snap-context:{snap_name}",
+            {"archs": ",".join(sorted(supported_architectures or []))},
+        )
+
+    def _cache_context_snap_details(
+        snap_name, context, supported_architectures=None
+    ):
+        redis_cache.set(
+            _get_context_cache_key(snap_name, supported_architectures),
+            context,
+            ttl=SNAP_CONTEXT_CACHE_TTL,
+            tags=[get_snap_cache_tag(snap_name)],
+        )
+
+    def _get_context_snap_details(snap_name, supported_architectures=None):
+        context = redis_cache.get(
+            _get_context_cache_key(snap_name, supported_architectures),
+            expected_type=dict,
+        )
+
+        if context is None:
+            details = _get_snap_details(snap_name)
+            publisher_info = _get_publisher_info(details)
+
+            publisher_results = []
+            if publisher_info:
+                publisher_results = logic.get_publisher_snaps(
+                    device_gateway, details["snap"]["publisher"]["username"]
+                )
+
+            context = _build_context_snap_details(
+                snap_name,
+                details,
+                publisher_info,
+                publisher_results,
+                supported_architectures,
+            )
+            _cache_context_snap_details(
+                snap_name, context, supported_architectures
+            )
+
+        return _add_visitor_context(context)
+
+    def _add_visitor_context(context):
+        """Add the parts of the context of the snap pages that differ
+        between visitors to the cached, shared, part
+        """
+        # Pick some different snaps for each visit
+        context["publisher_snaps"] = logic.get_n_random_snaps(
+            context["publisher_snaps"], 4
         )
 
-        channel_maps_list = logic.convert_channel_maps(
-            details.get("channel-map")
+        is_users_snap = False
+        if authentication.is_authenticated(flask.session):
+            if (
+                flask.session.get("publisher").get("nickname")
+                == context["username"]
+            ):
+                is_users_snap = True
+        context["is_users_snap"] = is_users_snap
+
+        context["turnstile_site_key"] = (
+            flask.current_app.config.get("TURNSTILE_SITE_KEY", "")
+            if flask.current_app.config.get("TURNSTILE_SECRET_KEY")
+            else ""
         )
 
-        latest_channel = logic.get_last_updated_version(
-            details.get("channel-map")
+        return context
+
+    def _build_context_snap_details(
+        snap_name,
+        details,
+        publisher_info,
+        publisher_results,
+        supported_architectures=None,
+    ):
+        """Return the context of the snap pages shared by all visitors,
+        see `_add_visitor_context` for the rest
+        """
+        formatted_description = parse_markdown_description(
+            details.get("snap", {}).get("description", "")
         )
 
-        revisions = logic.get_revisions(details.get("channel-map"))
+        channel_map = logic.ChannelMap(details.get("channel-map"))
+
+        latest_channel = channel_map.last_updated_release
+
+        revisions = channel_map.revisions
 
         default_track = (
             details.get("default-track")
@@ -91,17 +331,16 @@ def snap_details_views(store):
             else "latest"
         )
 
-        lowest_risk_available = logic.get_lowest_available_risk(
-            channel_maps_list, default_track
+        lowest_risk_available = channel_map.get_lowest_available_risk(
+            default_track
         )
 
-        extracted_info = logic.extract_info_channel_map(
-            channel_maps_list, default_track, lowest_risk_available
+        extracted_info = channel_map.extract_info(
+            default_track, lowest_risk_available
         )
 
         last_updated = latest_channel["channel"]["released-at"]
-        updates = logic.get_latest_versions(
-            details.get("channel-map"),
+        updates = channel_map.get_latest_versions(
             default_track,
             lowest_risk_available,
             supported_architectures,
@@ -133,24 +372,10 @@ def snap_details_views(store):
 
         icon_url = helpers.get_icon(details.get("snap", {}).get("media", []))
 
-        publisher_info = helpers.get_yaml(
-            "{}{}.yaml".format(
-                flask.current_app.config["CONTENT_DIRECTORY"][
-                    "PUBLISHER_PAGES"
-                ],
-                details["snap"]["publisher"]["username"],
-            ),
-            typ="safe",
-        )
-
         publisher_snaps = []
         publisher_featured_snaps = None
 
         if publisher_info:
-            publisher_results = logic.get_publisher_snaps(
-                device_gateway, details["snap"]["publisher"]["username"]
-            )
-
             snaps_by_name = {}
             for snap in publisher_results:
                 item = snap["snap"]
@@ -177,18 +402,10 @@ def snap_details_views(store):
                 if name not in excluded_names
             ]
 
-            publisher_snaps = logic.get_n_random_snaps(available_snaps, 4)
+            publisher_snaps = available_snaps
 
         video = logic.get_video(details.get("snap", {}).get("media", []))
 
-        is_users_snap = False
-        if authentication.is_authenticated(flask.session):
-            if (
-                flask.session.get("publisher").get("nickname")
-                == details["snap"]["publisher"]["username"]
-            ):
-                is_users_snap = True
-
         # build list of categories of a snap
         categories = logic.get_snap_categories(
             details.get("snap", {}).get("categories", [])
@@ -218,8 +435,8 @@ def snap_details_views(store):
             "website": details["snap"].get("website"),
             "summary": details["snap"]["summary"],
             "description": formatted_description,
-            "channel_map": channel_maps_list,
-            "has_stable": logic.has_stable(channel_maps_list),
+            "channel_map": channel_map.by_architecture,
+            "has_stable": channel_map.has_stable,
             "developer_validation": details["snap"]["publisher"]["validation"],
             "default_track": default_track,
             "lowest_risk_available": lowest_risk_available,
@@ -231,7 +448,6 @@ def snap_details_views(store):
             "last_updated_raw": last_updated,
             "is_snap_old": logic.is_snap_old(most_recent_update),
             "is_last_updated_old": is_last_updated_old,
-            "is_users_snap": is_users_snap,
             "unlisted": details.get("snap", {}).get("unlisted", False),
             "developer": developer,
             # TODO: This is horrible and hacky
@@ -245,11 +461,6 @@ def snap_details_views(store):
             "links": details["snap"].get("links"),
             "updates": updates,
             "revisions": revisions,
-            "turnstile_site_key": (
-                flask.current_app.config.get("TURNSTILE_SITE_KEY", "")
-                if flask.current_app.config.get("TURNSTILE_SECRET_KEY")
-                else ""
-            ),
         }
         return context
 
@@ -295,32 +506,15 @@ def snap_details_views(store):
 
         return True
 
-    def snap_has_sboms(revisions, snap_id):
-        if not revisions:
-            return False
-
-        sbom_path = f"download/sbom_snap_{snap_id}_{revisions[0]}.spdx2.3.json"
-        endpoint = device_gateway_sbom.get_endpoint_url(sbom_path)
-
-        res = requests.head(endpoint)
-
-        # backend returns 302 instead of 200 for a successful request
-        # adding the check for 200 in case this is changed without us knowing
-        if res.status_code == 200 or res.status_code == 302:
-            return True
-
-        return False
-
     @store.route("/download/sbom_snap_<snap_id>_<revision>.spdx2.3.json")
     def get_sbom(snap_id, revision):
-        sbom_path = f"download/sbom_snap_{snap_id}_{revision}.spdx2.3.json"
-        endpoint = device_gateway_sbom.get_endpoint_url(sbom_path)
-
-        res = requests.get(endpoint)
-
-        return flask.jsonify(res.json())
+        return sboms.stream_sbom(snap_id, revision)
 
     @store.route('/<regex("' + snap_regex + '"):snap_name>')
+    @cached_page(
+        tags=["snap:{snap_name}"],
+        vary=lambda: {"is_linux": is_linux_user_agent()},
+    )
     def snap_details(snap_name):
         """
         A view to display the snap details page for specific snaps.
@@ -333,18 +527,50 @@ def snap_details_views(store):
         error_info = {}
         status_code = 200
 
-        context = _get_context_snap_details(snap_name)
-        try:
+        context = redis_cache.get(
+            _get_context_cache_key(snap_name), expected_type=dict
+        )
+        if context is None:
+            details = _get_snap_details(snap_name)
+            publisher_info = _get_publisher_info(details)
+            snap_id = details.get("snap-id")
+            revisions = logic.get_revisions(details.get("channel-map"))
+        else:
+            snap_id = context["snap_id"]
+            revisions = context["revisions"]
+
+        # Everything else only needs the snap details, fetch it all at once
+        calls = {
             # the empty string channel makes the store API not filter by
             # the default channel 'latest/stable', which gives errors for
             # snaps that don't use that channel
-            extra_details = device_gateway.get_snap_details(
+            "extra_details": lambda: device_gateway.get_snap_details(
                 snap_name, channel="", fields=FIELDS_EXTRA_DETAILS
+            ),
+            "metrics": lambda: get_public_metrics(
+                snap_id, metrics_helper.get_last_metrics_processed_date()
+            ),
+            "has_sboms": lambda: sboms.snap_has_sboms(revisions, snap_id),
+        }
+        if context is None and publisher_info:
+            calls["publisher_snaps"] = lambda: logic.get_publisher_snaps(
+                device_gateway, details["snap"]["publisher"]["username"]
+            )
+
+        results = run_parallel(calls, timeouts=FANOUT_TIMEOUTS)
+
+        if context is None:
+            context = _build_context_snap_details(
+                snap_name,
+                details,
+                publisher_info,
+                results.get_or_default("publisher_snaps", []),
             )
-        except Exception:
-            logger.exception("Details endpoint returned an error")
-            extra_details = None
+            _cache_context_snap_details(snap_name, context)
 
+        context = _add_visitor_context(context)
+
+        extra_details = results.get_or_default("extra_details")
         if extra_details and extra_details["aliases"]:
             context["aliases"] = [
                 [
@@ -354,66 +580,15 @@ def snap_details_views(store):
                 for alias_obj in extra_details["aliases"]
             ]
 
-        country_metric_name = "weekly_installed_base_by_country_percent"
-        os_metric_name = "weekly_installed_base_by_operating_system_normalized"
-
-        end = metrics_helper.get_last_metrics_processed_date()
-
-        metrics_query_json = [
-            metrics_helper.get_filter(
-                metric_name=country_metric_name,
-                snap_id=context["snap_id"],
-                start=end,
-                end=end,
-            ),
-            metrics_helper.get_filter(
-                metric_name=os_metric_name,
-                snap_id=context["snap_id"],
-                start=end,
-                end=end,
-            ),
-        ]
-
-        metrics_response = device_gateway.get_public_metrics(
-            metrics_query_json
-        )
-
-        os_metrics = None
-        country_devices = None
-        if metrics_response:
-            oses = metrics_helper.find_metric(metrics_response, os_metric_name)
-            os_metrics = metrics.OsMetric(
-                name=oses["metric_name"],
-                series=oses["series"],
-                buckets=oses["buckets"],
-                status=oses["status"],
-            )
-
-            territories = metrics_helper.find_metric(
-                metrics_response, country_metric_name
-            )
-            country_devices = metrics.CountryDevices(
-                name=territories["metric_name"],
-                series=territories["series"],
-                buckets=territories["buckets"],
-                status=territories["status"],
-                private=False,
-            )
-
-        has_sboms = snap_has_sboms(context["revisions"], context["snap_id"])
+        public_metrics = results.get_or_default("metrics", {})
+        has_sboms = results.get_or_default("has_sboms", False)
 
         context.update(
             {
-                "countries": (
-                    country_devices.country_data if country_devices else None
-                ),
-                "normalized_os": os_metrics.os if os_metrics else None,
+                "countries": public_metrics.get("countries"),
+                "normalized_os": public_metrics.get("normalized_os"),
                 # Context info
-                "is_linux": (
-                    "Linux" in flask.request.headers.get("User-Agent", "")
-                    and "Android"
-                    not in flask.request.headers.get("User-Agent", "")
-                ),
+                "is_linux": is_linux_user_agent(),
                 "error_info": error_info,
             }
         )
@@ -494,8 +669,83 @@ def snap_details_views(store):
         )
         return svg
 
+    def _get_badge_etag_key(snap_name, badge_name, preview=False):
+        """Key of the ETag of the last badge served for this request, to
+        answer conditional requests without looking at the snap
+        """
+        return (
+            f"badge-etag:{snap_name}",
+            {
+                "badge": badge_name,
+                "name": flask.request.args.get("name", default=1, type=int),
+                "preview": preview,
+                "root": flask.request.url_root,
+            },
+        )
+
+    def _not_modified(etag):
+        if etag and flask.request.if_none_match.contains(etag):
+            response = flask.make_response("", 304)
+            response.set_etag(etag)
+            return response
+        return None
+
+    def _badge_response(
+        snap_name, etag_key, cached_etag=None, badge_args=None
+    ):
+        """Return the badge drawn by `get_badge_svg` with `badge_args`, an
+        empty SVG without them, rendering it only once for all requests
+
+        The response has a strong ETag and is a 304 when the client
+        already has it. The ETag is only written to `etag_key` when it
+        isn't `cached_etag`, the one read from it.
+        """
+        # The badges link to their snap, even with the same text
+        badge_spec = {
+            "badge_args": badge_args,
+            "name": flask.request.args.get("name", default=1, type=int),
+            "root": flask.request.url_root,
+            "snap_name": snap_name,
+        }
+        etag = hashlib.sha256(
+            json.dumps(badge_spec, sort_keys=True).encode()
+        ).hexdigest()
+
+        if etag != cached_etag:
+            redis_cache.set(
+                etag_key,
+                etag,
+                ttl=SNAP_CONTEXT_CACHE_TTL,
+                tags=[get_snap_cache_tag(snap_name)],
+            )
+
+        if flask.request.if_none_match.contains(etag):
+            response = flask.make_response("", 304)
+        else:
+            svg_key = f"badge-svg:{etag}"
+            svg = redis_cache.get(svg_key)
+            if svg is None:
+                svg = (
+                    get_badge_svg(snap_name=snap_name, **badge_args)
+                    if badge_args
+                    else EMPTY_SVG
+                )
+                redis_cache.set(svg_key, svg, ttl=BADGE_SVG_CACHE_TTL)
+            response = flask.make_response(
+                svg, 200, {"Content-Type": "image/svg+xml"}
+            )
+
+        response.set_etag(etag)
+        return response
+
     @store.route('/<regex("' + snap_regex + '"):snap_name>/badge.svg')
     def snap_details_badge(snap_name):
+        etag_key = _get_badge_etag_key(snap_name, "badge")
+        cached_etag = redis_cache.get(etag_key)
+        not_modified = _not_modified(cached_etag)
+        if not_modified:
+            return not_modified
+
         context = _get_context_snap_details(snap_name)
 
         # channel with safest risk available in default track
@@ -503,14 +753,16 @@ def snap_details_views(store):
             [context["default_track"], "/", context["lowest_risk_available"]]
         )
 
-        svg = get_badge_svg(
-            snap_name=snap_name,
-            left_text=context["snap_title"],
-            right_text=snap_channel + " " + context["version"],
+        return _badge_response(
+            snap_name,
+            etag_key,
+            cached_etag,
+            {
+                "left_text": context["snap_title"],
+                "right_text": snap_channel + " " + context["version"],
+            },
         )
 
-        return svg, 200, {"Content-Type": "image/svg+xml"}
-
     @store.route("/<lang>/<theme>/install.svg")
     def snap_install_badge(lang, theme):
         base_path = "static/images/badges/"
@@ -544,13 +796,6 @@ def snap_details_views(store):
     @store.route('/<regex("' + snap_regex + '"):snap_name>/trending.svg')
     def snap_details_badge_trending(snap_name):
         is_preview = flask.request.args.get("preview", default=0, type=int)
-        context = _get_context_snap_details(snap_name)
-
-        # default to empty SVG
-        svg = (
-            '<svg height="20" width="1" xmlns="http://www.w3.org/2000/svg" '
-            'xmlns:xlink="http://www.w3.org/1999/xlink"></svg>'
-        )
 
         # publishers can see preview of trending badge of their own snaps
         # on Publicise page
@@ -558,20 +803,29 @@ def snap_details_views(store):
         if is_preview and authentication.is_authenticated(flask.session):
             show_as_preview = True
 
+        etag_key = _get_badge_etag_key(snap_name, "trending", show_as_preview)
+        cached_etag = redis_cache.get(etag_key)
+        not_modified = _not_modified(cached_etag)
+        if not_modified:
+            return not_modified
+
+        context = _get_context_snap_details(snap_name)
+
+        # default to empty SVG
+        badge_args = None
         if context["trending"] or show_as_preview:
-            svg = get_badge_svg(
-                snap_name=snap_name,
-                left_text=context["snap_title"],
-                right_text="Trending this week",
-                color="#FA7041",
-            )
+            badge_args = {
+                "left_text": context["snap_title"],
+                "right_text": "Trending this week",
+                "color": "#FA7041",
+            }
 
-        return svg, 200, {"Content-Type": "image/svg+xml"}
+        return _badge_response(snap_name, etag_key, cached_etag, badge_args)
 
     @store.route('/install/<regex("' + snap_regex + '"):snap_name>/<distro>')
     def snap_distro_install(snap_name, distro):
         filename = f"store/content/distros/{distro}.yaml"
-        distro_data = helpers.get_yaml(filename)
+        distro_data = content_registry.get(filename)
 
         if not distro_data:
             flask.abort(404)
@@ -3,8 +3,13 @@ from urllib.parse import urlencode
 
 import requests as api_requests
 import flask
-from dateutil import parser
-from webapp.decorators import exchange_required, login_required
+from webapp.decorators import (
+    add_page_cache_tags,
+    cached_page,
+    exchange_required,
+    login_required,
+)
+from webapp import dates
 import webapp.helpers as helpers
 import webapp.store.logic as logic
 from webapp.api import requests
@@ -22,8 +27,13 @@ from flask.json import jsonify
 from webapp.extensions import csrf
 from webapp.store.logic import (
     get_categories,
+    get_snap_list_cache_tags,
 )
+from webapp.config import STALE_CACHE_TTL
+from webapp.content import content_registry
+from webapp.endpoints.utils import get_snap_cache_tag
 from cache.cache_utility import redis_cache
+from cache.decorators import cached
 
 session = requests.Session()
 
@@ -32,6 +42,77 @@ publisher_gateway = PublisherGW("snap", api_publisher_session)
 device_gateway = DeviceGW("snap", api_session)
 snap_recommendations = SnapRecommendations(session)
 
+# Featured publishers with a custom page
+CUSTOM_PUBLISHER_PAGES = ["kde", "snapcrafters", "jetbrains"]
+
+
+def get_recommendations_cache_tags(snaps):
+    return [get_snap_cache_tag(snap["details"]["name"]) for snap in snaps]
+
+
+@cached(
+    "explore:popular-snaps",
+    ttl=3600,
+    expected_type=list,
+    stale_ttl=STALE_CACHE_TTL,
+    early_recompute_beta=1,
+    tags=get_recommendations_cache_tags,
+)
+def get_popular_snaps():
+    return snap_recommendations.get_popular()
+
+
+@cached(
+    "explore:recent-snaps",
+    ttl=3600,
+    expected_type=list,
+    stale_ttl=STALE_CACHE_TTL,
+    early_recompute_beta=1,
+    tags=get_recommendations_cache_tags,
+)
+def get_recent_snaps():
+    return snap_recommendations.get_recent()
+
+
+@cached(
+    "explore:trending-snaps",
+    ttl=3600,
+    expected_type=list,
+    stale_ttl=STALE_CACHE_TTL,
+    early_recompute_beta=1,
+    tags=get_recommendations_cache_tags,
+)
+def get_trending_snaps():
+    return snap_recommendations.get_trending()
+
+
+@cached(
+    "explore:top-rated-snaps",
+    ttl=3600,
+    expected_type=list,
+    stale_ttl=STALE_CACHE_TTL,
+    early_recompute_beta=1,
+    tags=get_recommendations_cache_tags,
+)
+def get_top_rated_snaps():
+    return snap_recommendations.get_top_rated()
+
+
+@cached(
+    "explore:categories",
+    ttl=3600,
+    expected_type=list,
+    stale_ttl=STALE_CACHE_TTL,
+    early_recompute_beta=1,
+)
+def get_explore_categories():
+    return device_gateway.get_categories()
+
+
+@cached("store:stats", ttl=3600, expected_type=dict)
+def get_store_stats():
+    return snap_recommendations.get_stats()
+
 
 def store_blueprint(store_query=None):
     store = flask.Blueprint(
@@ -97,6 +178,12 @@ def store_blueprint(store_query=None):
 
         snaps_results = searched_results["results"]
 
+        add_page_cache_tags(
+            *[
+                get_snap_cache_tag(snap["package_name"])
+                for snap in snaps_results
+            ]
+        )
         for snap in snaps_results:
             snap["icon_url"] = helpers.get_icon(snap["media"])
 
@@ -145,62 +232,41 @@ def store_blueprint(store_query=None):
                 f"{flask.url_for('.store_view')}?{encoded_query}"
             )
 
+        # One round trip to Redis for all the lists of the page, and their
+        # stale copies
+        redis_cache.prefetch(
+            [
+                get_popular_snaps.build_key(),
+                get_recent_snaps.build_key(),
+                get_trending_snaps.build_key(),
+                get_top_rated_snaps.build_key(),
+                get_explore_categories.build_key(),
+            ]
+        )
+
         try:
-            popular_snaps = redis_cache.get(
-                "explore:popular-snaps", expected_type=list
-            )
-            if not popular_snaps:
-                popular_snaps = snap_recommendations.get_popular()
-                redis_cache.set(
-                    "explore:popular-snaps", popular_snaps, ttl=3600
-                )
-        except api_requests.exceptions.RequestException:
+            popular_snaps = get_popular_snaps()
+        except (ApiError, api_requests.exceptions.RequestException):
             popular_snaps = []
 
         try:
-            recent_snaps = redis_cache.get(
-                "explore:recent-snaps", expected_type=list
-            )
-            if not recent_snaps:
-                recent_snaps = snap_recommendations.get_recent()
-                redis_cache.set("explore:recent-snaps", recent_snaps, ttl=3600)
-        except api_requests.exceptions.RequestException:
+            recent_snaps = get_recent_snaps()
+        except (ApiError, api_requests.exceptions.RequestException):
             recent_snaps = []
 
         try:
-            trending_snaps = redis_cache.get(
-                "explore:trending-snaps", expected_type=list
-            )
-            if not trending_snaps:
-                trending_snaps = snap_recommendations.get_trending()
-                redis_cache.set(
-                    "explore:trending-snaps", trending_snaps, ttl=3600
-                )
-        except api_requests.exceptions.RequestException:
+            trending_snaps = get_trending_snaps()
+        except (ApiError, api_requests.exceptions.RequestException):
             trending_snaps = []
 
         try:
-            top_rated_snaps = redis_cache.get(
-                "explore:top-rated-snaps", expected_type=list
-            )
-            if not top_rated_snaps:
-                top_rated_snaps = snap_recommendations.get_top_rated()
-                redis_cache.set(
-                    "explore:top-rated-snaps", top_rated_snaps, ttl=3600
-                )
-        except api_requests.exceptions.RequestException:
+            top_rated_snaps = get_top_rated_snaps()
+        except (ApiError, api_requests.exceptions.RequestException):
             top_rated_snaps = []
 
         try:
-            categories_results = redis_cache.get(
-                "explore:categories", expected_type=list
-            )
-            if not categories_results:
-                categories_results = device_gateway.get_categories()
-                redis_cache.set(
-                    "explore:categories", categories_results, ttl=3600
-                )
-        except StoreApiError:
+            categories_results = get_explore_categories()
+        except (StoreApiError, ApiError):
             categories_results = []
 
         categories = sorted(
@@ -253,6 +319,7 @@ def store_blueprint(store_query=None):
         )
 
     @store.route("/publisher/<regex('[a-z0-9-]*[a-z][a-z0-9-]*'):publisher>")
+    @cached_page(tags=["publisher:{publisher}"])
     def publisher_details(publisher):
         """
         A view to display the publisher details page for specific publisher.
@@ -267,14 +334,15 @@ def store_blueprint(store_query=None):
         ]
 
         # special handling for some featured publishers with custom pages
-        if publisher in ["kde", "snapcrafters", "jetbrains"]:
-            context = helpers.get_yaml(
-                publisher_content_path + publisher + ".yaml", typ="safe"
+        if publisher in CUSTOM_PUBLISHER_PAGES:
+            publisher_content = content_registry.get(
+                publisher_content_path + publisher + ".yaml"
             )
 
-            if not context:
+            if not publisher_content:
                 flask.abort(404)
 
+            context = dict(publisher_content)
             context["snaps"] = []
             snaps_results = logic.get_publisher_snaps(
                 device_gateway, publisher
@@ -283,6 +351,7 @@ def store_blueprint(store_query=None):
             # Map package_name to live snap data so pre-defined lists below
             # are hydrated.
             snaps_by_name = {}
+            add_page_cache_tags(*get_snap_list_cache_tags(snaps_results))
             for snap in snaps_results:
                 item = snap["snap"]
                 item["package_name"] = snap["name"]
@@ -292,9 +361,8 @@ def store_blueprint(store_query=None):
 
             # "Popular snaps" is a pre-selected but the snap data comes
             # from the API, so unlisted/removed snaps are dropped.
-            popular_snaps = helpers.get_yaml(
-                publisher_content_path + publisher + "-snaps.yaml",
-                typ="safe",
+            popular_snaps = content_registry.get(
+                publisher_content_path + publisher + "-snaps.yaml"
             )
             context["popular_snaps"] = (
                 [
@@ -346,6 +414,7 @@ def store_blueprint(store_query=None):
             ],
         )["results"]
 
+        add_page_cache_tags(*get_snap_list_cache_tags(snaps_results))
         for snap in snaps_results:
             item = snap["snap"]
             item["package_name"] = snap["name"]
@@ -372,6 +441,7 @@ def store_blueprint(store_query=None):
         )
 
     @store.route("/store/categories/<category>")
+    @cached_page()
     def store_category(category):
         status_code = 200
         error_info = {}
@@ -380,6 +450,12 @@ def store_blueprint(store_query=None):
         snaps_results = device_gateway.get_category_items(
             category=category, size=10, page=1
         )["results"]
+        add_page_cache_tags(
+            *[
+                get_snap_cache_tag(snap["package_name"])
+                for snap in snaps_results
+            ]
+        )
         for snap in snaps_results:
             snap["icon_url"] = helpers.get_icon(snap["media"])
 
@@ -408,10 +484,7 @@ def store_blueprint(store_query=None):
     @store.route("/store/stats")
     def store_stats():
         try:
-            stats = redis_cache.get("store:stats", expected_type=dict)
-            if not stats:
-                stats = snap_recommendations.get_stats()
-                redis_cache.set("store:stats", stats, ttl=3600)
+            stats = get_store_stats()
         except (ApiError, api_requests.exceptions.RequestException):
             return flask.jsonify({}), 503
         return flask.jsonify(stats)
@@ -424,20 +497,18 @@ def store_blueprint(store_query=None):
             category=category, size=3, page=1
         )["_embedded"]["clickindex:package"]
 
+        add_page_cache_tags(
+            *[
+                get_snap_cache_tag(snap["package_name"])
+                for snap in snaps_results
+            ]
+        )
         for snap in snaps_results:
             snap["icon_url"] = helpers.get_icon(snap["media"])
 
         return flask.jsonify(snaps_results)
 
-    @store.route("/store/sitemap.xml")
-    def sitemap():
-        sitemap = redis_cache.get("sitemap:xml", expected_type=str)
-        if sitemap:
-            response = flask.make_response(sitemap)
-            response.headers["Content-Type"] = "application/xml"
-            response.headers["Cache-Control"] = "public, max-age=43200"
-            return response
-
+    def build_sitemap():
         base_url = "https://snapcraft.io/store"
 
         snaps = []
@@ -452,10 +523,8 @@ def store_blueprint(store_query=None):
 
             for snap in snaps_response["_embedded"]["clickindex:package"]:
                 try:
-                    last_udpated = (
-                        parser.parse(snap["last_updated"])
-                        .replace(tzinfo=None)
-                        .strftime("%Y-%m-%d")
+                    last_udpated = dates.format_date(
+                        snap["last_updated"], "%Y-%m-%d"
                     )
                     snaps.append(
                         {
@@ -471,14 +540,23 @@ def store_blueprint(store_query=None):
             else:
                 url = None
 
-        xml_sitemap = flask.render_template(
-            "sitemap/sitemap.xml",
-            base_url=base_url,
-            links=snaps,
+        # Rendered without the request context, which the background
+        # refreshes don't have
+        template = flask.current_app.jinja_env.get_template(
+            "sitemap/sitemap.xml"
         )
+        return template.render(base_url=base_url, links=snaps)
 
-        # Cache the generated sitemap for 12 hours
-        redis_cache.set("sitemap:xml", xml_sitemap, ttl=43200)
+    @store.route("/store/sitemap.xml")
+    def sitemap():
+        # Cached for 12 hours, crawling the whole store can take minutes
+        xml_sitemap = redis_cache.get_or_refresh(
+            "sitemap:xml",
+            build_sitemap,
+            ttl=43200,
+            early_recompute_beta=1,
+            lock_ttl=600,
+        )
 
         response = flask.make_response(xml_sitemap)
         response.headers["Content-Type"] = "application/xml"
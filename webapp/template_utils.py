@@ -1,9 +1,10 @@
 # Core
 import hashlib
 import os
-from dateutil import parser
 from emoji import replace_emoji
 
+from webapp import dates
+
 
 # generator functions for templates
 def generate_slug(path):
@@ -137,9 +138,7 @@ def format_date(timestamp, format):
     """Template function that returns a formatted date
     based on the given timestamp
     """
-    datestring = parser.parse(timestamp)
-
-    return datestring.strftime(format)
+    return dates.format_date(timestamp, format)
 
 
 def format_member_role(role):